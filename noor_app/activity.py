@@ -0,0 +1,244 @@
+"""
+سجل النشاط (append-only) مع مجاميع يومية وشهرية محدَّثة أولاً بأول
+كل نشاط (تسبيح، قراءة، آيات، أذكار، ختمة) يُضاف كحدث، وتُحدَّث معه
+جداول activity_daily و activity_monthly في المعاملة نفسها
+"""
+
+import clock
+from connection import get_connection
+import query_cache
+
+
+KINDS = ("tasbih", "reading", "ayahs", "adhkar", "khatma")
+
+# نوع وهمي يُسجَّل مع كل حدث: صفّه اليومي يعني أن اليوم كان نشطاً
+ANY = "any"
+
+# إعادة بناء المجاميع من سجل الأحداث ابتداءً من اليوم :since
+# (ما قبله مضغوط في activity_monthly ولم تعد أحداثه موجودة، انظر compaction)
+REBUILD_SQL = (
+    "DELETE FROM activity_daily WHERE day >= :since",
+    "DELETE FROM activity_monthly WHERE month >= substr(:since, 1, 7)",
+    """
+    INSERT INTO activity_daily (day, kind, total, events)
+    SELECT substr(ts, 1, 10), kind, SUM(amount), COUNT(*)
+    FROM activity_events WHERE ts >= :since GROUP BY substr(ts, 1, 10), kind
+    """,
+    f"""
+    INSERT INTO activity_daily (day, kind, total, events)
+    SELECT substr(ts, 1, 10), '{ANY}', COUNT(*), COUNT(*)
+    FROM activity_events WHERE ts >= :since GROUP BY substr(ts, 1, 10)
+    """,
+    """
+    INSERT INTO activity_monthly (kind, month, total, events, days)
+    SELECT kind, substr(day, 1, 7), SUM(total), SUM(events), COUNT(*)
+    FROM activity_daily WHERE day >= :since GROUP BY kind, substr(day, 1, 7)
+    """,
+)
+
+_DAILY_UPSERT = """
+    INSERT INTO activity_daily (day, kind, total, events) VALUES (?, ?, ?, 1)
+    ON CONFLICT(day, kind) DO UPDATE SET
+        total = total + excluded.total,
+        events = events + 1
+    RETURNING events
+"""
+
+# تمديد سلسلة نوع بيوم جديد بعد آخر يوم مسجَّل
+_STREAK_EXTEND = """
+    INSERT INTO streaks (kind, current, longest, last_day) VALUES (?, 1, 1, ?)
+    ON CONFLICT(kind) DO UPDATE SET
+        current = CASE WHEN last_day = date(excluded.last_day, '-1 day') THEN current + 1 ELSE 1 END,
+        longest = MAX(longest,
+                      CASE WHEN last_day = date(excluded.last_day, '-1 day') THEN current + 1 ELSE 1 END),
+        last_day = excluded.last_day
+"""
+
+# إعادة حساب السلاسل من الأيام النشطة (gaps and islands): الأيام المتتالية
+# يكون فرق تاريخها عن ترتيبها ثابتاً. :kind = NULL تعني كل الأنواع.
+# أيام الأنواع قبل :carried (حدّ الضغط المحسوب له streak_carry) قد تكون حُذفت،
+# فالسلسلة المنتهية قبله مباشرة تؤخذ من streak_carry وتُضاف إلى ما يبدأ عنده.
+# longest لا ينقص لأن السلاسل المضغوطة كلها لم تعد محسوبة
+STREAKS_REBUILD_SQL = f"""
+    INSERT INTO streaks (kind, current, longest, last_day)
+    WITH islands AS (
+        SELECT day_kind AS kind, MAX(day) AS last_day,
+               COUNT(*) + CASE WHEN MIN(day) = :carried THEN COALESCE(
+                   (SELECT length FROM streak_carry WHERE kind = day_kind), 0) ELSE 0 END
+                   AS length
+        FROM (
+            SELECT kind AS day_kind, day,
+                   julianday(day) - ROW_NUMBER() OVER (PARTITION BY kind ORDER BY day) AS island
+            FROM activity_daily
+            WHERE (:kind IS NULL OR kind = :kind) AND (day >= :carried OR kind = '{ANY}')
+        )
+        GROUP BY day_kind, island
+    ),
+    ranked AS (
+        SELECT kind, length, last_day,
+               MAX(length) OVER (PARTITION BY kind) AS longest,
+               ROW_NUMBER() OVER (PARTITION BY kind ORDER BY last_day DESC) AS position
+        FROM islands
+    )
+    SELECT kind, length, longest, last_day FROM ranked WHERE position = 1
+    ON CONFLICT(kind) DO UPDATE SET
+        current = excluded.current,
+        longest = MAX(longest, excluded.longest),
+        last_day = excluded.last_day
+"""
+
+# السلسلة المنتهية في اليوم السابق لحدّ الضغط الجديد :cutoff لكل نوع، من
+# الأيام بين الحدّ السابق :carried والجديد مع ما حُمل عبر الحدّ السابق
+_STREAK_CARRY_SQL = f"""
+    SELECT day_kind,
+           COUNT(*) + CASE WHEN MIN(day) = :carried THEN COALESCE(
+               (SELECT length FROM streak_carry WHERE kind = day_kind), 0) ELSE 0 END
+    FROM (
+        SELECT kind AS day_kind, day,
+               julianday(day) - ROW_NUMBER() OVER (PARTITION BY kind ORDER BY day) AS island
+        FROM activity_daily INDEXED BY idx_activity_daily_kind
+        WHERE kind != '{ANY}' AND day >= :carried AND day < :cutoff
+    )
+    GROUP BY day_kind, island
+    HAVING MAX(day) = date(:cutoff, '-1 day')
+"""
+
+_MONTHLY_UPSERT = """
+    INSERT INTO activity_monthly (kind, month, total, events, days) VALUES (?, ?, ?, 1, ?)
+    ON CONFLICT(kind, month) DO UPDATE SET
+        total = total + excluded.total,
+        events = events + 1,
+        days = days + excluded.days
+"""
+
+
+def timestamp(date=None):
+    """طابع زمني للحدث؛ الأيام الماضية تُسجَّل في آخر لحظة منها"""
+    now = clock.now()
+    if date is None or date == now.strftime("%Y-%m-%d"):
+        return now.strftime("%Y-%m-%d %H:%M:%S")
+    return f"{date} 23:59:59"
+
+
+def _apply(conn, kind, amount, ts):
+    conn.execute("INSERT INTO activity_events (kind, amount, ts) VALUES (?, ?, ?)",
+                 (kind, amount, ts))
+    day, month = ts[:10], ts[:7]
+    for k, value in ((kind, amount), (ANY, 1)):
+        first = conn.execute(_DAILY_UPSERT, (day, k, value)).fetchone()[0] == 1
+        conn.execute(_MONTHLY_UPSERT, (k, month, value, 1 if first else 0))
+        if first:
+            _extend_streak(conn, k, day)
+
+
+def _extend_streak(conn, kind, day):
+    row = conn.execute("SELECT last_day FROM streaks WHERE kind = ?", (kind,)).fetchone()
+    if row is None or day > row[0]:
+        conn.execute(_STREAK_EXTEND, (kind, day))
+    else:
+        # يوم سابق ملأ فجوة: نعيد حساب هذا النوع فقط
+        conn.execute(STREAKS_REBUILD_SQL, {"kind": kind, "carried": _carried(conn)})
+
+
+def record_many(events, conn=None):
+    """إضافة أحداث (kind, amount, ts) وتحديث المجاميع في معاملة واحدة
+
+    إذا مُرِّر ``conn`` تُنفَّذ داخل معاملة المستدعي دون commit، وعليه
+    استدعاء query_cache.bump بعد الـ commit.
+    الأحداث ذات الكمية صفر تُتجاهل.
+    """
+    events = [(kind, amount, ts or timestamp()) for kind, amount, ts in events if amount]
+    if conn is not None:
+        for event in events:
+            _apply(conn, *event)
+        return len(events)
+    conn = get_connection()
+    with conn:
+        for event in events:
+            _apply(conn, *event)
+    query_cache.bump(query_cache.ACTIVITY)
+    return len(events)
+
+
+def record(kind, amount=1, ts=None):
+    """إضافة حدث واحد"""
+    return record_many([(kind, amount, ts)])
+
+
+def daily_totals(day):
+    """مجاميع يوم واحد {kind: total}"""
+    rows = get_connection().execute(
+        "SELECT kind, total FROM activity_daily WHERE day = ?", (day,)
+    ).fetchall()
+    return {kind: total for kind, total in rows if kind != ANY}
+
+
+def streaks():
+    """السلاسل لكل نوع {kind: {"current": n, "longest": n}} (يشمل ANY للنشاط عموماً)
+
+    السلسلة الحالية تنتهي اليوم: إذا لم يُسجَّل نشاط اليوم فهي صفر.
+    """
+    today = clock.now().strftime("%Y-%m-%d")
+    kinds = KINDS + (ANY,)
+    rows = get_connection().execute(f"""
+        SELECT kind, current, longest, last_day FROM streaks
+        WHERE kind IN ({", ".join("?" for _ in kinds)})
+    """, kinds).fetchall()
+    result = {kind: {"current": 0, "longest": 0} for kind in kinds}
+    for kind, current, longest, last_day in rows:
+        result[kind] = {"current": current if last_day == today else 0, "longest": longest}
+    return result
+
+
+def current_streak(kind=ANY):
+    """طول السلسلة الحالية لنوع واحد (بحث بالمفتاح)"""
+    row = get_connection().execute(
+        "SELECT current, last_day FROM streaks WHERE kind = ?", (kind,)
+    ).fetchone()
+    if row is None or row[1] != clock.now().strftime("%Y-%m-%d"):
+        return 0
+    return row[0]
+
+
+def compacted_before(conn=None):
+    """أول يوم لم يُضغط بعد ('' إذا لم يُضغط شيء)"""
+    conn = conn or get_connection()
+    row = conn.execute("SELECT cutoff FROM compaction_state WHERE id = 1").fetchone()
+    return row[0] if row else ""
+
+
+def _carried(conn):
+    row = conn.execute("SELECT carried FROM compaction_state WHERE id = 1").fetchone()
+    return row[0] if row else ""
+
+
+def carry_streaks(conn):
+    """حفظ السلاسل التي تعبر حدّ الضغط قبل حذف أيامها (داخل معاملة المستدعي)
+
+    يُستدعى بعد تقديم الحدّ وقبل أي حذف، ولا يفعل شيئاً إذا حُسب للحدّ نفسه.
+    """
+    cutoff, carried = conn.execute(
+        "SELECT cutoff, carried FROM compaction_state WHERE id = 1").fetchone()
+    if carried == cutoff:
+        return
+    runs = conn.execute(_STREAK_CARRY_SQL, {"cutoff": cutoff, "carried": carried}).fetchall()
+    conn.execute("DELETE FROM streak_carry")
+    conn.executemany("INSERT INTO streak_carry (kind, length) VALUES (?, ?)", runs)
+    conn.execute("UPDATE compaction_state SET carried = ? WHERE id = 1", (cutoff,))
+
+
+def rebuild_rollups(conn=None):
+    """إعادة حساب المجاميع اليومية والشهرية من سجل الأحداث
+
+    الأشهر المضغوطة تبقى كما هي. إذا مُرِّر ``conn`` تُنفَّذ داخل معاملة المستدعي.
+    """
+    if conn is not None:
+        since = compacted_before(conn)
+        for sql in REBUILD_SQL:
+            conn.execute(sql, {"since": since})
+        conn.execute(STREAKS_REBUILD_SQL, {"kind": None, "carried": _carried(conn)})
+        return
+    conn = get_connection()
+    with conn:
+        rebuild_rollups(conn)
+    query_cache.bump(query_cache.ACTIVITY)
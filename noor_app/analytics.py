@@ -0,0 +1,196 @@
+"""
+تحليلات السلاسل الزمنية للقراءة والتسبيح
+كل سلسلة مصفوفة متصلة بقيمة لكل يوم (الأيام بلا نشاط أصفار) تبدأ من يوم
+epoch محدد، والحسابات تتم دفعة واحدة على المصفوفة: بـ NumPy إن وُجدت،
+وإلا بوحدة array مع دوال C المدمجة (map و accumulate والتقطيع)
+
+ملاحظة: الأيام الأقدم من حدّ الضغط (انظر compaction) لم تعد لها صفوف يومية
+"""
+
+import heapq
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+from operator import mul, sub, truediv
+
+import clock
+from connection import get_connection
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+EPOCH = date(1970, 1, 1)
+
+# 1970-01-01 كان يوم خميس (الاثنين = 0)
+_EPOCH_WEEKDAY = 3
+
+
+def epoch_day(d):
+    """رقم اليوم منذ 1970-01-01"""
+    return (d - EPOCH).days
+
+
+class Series:
+    """قيم يومية متتالية تبدأ من اليوم start (رقم epoch)"""
+
+    def __init__(self, start, values):
+        self.start = start
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def date(self, index):
+        return EPOCH + timedelta(days=self.start + index)
+
+    def tolist(self):
+        return [float(v) for v in self.values]
+
+
+def _zeros(n):
+    if np is not None:
+        return np.zeros(n)
+    return array("d", bytes(8 * n))
+
+
+def load_series(kind, start=None, end=None):
+    """تحميل مجاميع نوع نشاط يومياً من start إلى end (شاملة) في Series
+
+    الافتراضي آخر 365 يوماً حتى اليوم.
+    """
+    end = end or clock.today()
+    start = start or end - timedelta(days=364)
+    first, n = epoch_day(start), (end - start).days + 1
+    rows = get_connection().execute("""
+        SELECT CAST(julianday(day) - 2440587.5 AS INTEGER), total FROM activity_daily
+        WHERE kind = ? AND day BETWEEN ? AND ?
+    """, (kind, start.isoformat(), end.isoformat())).fetchall()
+    values = _zeros(n)
+    if rows:
+        if np is not None:
+            data = np.array(rows, dtype=float)
+            values[data[:, 0].astype(int) - first] = data[:, 1]
+        else:
+            for day, total in rows:
+                values[day - first] = total
+    return Series(first, values)
+
+
+def rolling_average(series, window=7):
+    """متوسط متحرك لآخر window يوماً عند كل يوم (الأيام الأولى بما توفر)"""
+    n = len(series)
+    if n == 0:
+        return _zeros(0)
+    if np is not None:
+        sums = np.cumsum(series.values)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums / np.minimum(np.arange(1, n + 1), window)
+    prefix = list(accumulate(series.values, initial=0.0))
+    lagged = [0.0] * min(window, n) + prefix[1:n - window + 1]
+    counts = list(range(1, min(window, n) + 1)) + [window] * max(0, n - window)
+    return array("d", map(truediv, map(sub, prefix[1:], lagged), counts))
+
+
+def weekday_profile(series):
+    """متوسط النشاط لكل يوم من أيام الأسبوع (الاثنين أولاً)"""
+    first = (series.start + _EPOCH_WEEKDAY) % 7
+    if np is not None:
+        weekdays = (np.arange(len(series)) + first) % 7
+        counts = np.bincount(weekdays, minlength=7)
+        sums = np.bincount(weekdays, weights=series.values, minlength=7)
+        return [float(s / c) if c else 0.0 for s, c in zip(sums, counts)]
+    profile = []
+    for weekday in range(7):
+        days = series.values[(weekday - first) % 7::7]
+        profile.append(sum(days) / len(days) if len(days) else 0.0)
+    return profile
+
+
+def percentiles(series, qs=(25, 50, 75, 90), active_only=True):
+    """النسب المئوية للقيم اليومية {q: قيمة} (استيفاء خطي كـ NumPy)
+
+    active_only يستبعد الأيام بلا نشاط.
+    """
+    if np is not None:
+        values = series.values[series.values > 0] if active_only else series.values
+        if not len(values):
+            return {q: 0.0 for q in qs}
+        return {q: float(v) for q, v in zip(qs, np.percentile(values, qs))}
+    values = sorted(filter(None, series.values) if active_only else series.values)
+    if not values:
+        return {q: 0.0 for q in qs}
+    result = {}
+    for q in qs:
+        position = (len(values) - 1) * q / 100
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        result[q] = values[low] + (values[high] - values[low]) * (position - low)
+    return result
+
+
+def best_weeks(series, k=3):
+    """أفضل k أسابيع (تبدأ الاثنين) [(بداية الأسبوع، المجموع)]؛ الأقدم أولاً عند التساوي"""
+    n = len(series)
+    if n == 0:
+        return []
+    # بداية الأسبوع الأول قد تسبق بداية السلسلة
+    offset = (series.start + _EPOCH_WEEKDAY) % 7
+    first_monday = series.start - offset
+    if np is not None:
+        weeks = (np.arange(n) + offset) // 7
+        totals = np.bincount(weeks, weights=series.values)
+        top = np.argsort(-totals, kind="stable")[:k]
+        best = [(int(w), float(totals[w])) for w in top]
+    else:
+        padded = array("d", bytes(8 * offset)) + array("d", series.values)
+        totals = [sum(padded[i:i + 7]) for i in range(0, len(padded), 7)]
+        best = heapq.nlargest(k, enumerate(totals), key=lambda item: item[1])
+    return [(EPOCH + timedelta(days=first_monday + 7 * w), total) for w, total in best]
+
+
+def year_heatmap(kind, year):
+    """مصفوفة 7 صفوف (أيام الأسبوع) × أعمدة الأسابيع لنشاط سنة كاملة
+
+    العمود الأول يبدأ بالاثنين السابق أو المساوي لـ 1 يناير.
+    """
+    series = load_series(kind, date(year, 1, 1), date(year, 12, 31))
+    offset = (series.start + _EPOCH_WEEKDAY) % 7
+    n = len(series)
+    columns = (offset + n + 6) // 7
+    if np is not None:
+        grid = np.zeros(7 * columns)
+        grid[offset:offset + n] = series.values
+        return grid.reshape(columns, 7).T
+    padded = (array("d", bytes(8 * offset)) + array("d", series.values)
+              + array("d", bytes(8 * (7 * columns - offset - n))))
+    return [list(padded[row::7]) for row in range(7)]
+
+
+def correlation(a, b):
+    """معامل ارتباط بيرسون بين سلسلتين بالطول نفسه (None إذا كانت إحداهما ثابتة)"""
+    n = len(a)
+    if n != len(b):
+        raise ValueError("السلسلتان بطولين مختلفين")
+    if n < 2:
+        return None
+    if np is not None:
+        x, y = a.values - a.values.mean(), b.values - b.values.mean()
+        denominator = np.sqrt((x * x).sum() * (y * y).sum())
+        return float((x * y).sum() / denominator) if denominator else None
+    sum_x, sum_y = sum(a.values), sum(b.values)
+    sxy = sum(map(mul, a.values, b.values)) - sum_x * sum_y / n
+    sxx = sum(map(mul, a.values, a.values)) - sum_x * sum_x / n
+    syy = sum(map(mul, b.values, b.values)) - sum_y * sum_y / n
+    if sxx <= 0 or syy <= 0:
+        return None
+    return sxy / (sxx * syy) ** 0.5
+
+
+def reading_tasbih_correlation(days=365):
+    """الارتباط بين صفحات القراءة والتسبيح اليومي في آخر days يوماً"""
+    end = clock.today()
+    start = end - timedelta(days=days - 1)
+    return correlation(load_series("reading", start, end), load_series("tasbih", start, end))
@@ -0,0 +1,79 @@
+"""
+وصول غير متزامن إلى البيانات
+الاستعلامات تعمل في خيوط خلفية (لكل خيط اتصاله، انظر connection)،
+والنتيجة تعود إلى واجهة Kivy عبر Clock.schedule_once
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+MAX_WORKERS = 2
+
+_executor = None
+_synchronous = False
+
+
+def set_synchronous(value=True):
+    """تشغيل الاستعلامات فوراً في الخيط نفسه (للاختبارات)"""
+    global _synchronous
+    _synchronous = value
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="noor-db")
+    return _executor
+
+
+def _deliver(callback, errback, future):
+    """استدعاء callback (أو errback عند الخطأ) بنتيجة المستقبل"""
+    error = future.exception()
+    if error is None:
+        callback(future.result())
+    elif errback is not None:
+        errback(error)
+    else:
+        print(f"خطأ في استعلام البيانات: {error}")
+
+
+def submit(fn, *args, callback=None, errback=None, **kwargs):
+    """تشغيل ``fn(*args, **kwargs)`` في الخلفية وإرجاع Future
+
+    إذا مُرِّر ``callback`` يُستدعى بالنتيجة في خيط الواجهة.
+    """
+    if _synchronous:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        if callback is not None:
+            _deliver(callback, errback, future)
+        return future
+
+    future = _get_executor().submit(fn, *args, **kwargs)
+    if callback is not None:
+        def done(f):
+            from kivy.clock import Clock
+            Clock.schedule_once(lambda dt: _deliver(callback, errback, f))
+        future.add_done_callback(done)
+    return future
+
+
+def gather(calls, callback=None, errback=None):
+    """تشغيل عدة استعلامات في مهمة خلفية واحدة
+
+    ``calls`` قاموس {اسم: (دالة، وسائط...)} والنتيجة قاموس {اسم: قيمة}.
+    """
+    def run():
+        return {name: fn(*args) for name, (fn, *args) in calls.items()}
+    return submit(run, callback=callback, errback=errback)
+
+
+def shutdown():
+    """إيقاف الخيوط الخلفية عند إغلاق التطبيق"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
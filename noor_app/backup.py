@@ -0,0 +1,260 @@
+"""
+تصدير واستيراد كامل سجل المستخدم
+التصدير يمر على الجداول بمؤشر (fetchmany) فيبقى استهلاك الذاكرة ثابتاً مهما
+طال السجل، والاستيراد يُدخل الصفوف على دفعات بـ executemany في معاملة واحدة
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from itertools import chain, groupby, islice
+
+from connection import get_connection
+from settings_store import settings
+import activity
+import query_cache
+
+
+BATCH_SIZE = 500
+
+# الجداول المُصدَّرة وطريقة دمج كل منها مع الصفوف الموجودة
+# (بعد INSERT ... في وضع الدمج؛ None تعني إضافة الصفوف كما هي)
+TABLES = {
+    # المجاميع تُنقل لأجل الأشهر المضغوطة، وما بعد حدّ الضغط يُعاد بناؤه من الأحداث
+    "compaction_state": """ON CONFLICT(id) DO UPDATE SET
+        cutoff = MAX(cutoff, excluded.cutoff)""",
+    "activity_daily": """ON CONFLICT(day, kind) DO UPDATE SET
+        total = MAX(total, excluded.total), events = MAX(events, excluded.events)""",
+    "activity_monthly": """ON CONFLICT(kind, month) DO UPDATE SET
+        total = MAX(total, excluded.total), events = MAX(events, excluded.events),
+        days = MAX(days, excluded.days)""",
+    "activity_events": None,
+    "statistics": """ON CONFLICT(date) DO UPDATE SET
+        ayahs_read = MAX(COALESCE(ayahs_read, 0), COALESCE(excluded.ayahs_read, 0)),
+        adhkar_count = MAX(COALESCE(adhkar_count, 0), COALESCE(excluded.adhkar_count, 0)),
+        khatma_count = MAX(COALESCE(khatma_count, 0), COALESCE(excluded.khatma_count, 0))""",
+    "reading_log": """ON CONFLICT(date) DO UPDATE SET
+        pages = MAX(COALESCE(pages, 0), COALESCE(excluded.pages, 0))""",
+    "tasbih": """ON CONFLICT(date) DO UPDATE SET
+        count = MAX(COALESCE(count, 0), COALESCE(excluded.count, 0))""",
+    "achievements": """ON CONFLICT(name) DO UPDATE SET
+        date = MIN(date, excluded.date)""",
+    "badges": """ON CONFLICT(badge_name) DO UPDATE SET
+        unlocked_date = MIN(COALESCE(unlocked_date, excluded.unlocked_date),
+                            COALESCE(excluded.unlocked_date, unlocked_date))""",
+    # نحتفظ بالختمة الأبعد تقدماً
+    "khatma": """ON CONFLICT(id) DO UPDATE SET
+        pages = excluded.pages, completed = excluded.completed
+        WHERE excluded.completed * 604 + excluded.pages > completed * 604 + pages""",
+    "ramadan_plan": """ON CONFLICT(id) DO UPDATE SET
+        plan_days = excluded.plan_days, start_date = excluded.start_date,
+        pages_read = MAX(pages_read, excluded.pages_read)""",
+    "settings": """ON CONFLICT(key) DO UPDATE SET value = excluded.value""",
+}
+
+# أعمدة لا تُنقل بين الأجهزة (معرّفات تولّدها قاعدة البيانات)
+_SKIP_COLUMNS = {
+    "activity_events": ("id",),
+    # حدّ حساب streak_carry يخص هذا الجهاز
+    "compaction_state": ("carried",),
+    "achievements": ("id",),
+    "badges": ("id",),
+}
+
+# أعمدة تُصدَّر بتعبير بدلاً من قيمتها المخزنة
+_EXPORT_COLUMNS = {
+    # هوية الحدث: uid المستورد، أو مفتاح هذا الجهاز مع id
+    "activity_events": {"uid": "COALESCE(uid, (SELECT key FROM device) || ':' || id)"},
+}
+
+# حدث بالهوية نفسها موجود مسبقاً يعني أنه استُورد من قبل، وحدث هذا الجهاز
+# يُعرف بـ id مع uid فارغ
+_EVENT_INSERT = """
+    INSERT INTO activity_events (kind, amount, ts, uid)
+    SELECT :kind, :amount, :ts, :uid
+    WHERE NOT EXISTS (SELECT 1 FROM activity_events WHERE uid = :uid)
+      AND NOT EXISTS (SELECT 1 FROM activity_events WHERE id = :local_id AND uid IS NULL)
+"""
+
+# ملف بلا uid (من إصدار أقدم): التكرار رقم n لحدث بالمحتوى نفسه يُضاف فقط
+# إذا كان الموجود منه أقل من n
+_LEGACY_EVENT_INSERT = """
+    INSERT INTO activity_events (kind, amount, ts)
+    SELECT :kind, :amount, :ts
+    WHERE (SELECT COUNT(*) FROM activity_events
+           WHERE ts = :ts AND kind = :kind AND amount = :amount) < :occurrence
+"""
+
+
+def _flush_pending():
+    # الزيادات المؤجلة في الذاكرة يجب أن تصل إلى الجداول قبل النقل
+    from database import write_buffer
+    write_buffer.flush()
+
+
+def _columns(conn, table):
+    skip = _SKIP_COLUMNS.get(table, ())
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] not in skip]
+
+
+def _iter_rows(conn, table, columns):
+    expressions = _EXPORT_COLUMNS.get(table, {})
+    selected = ", ".join(expressions.get(column, column) for column in columns)
+    cursor = conn.execute(f"SELECT {selected} FROM {table}")
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+def export_ndjson(fp, tables=None):
+    """كتابة الجداول إلى ملف نصي مفتوح، سطر JSON لكل صف
+
+    كل سطر بالشكل {"table": ..., "row": {...}}. تُرجع عدد الصفوف.
+    """
+    _flush_pending()
+    conn = get_connection()
+    count = 0
+    for table in tables or TABLES:
+        columns = _columns(conn, table)
+        for row in _iter_rows(conn, table, columns):
+            record = {"table": table, "row": dict(zip(columns, row))}
+            fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def export_csv(directory, tables=None):
+    """كتابة كل جدول إلى ملف CSV باسمه داخل المجلد. تُرجع عدد الصفوف"""
+    _flush_pending()
+    os.makedirs(directory, exist_ok=True)
+    conn = get_connection()
+    count = 0
+    for table in tables or TABLES:
+        columns = _columns(conn, table)
+        with open(os.path.join(directory, f"{table}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in _iter_rows(conn, table, columns):
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def _insert_batches(conn, table, columns, rows, merge):
+    """إدخال صفوف جدول واحد على دفعات"""
+    if table not in TABLES:
+        raise ValueError(f"جدول غير معروف: {table}")
+    known = _columns(conn, table)
+    for column in columns:
+        if column not in known:
+            raise ValueError(f"عمود غير معروف: {table}.{column}")
+
+    if table == "activity_events" and merge and "uid" in columns:
+        sql = _EVENT_INSERT
+        rows = _event_identities(conn, columns, rows)
+    elif table == "activity_events" and merge:
+        sql = _LEGACY_EVENT_INSERT
+        rows = _event_occurrences(columns, rows)
+    else:
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        if merge and TABLES[table]:
+            sql += " " + TABLES[table]
+
+    count = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def _event_identities(conn, columns, rows):
+    """صفوف الأحداث كقواميس لـ _EVENT_INSERT مع هوية كل حدث"""
+    device = conn.execute("SELECT key FROM device").fetchone()[0] + ":"
+    for row in rows:
+        event = dict(zip(columns, row))
+        uid = event["uid"]
+        local_id = int(uid[len(device):]) if uid.startswith(device) else None
+        yield {"kind": event["kind"], "amount": event["amount"], "ts": event["ts"],
+               "uid": uid, "local_id": local_id}
+
+
+def _event_occurrences(columns, rows):
+    """صفوف أحداث بلا uid لـ _LEGACY_EVENT_INSERT مع ترتيب تكرار كل محتوى
+
+    الأحداث المتطابقة في الملف تبقى كلها، وإعادة الاستيراد (ولو إلى الجهاز
+    الذي صدّرها) لا تكررها.
+    """
+    seen = Counter()
+    for row in rows:
+        event = dict(zip(columns, row))
+        content = (event["ts"], event["kind"], event["amount"])
+        seen[content] += 1
+        yield {"kind": event["kind"], "amount": event["amount"], "ts": event["ts"],
+               "occurrence": seen[content]}
+
+
+def _import(sections, merge):
+    """استيراد أقسام (table, columns, rows) في معاملة واحدة"""
+    _flush_pending()
+    conn = get_connection()
+    count = 0
+    cleared = set()
+    with conn:
+        for table, columns, rows in sections:
+            if not merge and table not in cleared:
+                if table not in TABLES:
+                    raise ValueError(f"جدول غير معروف: {table}")
+                conn.execute(f"DELETE FROM {table}")
+                cleared.add(table)
+            count += _insert_batches(conn, table, columns, rows, merge)
+        # المجاميع اليومية والشهرية تُعاد من سجل الأحداث بعد الاستيراد
+        activity.rebuild_rollups(conn)
+    query_cache.bump(*query_cache.TOPICS)
+    settings.invalidate()
+    return count
+
+
+def _ndjson_sections(fp):
+    """تجميع الأسطر المتتالية للجدول نفسه في أقسام دون قراءة الملف كله"""
+    records = (json.loads(line) for line in fp if line.strip())
+    for table, group in groupby(records, key=lambda record: record["table"]):
+        first = next(group)
+        columns = list(first["row"])
+        yield table, columns, (tuple(record["row"].get(column) for column in columns)
+                               for record in chain([first], group))
+
+
+def import_ndjson(fp, merge=True):
+    """استيراد ملف NDJSON صادر من export_ndjson
+
+    في وضع الدمج تُدمج الصفوف مع الموجودة (الأحداث المستوردة من قبل تُتجاهل)،
+    وإلا تُستبدل محتويات الجداول الواردة في الملف. تُرجع عدد الصفوف.
+    """
+    return _import(_ndjson_sections(fp), merge)
+
+
+def _csv_sections(directory, tables):
+    for table in tables or TABLES:
+        path = os.path.join(directory, f"{table}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            columns = next(reader, None)
+            if columns:
+                # CSV لا يحفظ الأنواع؛ الخانة الفارغة تعني NULL
+                yield table, columns, ([value if value != "" else None for value in row]
+                                       for row in reader)
+
+
+def import_csv(directory, merge=True, tables=None):
+    """استيراد ملفات CSV صادرة من export_csv. تُرجع عدد الصفوف"""
+    return _import(_csv_sections(directory, tables), merge)
@@ -0,0 +1,196 @@
+"""
+قياس أداء طبقة البيانات على سجل اصطناعي
+لكل حجم (عدد سنوات) تُنشأ قاعدة بيانات مؤقتة وتُملأ بنشاط يومي عشوائي
+بساعة مثبتة، ثم تُقاس كل دالة عامة في database و statistics و khatma
+و achievements، ويُكتب p50/p95 ومنحنى التوسع بصيغة JSON
+
+    python benchmark.py --years 1 3 10 --repeat 30 --out bench.json
+"""
+
+import argparse
+import importlib
+import inspect
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import activity
+import clock
+import counters
+import query_cache
+from connection import manager
+from settings_store import settings
+
+
+MODULES = ("database", "statistics", "khatma", "achievements")
+
+# وسائط الدوال التي لا تعمل بلا وسائط (دالة تعني وسائط تُحسب وقت القياس)
+ARGS = {
+    "database.save_last_read": ("البقرة", 255),
+    "database.update_settings": ("benchmark", "1"),
+    "database.get_setting": ("benchmark",),
+    "database.log_reading": (2,),
+    "database.get_reading_pages": lambda: (clock.today().isoformat(),),
+    "database.set_ramadan_plan": (30,),
+    "statistics.record_daily_activity": (1, 1, 0),
+    "khatma.update_khatma": (3,),
+    "achievements.unlock_badge": ("benchmark",),
+}
+
+# تحذف السجل القديم، فتُقاس بعد كل الدوال الأخرى
+LAST = ("statistics.clear_old_stats",)
+
+START = datetime(2025, 1, 1, 21, 0, 0)
+
+
+def public_functions():
+    """{اسم: دالة} لكل دالة عامة معرَّفة في الوحدات المقيسة"""
+    functions = {}
+    for name in MODULES:
+        module = importlib.import_module(name)
+        for attr, fn in inspect.getmembers(module, inspect.isfunction):
+            if not attr.startswith("_") and fn.__module__ == name:
+                functions[f"{name}.{attr}"] = fn
+    ordered = sorted(functions, key=lambda name: (name in LAST, name))
+    return {name: functions[name] for name in ordered}
+
+
+def seed(days, rng, end):
+    """ملء قاعدة البيانات الحالية بـ days يوماً من النشاط تنتهي قبل end. تُرجع عدد الأحداث"""
+    events = []
+    legacy = []
+    for offset in range(days, 0, -1):
+        day = (end - timedelta(days=offset)).strftime("%Y-%m-%d")
+        # أيام بلا نشاط تقطع السلاسل كما في الاستخدام الحقيقي
+        if rng.random() < 0.15:
+            continue
+        pages = rng.randint(1, 20)
+        tasbih = rng.choice((33, 99, 100)) * rng.randint(1, 3)
+        ayahs = rng.randint(0, 50)
+        events += [
+            ("reading", pages, f"{day} 06:30:00"),
+            ("tasbih", tasbih, f"{day} 18:10:00"),
+            ("ayahs", ayahs, f"{day} 06:45:00"),
+            ("adhkar", 1, f"{day} 07:00:00"),
+            ("adhkar", 1, f"{day} 17:30:00"),
+        ]
+        legacy += [("reading_log", day, pages), ("tasbih", day, tasbih),
+                   ("ayahs_read", day, ayahs), ("adhkar_count", day, 2)]
+    counters.increment_many(legacy)
+    activity.record_many(events)
+    return len(events)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def measure(functions, repeat, warm=False):
+    """توقيت كل دالة repeat مرة {اسم: (p50_ms, p95_ms)}"""
+    from database import write_buffer
+    results = {}
+    for name, fn in functions.items():
+        args = ARGS.get(name, ())
+        samples = []
+        for _ in range(repeat):
+            call_args = args() if callable(args) else args
+            if not warm:
+                query_cache.clear()
+            started = time.perf_counter()
+            fn(*call_args)
+            samples.append((time.perf_counter() - started) * 1000)
+            write_buffer.flush()
+        results[name] = (_percentile(samples, 50), _percentile(samples, 95))
+    return results
+
+
+def _slope(points):
+    """أس التوسع: ميل log(p50) مقابل log(الأحداث) بالمربعات الصغرى"""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    if not sxx:
+        return None
+    return round(sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx, 3)
+
+
+def run(years=(1, 3, 10), repeat=20, seed_value=1, warm=False):
+    """تشغيل القياس لكل حجم وإرجاع التقرير كقاموس"""
+    from database import write_buffer
+    functions = public_functions()
+    report = {"repeat": repeat, "warm": warm, "sizes": [], "functions": {}, "scaling": {}}
+    old_path = manager.path
+    write_buffer.flush()
+    try:
+        for size in years:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.db")
+                manager.configure(path)
+                settings.invalidate()
+                query_cache.clear()
+                clock.set_clock(clock.FixedClock(START))
+
+                started = time.perf_counter()
+                events = seed(int(size * 365), random.Random(seed_value), START)
+                seed_seconds = time.perf_counter() - started
+
+                results = measure(functions, repeat, warm)
+                write_buffer.flush()
+                manager.get().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                report["sizes"].append({
+                    "years": size,
+                    "events": events,
+                    "seed_seconds": round(seed_seconds, 3),
+                    "db_bytes": os.path.getsize(path),
+                })
+                for name, (p50, p95) in results.items():
+                    report["functions"].setdefault(name, []).append({
+                        "years": size,
+                        "events": events,
+                        "p50_ms": round(p50, 4),
+                        "p95_ms": round(p95, 4),
+                    })
+                manager.close_all()
+    finally:
+        clock.set_clock()
+        manager.configure(old_path)
+        settings.invalidate()
+        query_cache.clear()
+
+    for name, points in report["functions"].items():
+        report["scaling"][name] = _slope([(p["events"], p["p50_ms"]) for p in points])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء طبقة البيانات")
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--warm", action="store_true", help="عدم إفراغ query_cache بين الاستدعاءات")
+    parser.add_argument("--out", help="ملف JSON (الافتراضي: المخرجات القياسية)")
+    options = parser.parse_args(argv)
+
+    report = run(options.years, options.repeat, options.seed, options.warm)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
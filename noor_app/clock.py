@@ -0,0 +1,39 @@
+"""
+مصدر الوقت لطبقة البيانات
+الوحدات تسأل clock.now() بدلاً من datetime.now() حتى يمكن تثبيت الوقت
+أو تحريكه في الاختبارات وقياس الأداء
+"""
+
+from datetime import datetime, timedelta
+
+
+_now = datetime.now
+
+
+def now():
+    """الوقت الحالي حسب الساعة المضبوطة"""
+    return _now()
+
+
+def today():
+    return _now().date()
+
+
+def set_clock(fn=None):
+    """استبدال مصدر الوقت بدالة بلا وسائط تُرجع datetime (None للساعة الحقيقية)"""
+    global _now
+    _now = fn or datetime.now
+
+
+class FixedClock:
+    """ساعة ثابتة تتحرك فقط عند الطلب"""
+
+    def __init__(self, start):
+        self.current = start
+
+    def __call__(self):
+        return self.current
+
+    def advance(self, **delta):
+        self.current += timedelta(**delta)
+        return self.current
@@ -0,0 +1,113 @@
+"""
+ضغط السجل القديم
+الأشهر الكاملة الأقدم من مدة الاحتفاظ تبقى في activity_monthly فقط، وتُحذف
+صفوفها اليومية والأحداث الأصلية على دفعات صغيرة (كل دفعة معاملة قصيرة)،
+ثم يُعاد الحجم المحرَّر إلى النظام بـ incremental_vacuum
+"""
+
+from datetime import timedelta
+
+import clock
+from connection import get_connection
+import activity
+import query_cache
+
+
+RETENTION_DAYS = 90
+
+# مدة الاحتفاظ لا تقل عن شهر: الإحصائيات الشهرية تقرأ آخر 30 يوماً من الصفوف اليومية
+MIN_RETENTION_DAYS = 31
+
+CHUNK_SIZE = 500
+VACUUM_PAGES = 256
+
+# (الجدول، عمود التاريخ، مفتاح الصف، شرط إضافي)
+# صفوف 'any' اليومية تبقى: صف واحد لكل يوم نشط يحتاجه حساب السلسلة
+TABLES = (
+    ("activity_events", "ts", "rowid", ""),
+    ("activity_daily", "day", "(day, kind)", f"AND kind != '{activity.ANY}'"),
+    ("statistics", "date", "rowid", ""),
+    ("reading_log", "date", "rowid", ""),
+    ("tasbih", "date", "rowid", ""),
+    ("adhkar_read", "timestamp", "rowid", ""),
+)
+
+
+def _cutoff(days):
+    """بداية الشهر الذي يقع فيه (اليوم - days): ما قبلها يُضغط"""
+    return (clock.now() - timedelta(days=days)).strftime("%Y-%m-01")
+
+
+def _delete_chunk(conn, table, column, key, extra, cutoff, chunk_size):
+    with conn:
+        return conn.execute(f"""
+            DELETE FROM {table} WHERE {key} IN (
+                SELECT {key.strip("()")} FROM {table} WHERE {column} < ? {extra} LIMIT ?
+            )
+        """, (cutoff, chunk_size)).rowcount
+
+
+def enable_incremental_vacuum():
+    """تحويل قاعدة بيانات أُنشئت دون auto_vacuum (عملية صيانة يطلبها المستخدم)
+
+    تعيد كتابة الملف كله بقفل حصري، فلا تُستدعى تلقائياً. تُرجع True إذا حُوِّلت.
+    """
+    conn = get_connection()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 0:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def incremental_vacuum(pages=VACUUM_PAGES):
+    """إرجاع الصفحات الحرة على دفعات. تُرجع عدد الصفحات المحرَّرة
+
+    قاعدة البيانات القديمة دون auto_vacuum تُترك كما هي (انظر enable_incremental_vacuum).
+    """
+    conn = get_connection()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0:
+        return 0
+    start = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    free = start
+    while free:
+        conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if remaining >= free:
+            break
+        free = remaining
+    return start - free
+
+
+def compact(days=RETENTION_DAYS, chunk_size=CHUNK_SIZE, max_chunks=None):
+    """ضغط الأشهر الأقدم من ``days`` يوماً
+
+    الحدّ الجديد يُحفظ أولاً، فإذا توقف الضغط (أو انتهى max_chunks) يكمل
+    الاستدعاء التالي من حيث توقف. المجاميع تبقى دقيقة لأن activity_monthly
+    كان محدَّثاً مع كل حدث. تُرجع {الجدول: عدد الصفوف المحذوفة}.
+    """
+    if days < MIN_RETENTION_DAYS:
+        raise ValueError(f"مدة الاحتفاظ يجب ألا تقل عن {MIN_RETENTION_DAYS} يوماً")
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO compaction_state (id, cutoff) VALUES (1, ?)
+            ON CONFLICT(id) DO UPDATE SET cutoff = MAX(cutoff, excluded.cutoff)
+        """, (_cutoff(days),))
+        # السلاسل التي تعبر الحدّ تُحفظ قبل حذف أيامها
+        activity.carry_streaks(conn)
+    cutoff = activity.compacted_before(conn)
+
+    deleted = {}
+    chunks = 0
+    for table, column, key, extra in TABLES:
+        deleted[table] = 0
+        while max_chunks is None or chunks < max_chunks:
+            count = _delete_chunk(conn, table, column, key, extra, cutoff, chunk_size)
+            chunks += 1
+            deleted[table] += count
+            if count < chunk_size:
+                break
+    query_cache.bump(query_cache.ACTIVITY)
+    incremental_vacuum()
+    return deleted
@@ -0,0 +1,131 @@
+"""
+مدير الاتصال بقاعدة البيانات
+يعطي كل خيط (thread) اتصالاً خاصاً به مضبوطاً على وضع WAL، ويُجهِّز
+المخطط مرة واحدة عند أول اتصال بكل ملف (لا شيء يحدث عند الاستيراد)
+"""
+
+import os
+import sqlite3
+import threading
+
+
+DB_PATH = os.environ.get(
+    "NOOR_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "noor.db")
+)
+
+# إعدادات الاتصال: WAL يسمح بالقراءة أثناء الكتابة من خيط آخر
+# auto_vacuum يؤثر فقط في قاعدة بيانات جديدة قبل إنشاء أي جدول
+PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA temp_store = MEMORY",
+)
+
+BUSY_TIMEOUT = 5.0
+
+
+class ConnectionManager:
+    """يملك مسار قاعدة البيانات ويوزّع اتصالاً واحداً لكل خيط"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # {الخيط: اتصاله}؛ اتصالات الخيوط المنتهية تُغلق عند فتح اتصال جديد
+        self._connections = {}
+        self._generation = 0
+        self._schema_lock = threading.Lock()
+        self._ready = set()
+
+    def get(self):
+        """اتصال الخيط الحالي (يُنشأ عند أول استخدام)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            if conn is not None:
+                # اتصال قديم تركه close_all لهذا الخيط: يُغلق هنا حيث لا يستخدمه أحد
+                with self._lock:
+                    if self._connections.get(threading.current_thread()) is conn:
+                        del self._connections[threading.current_thread()]
+                _close(conn)
+            conn = self._open()
+        return conn
+
+    @property
+    def generation(self):
+        """يزيد مع كل إغلاق للاتصالات أو تبديل لقاعدة البيانات"""
+        return self._generation
+
+    def _open(self):
+        path = self.path
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if path not in self._ready:
+            self._prepare_schema(path, conn)
+        with self._lock:
+            self._prune()
+            self._connections[threading.current_thread()] = conn
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def _prune(self):
+        """إغلاق اتصالات الخيوط التي انتهت (يُستدعى مع القفل)"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            _close(self._connections.pop(thread))
+
+    def prune(self):
+        with self._lock:
+            self._prune()
+
+    @property
+    def open_connections(self):
+        with self._lock:
+            return len(self._connections)
+
+    def _prepare_schema(self, path, conn):
+        # استيراد متأخر: migrations نفسها تستورد هذه الوحدة
+        from migrations import upgrade
+        with self._schema_lock:
+            if path not in self._ready:
+                upgrade(conn)
+                self._ready.add(path)
+
+    def configure(self, path):
+        """تغيير مسار قاعدة البيانات (للاختبارات والنقل)"""
+        self.close_all()
+        self.path = path
+        # الملف قد يكون جديداً أو استُبدل: يُفحص إصداره عند أول اتصال
+        self._ready.discard(path)
+
+    def close_all(self):
+        """إغلاق اتصالات كل الخيوط
+
+        اتصال هذا الخيط والخيوط المنتهية يُغلق فوراً. إغلاق اتصال خيط آخر
+        أثناء استعلامه يُسقط العملية، فكل خيط حي يغلق اتصاله بنفسه عند
+        طلبه التالي (الجيل الجديد يفرض فتح اتصال جديد).
+        """
+        current = threading.current_thread()
+        with self._lock:
+            for thread in list(self._connections):
+                if thread is current or not thread.is_alive():
+                    _close(self._connections.pop(thread))
+            self._generation += 1
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+manager = ConnectionManager()
+
+
+def get_connection():
+    """اختصار للحصول على اتصال الخيط الحالي"""
+    return manager.get()
@@ -0,0 +1,69 @@
+"""
+مخزن العدادات اليومية
+كل زيادة عبارة واحدة INSERT ... ON CONFLICT DO UPDATE فلا تضيع زيادات
+خيطين يكتبان في الوقت نفسه
+"""
+
+from connection import get_connection
+
+
+# اسم العداد -> (الجدول، عمود المفتاح، عمود القيمة)
+COUNTERS = {
+    "tasbih": ("tasbih", "date", "count"),
+    "reading_log": ("reading_log", "date", "pages"),
+    "ayahs_read": ("statistics", "date", "ayahs_read"),
+    "adhkar_count": ("statistics", "date", "adhkar_count"),
+    "khatma_count": ("statistics", "date", "khatma_count"),
+}
+
+_SQL = {}
+
+
+def _statements(name):
+    if name not in _SQL:
+        table, key_col, col = COUNTERS[name]
+        # الأعمدة الأخرى في الجدول نفسه تبدأ من صفر بدلاً من NULL
+        columns = [c for t, _, c in COUNTERS.values() if t == table]
+        values = ", ".join("?" if c == col else "0" for c in columns)
+        upsert = (f"INSERT INTO {table} ({key_col}, {', '.join(columns)}) VALUES (?, {values}) "
+                  f"ON CONFLICT({key_col}) DO UPDATE SET {col} = COALESCE({col}, 0) + excluded.{col} "
+                  f"RETURNING {col}")
+        select = f"SELECT {col} FROM {table} WHERE {key_col} = ?"
+        _SQL[name] = (upsert, select)
+    return _SQL[name]
+
+
+def _increment(conn, name, key, amount):
+    return conn.execute(_statements(name)[0], (key, amount)).fetchone()[0]
+
+
+def increment(name, key, amount=1):
+    """زيادة العداد ``name`` للمفتاح ``key`` وإرجاع القيمة الجديدة"""
+    conn = get_connection()
+    with conn:
+        return _increment(conn, name, key, amount)
+
+
+def increment_many(items, conn=None):
+    """زيادة عدة عدادات في معاملة واحدة
+
+    ``items`` سلسلة من (name, key, amount)، والنتيجة قاموس
+    {(name, key): القيمة الجديدة}. إذا مُرِّر ``conn`` تُنفَّذ الزيادات
+    داخل معاملة المستدعي دون commit.
+    """
+    result = {}
+    if conn is not None:
+        for name, key, amount in items:
+            result[(name, key)] = _increment(conn, name, key, amount)
+        return result
+    conn = get_connection()
+    with conn:
+        for name, key, amount in items:
+            result[(name, key)] = _increment(conn, name, key, amount)
+    return result
+
+
+def get(name, key, default=0):
+    """قراءة قيمة العداد دون تعديل"""
+    row = get_connection().execute(_statements(name)[1], (key,)).fetchone()
+    return row[0] if row and row[0] is not None else default
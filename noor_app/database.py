@@ -1,154 +1,102 @@
-import sqlite3
-from datetime import datetime, timedelta
-
-conn = sqlite3.connect("noor.db")
-c = conn.cursor()
-
-# جدول آخر قراءة
-c.execute("""
-CREATE TABLE IF NOT EXISTS last_read (
-    surah TEXT,
-    ayah INTEGER,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-
-# جدول التسبيح اليومي
-c.execute("""
-CREATE TABLE IF NOT EXISTS tasbih (
-    date DATE,
-    count INTEGER,
-    PRIMARY KEY(date)
-)
-""")
-
-# جدول الأذكار المقروءة
-c.execute("""
-CREATE TABLE IF NOT EXISTS adhkar_read (
-    adhkar_id INTEGER,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-
-# جدول الأدعية المحفوظة
-c.execute("""
-CREATE TABLE IF NOT EXISTS saved_dua (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    dua_text TEXT,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-""")
-
-# جدول سجل القراءة (صفحات/آيات يومية)
-c.execute("""
-CREATE TABLE IF NOT EXISTS reading_log (
-    date DATE PRIMARY KEY,
-    pages INTEGER
-)
-""")
-
-# جدول الإحصائيات
-c.execute("""
-CREATE TABLE IF NOT EXISTS statistics (
-    date DATE,
-    ayahs_read INTEGER,
-    adhkar_count INTEGER,
-    khatma_count INTEGER,
-    PRIMARY KEY(date)
-)
-""")
-
-# جدول خطة رمضان
-c.execute("""
-CREATE TABLE IF NOT EXISTS ramadan_plan (
-    plan_days INTEGER,
-    start_date DATE,
-    pages_read INTEGER DEFAULT 0
-)
-""")
-
-# جدول الإعدادات
-c.execute("""
-CREATE TABLE IF NOT EXISTS settings (
-    key TEXT PRIMARY KEY,
-    value TEXT
-)
-""")
-
-conn.commit()
+import atexit
+from datetime import timedelta
+
+import activity
+import clock
+import counters
+from connection import get_connection
+import query_cache
+from query_cache import cached
+from settings_store import settings
+from write_buffer import WriteBuffer
+
+
+# عداد اليوم -> نوع الحدث في سجل النشاط
+_ACTIVITY_KINDS = {"tasbih": "tasbih", "reading_log": "reading"}
+
+
+def _write_counters(items):
+    """كتابة الزيادات المجمّعة من WriteBuffer في معاملة واحدة"""
+    conn = get_connection()
+    with conn:
+        updates = []
+        events = []
+        for (name, key), amount in items:
+            if name == "ramadan_plan":
+                conn.execute("UPDATE ramadan_plan SET pages_read = pages_read + ? WHERE id = 1", (amount,))
+            else:
+                updates.append((name, key, amount))
+                events.append((_ACTIVITY_KINDS[name], amount, activity.timestamp(key)))
+        counters.increment_many(updates, conn=conn)
+        activity.record_many(events, conn=conn)
+    query_cache.bump(query_cache.ACTIVITY, query_cache.RAMADAN_PLAN)
+
+
+# الكتابات السريعة (التسبيح، سجل القراءة، خطة رمضان) تُجمع هنا وتُكتب دورياً
+write_buffer = WriteBuffer(_write_counters)
+atexit.register(write_buffer.flush)
+
 
 def save_last_read(surah, ayah):
+    conn = get_connection()
+    c = conn.cursor()
     c.execute("DELETE FROM last_read")
     c.execute("INSERT INTO last_read (surah, ayah) VALUES (?, ?)", (surah, ayah))
     conn.commit()
 
 def get_last_read():
+    c = get_connection().cursor()
     c.execute("SELECT surah, ayah FROM last_read LIMIT 1")
     result = c.fetchone()
     return result if result else ("الفاتحة", 1)
 
 def add_tasbih(count=1):
-    today = datetime.now().strftime("%Y-%m-%d")
-    c.execute("SELECT count FROM tasbih WHERE date = ?", (today,))
-    row = c.fetchone()
-    
-    if row:
-        new_count = row[0] + count
-        c.execute("UPDATE tasbih SET count = ? WHERE date = ?", (new_count, today))
-    else:
-        c.execute("INSERT INTO tasbih (date, count) VALUES (?, ?)", (today, count))
-    conn.commit()
+    today = clock.now().strftime("%Y-%m-%d")
+    # ACTIVITY يُعلن عند كتابة الدفعة في _write_counters لا مع كل ضغطة
+    write_buffer.add("tasbih", today, count)
     return get_tasbih_count()
 
 def get_tasbih_count():
-    today = datetime.now().strftime("%Y-%m-%d")
-    c.execute("SELECT count FROM tasbih WHERE date = ?", (today,))
-    row = c.fetchone()
-    return row[0] if row else 0
+    today = clock.now().strftime("%Y-%m-%d")
+    return counters.get("tasbih", today) + write_buffer.pending("tasbih", today)
 
 def update_settings(key, value):
-    c.execute("SELECT value FROM settings WHERE key = ?", (key,))
-    if c.fetchone():
-        c.execute("UPDATE settings SET value = ? WHERE key = ?", (value, key))
-    else:
-        c.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (key, value))
-    conn.commit()
+    settings.set(key, value)
 
 def get_setting(key, default=""):
-    c.execute("SELECT value FROM settings WHERE key = ?", (key,))
-    row = c.fetchone()
-    return row[0] if row else default
+    return settings.get(key, default)
 
 def get_statistics():
-    today = datetime.now().strftime("%Y-%m-%d")
-    c.execute("SELECT * FROM statistics WHERE date = ?", (today,))
-    return c.fetchone()
+    today = clock.now().strftime("%Y-%m-%d")
+    totals = activity.daily_totals(today)
+    if not totals:
+        return None
+    return (today, totals.get("ayahs", 0), totals.get("adhkar", 0), totals.get("khatma", 0))
 
 
 def log_reading(pages):
     """Log number of pages/ayahs read for today."""
-    today = datetime.now().strftime("%Y-%m-%d")
-    c.execute("SELECT pages FROM reading_log WHERE date = ?", (today,))
-    row = c.fetchone()
-    if row:
-        new_count = row[0] + pages
-        c.execute("UPDATE reading_log SET pages = ? WHERE date = ?", (new_count, today))
-    else:
-        c.execute("INSERT INTO reading_log (date, pages) VALUES (?, ?)", (today, pages))
-    conn.commit()
+    today = clock.now().strftime("%Y-%m-%d")
+    write_buffer.add("reading_log", today, pages)
     return get_reading_pages(today)
 
 
 def get_reading_pages(date):
-    c.execute("SELECT pages FROM reading_log WHERE date = ?", (date,))
-    row = c.fetchone()
-    return row[0] if row else 0
+    return counters.get("reading_log", date) + write_buffer.pending("reading_log", date)
 
 
 def get_average_reading(days=7):
     """Return average pages read per day over past given days."""
-    start = (datetime.now() - timedelta(days=days-1)).strftime("%Y-%m-%d")
-    c.execute("SELECT AVG(pages) FROM reading_log WHERE date >= ?", (start,))
+    # aggregate over the table, so pending increments must land first
+    write_buffer.flush()
+    return _average_reading(days)
+
+
+@cached(query_cache.ACTIVITY)
+def _average_reading(days):
+    c = get_connection().cursor()
+    start = (clock.now() - timedelta(days=days-1)).strftime("%Y-%m-%d")
+    c.execute("SELECT AVG(total) FROM activity_daily WHERE day >= ? AND kind = 'reading'", (start,))
     row = c.fetchone()
     return row[0] if row and row[0] is not None else 0
 
@@ -157,20 +105,25 @@ def get_average_reading(days=7):
 
 def set_ramadan_plan(days):
     """Start a new Ramadan reading plan with the given number of days."""
-    today = datetime.now().strftime("%Y-%m-%d")
+    conn = get_connection()
+    c = conn.cursor()
+    today = clock.now().strftime("%Y-%m-%d")
     # only one plan at a time
-    c.execute("DELETE FROM ramadan_plan")
-    c.execute("INSERT INTO ramadan_plan (plan_days, start_date, pages_read) VALUES (?, ?, 0)",
+    write_buffer.discard("ramadan_plan")
+    c.execute("INSERT OR REPLACE INTO ramadan_plan (id, plan_days, start_date, pages_read) VALUES (1, ?, ?, 0)",
               (days, today))
     conn.commit()
+    query_cache.bump(query_cache.RAMADAN_PLAN)
 
 
 def get_ramadan_plan():
     """Return current plan as dict or None."""
-    c.execute("SELECT plan_days, start_date, pages_read FROM ramadan_plan LIMIT 1")
+    c = get_connection().cursor()
+    c.execute("SELECT plan_days, start_date, pages_read FROM ramadan_plan WHERE id = 1")
     row = c.fetchone()
     if row:
-        return {"plan_days": row[0], "start_date": row[1], "pages_read": row[2]}
+        pages_read = row[2] + write_buffer.pending("ramadan_plan", None)
+        return {"plan_days": row[0], "start_date": row[1], "pages_read": pages_read}
     return None
 
 
@@ -182,8 +135,9 @@ def add_ramadan_pages(pages=1):
     if not plan:
         return None
     new_total = plan["pages_read"] + pages
-    c.execute("UPDATE ramadan_plan SET pages_read = ?", (new_total,))
-    conn.commit()
+    write_buffer.add("ramadan_plan", None, pages)
+    # get_ramadan_plan_stats يقرأ الصفحات المعلّقة أيضاً، فيُبطل فوراً
+    query_cache.bump(query_cache.RAMADAN_PLAN)
     # also log in reading log for deeper stats
     log_reading(pages)
     return new_total
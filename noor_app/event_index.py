@@ -0,0 +1,116 @@
+"""
+فهرس المناسبات الإسلامية
+كل مناسبة في ISLAMIC_EVENTS تُسقط على تاريخها الميلادي في كل سنة هجرية من
+نافذة حول اليوم، وتُحفظ مرتبة في مصفوفة أيام epoch؛ "المناسبات القادمة"
+و"مناسبات فترة" والعدّ التنازلي كلها بحث ثنائي. النافذة تُبنى من جديد فقط
+إذا خرج الاستعلام منها، والانتقال إلى السنة الهجرية التالية يتم تلقائياً
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+import clock
+from hijri_utils import gregorian_to_hijri, hijri_month_length, hijri_to_gregorian
+from islamic_data import ISLAMIC_EVENTS
+
+
+EPOCH = date(1970, 1, 1)
+YEARS_BEHIND = 1
+YEARS_AHEAD = 10
+
+
+class EventIndex:
+    """المناسبات مسقطة على الأيام الميلادية لعدة سنوات هجرية"""
+
+    def __init__(self, events=None, years_behind=YEARS_BEHIND, years_ahead=YEARS_AHEAD):
+        self.events = ISLAMIC_EVENTS if events is None else events
+        self.years_behind = years_behind
+        self.years_ahead = years_ahead
+        self._lock = threading.Lock()
+        # (أيام epoch مرتبة، [(التاريخ، الاسم، الهجري)]) يُستبدلان معاً
+        self._table = (array("l"), [])
+        self.builds = 0
+
+    def build(self, around, years_ahead=None):
+        """إسقاط المناسبات على السنوات الهجرية حول التاريخ around
+
+        years_ahead يوسّع النافذة لهذا البناء وحده (الافتراضي self.years_ahead).
+        """
+        year = gregorian_to_hijri(around)[0]
+        ahead = max(self.years_ahead, years_ahead or 0)
+        items = []
+        for hijri_year in range(year - self.years_behind, year + ahead + 1):
+            for (month, day), name in self.events.items():
+                # يوم 30 غير موجود في شهر من 29 يوماً
+                if day > hijri_month_length(hijri_year, month):
+                    continue
+                when = hijri_to_gregorian(hijri_year, month, day)
+                items.append(((when - EPOCH).days, when, name, (hijri_year, month, day)))
+        items.sort(key=lambda item: item[0])
+        with self._lock:
+            self._table = (array("l", (item[0] for item in items)), [item[1:] for item in items])
+            self.builds += 1
+
+    def _covering(self, first, last):
+        """الجدول بعد التأكد من أن الأيام first..last (أيام epoch) داخل النافذة"""
+        days = self._table[0]
+        if not days or first < days[0] or last > days[-1]:
+            # نطاق أطول من النافذة: سنوات تكفيه كلها في هذا البناء فقط
+            self.build(EPOCH + timedelta(days=first), (last - first) // 354 + 2)
+        return self._table
+
+    @staticmethod
+    def _event(entry, today=None):
+        when, name, hijri = entry
+        event = {"date": when, "name": name, "hijri": hijri}
+        if today is not None:
+            event["days_left"] = (when - today).days
+        return event
+
+    def next_events(self, k=1, today=None):
+        """أقرب k مناسبات من اليوم (شاملاً) مع عدد الأيام المتبقية"""
+        today = today or clock.today()
+        first = (today - EPOCH).days
+        days, entries = self._covering(first, first + 366)
+        index = bisect_left(days, first)
+        return [self._event(entry, today) for entry in entries[index:index + k]]
+
+    def events_between(self, start, end):
+        """المناسبات من start إلى end (شاملة) مرتبة"""
+        first, last = (start - EPOCH).days, (end - EPOCH).days
+        if last < first:
+            return []
+        days, entries = self._covering(first, last)
+        return [self._event(entry) for entry in entries[bisect_left(days, first):bisect_right(days, last)]]
+
+    def events_on(self, day=None):
+        day = day or clock.today()
+        return self.events_between(day, day)
+
+    def countdown(self, today=None):
+        """(المناسبة القادمة، الأيام المتبقية) أو (None, None)"""
+        upcoming = self.next_events(1, today)
+        if not upcoming:
+            return None, None
+        return upcoming[0], upcoming[0]["days_left"]
+
+
+index = EventIndex()
+
+
+def next_events(k=1, today=None):
+    return index.next_events(k, today)
+
+
+def events_between(start, end):
+    return index.events_between(start, end)
+
+
+def events_on(day=None):
+    return index.events_on(day)
+
+
+def countdown(today=None):
+    return index.countdown(today)
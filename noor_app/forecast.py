@@ -0,0 +1,161 @@
+"""
+توقّع موعد إتمام الختمة من سرعة القراءة الأخيرة
+السرعة متوسط أُسّي للصفحات اليومية مع معامل لكل يوم من أيام الأسبوع؛
+النموذج يُبنى مرة من آخر أسابيع قليلة ثم يُطوى فيه كل يوم مكتمل جديد فقط
+"""
+
+import math
+import threading
+from datetime import date, timedelta
+
+import clock
+from connection import get_connection, manager
+from database import get_ramadan_plan, get_reading_pages
+from khatma import get_khatma_pages
+
+
+TOTAL_PAGES = 604
+
+# نصف عمر تقريبي أسبوع: متوسط أُسّي بامتداد 14 يوماً
+SPAN_DAYS = 14
+SEASON_WEIGHT = 0.15
+# الموسمية لا تُحدَّث قبل أسبوع كامل من البيانات
+SEASON_WARMUP = 7
+HISTORY_DAYS = 56
+# نطاق ثقة 80%
+Z_SCORE = 1.2816
+MAX_DAYS = 3 * 365
+
+
+class KhatmaForecaster:
+    """نموذج السرعة اليومية، يُحدَّث تدريجياً بالأيام المكتملة"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.rate = 0.0
+        self.variance = 0.0
+        self.season = [1.0] * 7
+        self.days = 0
+        self._through = None
+        self._generation = None
+
+    def _fold(self, day, pages):
+        """إضافة يوم مكتمل إلى النموذج"""
+        weekday = day.weekday()
+        deseasoned = pages / self.season[weekday]
+        if self.days == 0:
+            self.rate = deseasoned
+        else:
+            alpha = 2 / (SPAN_DAYS + 1)
+            diff = deseasoned - self.rate
+            self.rate += alpha * diff
+            self.variance = (1 - alpha) * (self.variance + alpha * diff * diff)
+        if self.days >= SEASON_WARMUP and self.rate > 0:
+            ratio = pages / self.rate
+            self.season[weekday] += SEASON_WEIGHT * (ratio - self.season[weekday])
+            # المعاملات متوسطها 1 حتى تبقى rate سرعة يوم عادي
+            mean = sum(self.season) / 7
+            if mean > 0:
+                self.season = [factor / mean for factor in self.season]
+        self.days += 1
+
+    def sync(self):
+        """طيّ الأيام المكتملة منذ آخر مزامنة (عادةً لا شيء أو يوم واحد)"""
+        yesterday = clock.today() - timedelta(days=1)
+        with self._lock:
+            if self._generation != manager.generation:
+                self.reset()
+                self._generation = manager.generation
+            if self._through is not None and self._through >= yesterday:
+                return
+            if self._through is not None:
+                start = self._through + timedelta(days=1)
+            else:
+                start = yesterday - timedelta(days=HISTORY_DAYS - 1)
+            rows = dict(get_connection().execute("""
+                SELECT day, total FROM activity_daily
+                WHERE kind = 'reading' AND day BETWEEN ? AND ?
+            """, (start.isoformat(), yesterday.isoformat())).fetchall())
+            if self._through is None:
+                # البداية من أول يوم قراءة في النافذة، لا من أيام فارغة قبله
+                start = date.fromisoformat(min(rows)) if rows else yesterday + timedelta(days=1)
+            day = start
+            while day <= yesterday:
+                self._fold(day, rows.get(day.isoformat(), 0))
+                day += timedelta(days=1)
+            self._through = yesterday
+
+    def expected(self, day):
+        """الصفحات المتوقعة في يوم معين"""
+        return self.rate * self.season[day.weekday()]
+
+    def forecast(self, remaining=None, deadline=None):
+        """توقّع الإتمام لصفحات متبقية (الافتراضي: باقي الختمة الحالية)
+
+        تُرجع قاموساً فيه السرعة والتاريخ المتوقع ونطاق الثقة
+        (الأبكر، الأبعد) والصفحات اليومية اللازمة لبلوغ deadline.
+        التواريخ None إذا كانت السرعة صفراً أو تجاوزت المدى.
+        """
+        self.sync()
+        today = clock.today()
+        if remaining is None:
+            remaining = TOTAL_PAGES - get_khatma_pages()
+        remaining = max(0, remaining)
+        read_today = get_reading_pages(today.isoformat())
+
+        projected = early = late = None
+        if remaining == 0:
+            projected = early = late = today
+        elif self.rate > 0:
+            spread = Z_SCORE * math.sqrt(self.variance)
+            total = 0.0
+            for k in range(MAX_DAYS):
+                day = today + timedelta(days=k)
+                pages = self.expected(day)
+                if k == 0:
+                    pages = max(0.0, pages - read_today)
+                total += pages
+                band = spread * math.sqrt(k + 1)
+                if early is None and total + band >= remaining:
+                    early = day
+                if projected is None and total >= remaining:
+                    projected = day
+                if total - band >= remaining:
+                    late = day
+                    break
+
+        result = {
+            "rate": round(self.rate, 2),
+            "remaining": remaining,
+            "projected_date": projected,
+            "band": (early, late),
+            "needed_per_day": None,
+            "on_track": None,
+        }
+        if deadline is not None:
+            days_left = (deadline - today).days + 1
+            if days_left > 0:
+                result["needed_per_day"] = math.ceil(remaining / days_left)
+            result["on_track"] = projected is not None and projected <= deadline
+        return result
+
+
+forecaster = KhatmaForecaster()
+
+
+def forecast(remaining=None, deadline=None):
+    """توقّع إتمام الختمة (انظر KhatmaForecaster.forecast)"""
+    return forecaster.forecast(remaining, deadline)
+
+
+def forecast_ramadan_plan():
+    """توقّع إتمام خطة رمضان الحالية قبل نهايتها، أو None بلا خطة"""
+    plan = get_ramadan_plan()
+    if not plan:
+        return None
+    start = date.fromisoformat(plan["start_date"])
+    deadline = start + timedelta(days=plan["plan_days"] - 1)
+    return forecaster.forecast(TOTAL_PAGES - plan["pages_read"], deadline)
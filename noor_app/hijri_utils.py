@@ -1,24 +1,66 @@
-from datetime import datetime
+"""
+التقويم الهجري
+التحويل بجدول أم القرى: بداية كل شهر من 1343 إلى 1500 هـ (1924–2077 م)
+كرقم يوم منذ 1970-01-01 في مصفوفة مرتبة، فالتحويل في الاتجاهين بحث ثنائي
+أو فهرسة مباشرة. خارج الجدول يُستخدم الحساب الجدولي (المدني)
 
+لنطاقات الأيام (تقويم سنة أو عقد) تحوّل jd_to_hijri_range كل الأيام دفعة
+واحدة: بـ NumPy إن وُجدت، وإلا بالمرور على الأشهر بالتتابع
+"""
 
-def gregorian_to_hijri(g_date: datetime):
-    """Convert a Gregorian date to Hijri (Islamic) date using civil algorithm.
-    Returns a tuple (year, month, day).
-    Algorithm adopted from the Umm al-Qura / civil conversion.
-    """
-    # based on algorithm from https://en.wikipedia.org/wiki/Tabular_Islamic_calendar
-    # this function works for years in a reasonable modern range
-    day = g_date.day
-    month = g_date.month
-    year = g_date.year
-
-    a = (14 - month) // 12
-    y = year + 4800 - a
-    m = month + 12 * a - 3
-    # Julian day
-    jd = day + ((153 * m + 2) // 5) + 365 * y + y // 4 - y // 100 + y // 400 - 32045
-
-    # Islamic date
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from itertools import accumulate, repeat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+UMM_AL_QURA_FIRST_YEAR = 1343
+UMM_AL_QURA_LAST_YEAR = 1500
+# 1343/01/01 = 1924-08-01
+_UMM_AL_QURA_START = -16589
+# أطوال الأشهر: كل خانة ست عشرية شهران، لكل شهر بتّان (الطول - 28) والشهر
+# الأول في البتين العلويين؛ 6 خانات لكل سنة و12 سنة في كل سطر
+_UMM_AL_QURA_LENGTHS = (
+    "9a6a2a59999999d8a65a69695a69a5999a5c999a8e6659a69995a69999999a6696666999"
+    "9999a6599a5999999aa65969a9965999999a99999999999999999a9998a999999a999999"
+    "99999999999a999a6999999999666a66659a666666999a5a99996965a99996669a999999"
+    "6666669999999a65999a69666699999999999a59a9a5999a59999a69999999999a999a65"
+    "99999a59999a99599a9999699a65999a9966669999999a66666669a6599a666599a99966"
+    "6a665969a9965a69999999a66666669999669a66599a9996669a65969a9965a69a5966a6"
+    "6659a699996699a66599a9996669a6659aa6595aa69656a69996669a65999a66996669a6"
+    "599a69965a9a65969a6966666999966a66659a69996669a59999a66666669a59969a9659"
+    "9a999666a66599a69966669999999a6696666a65966a69659a9999669a66599a69996669"
+    "a65999a996666a59996a66665a66999666a665969a9965a6a65969a6665a6699999999a6"
+    "659a6999666a66596a9996669a65999a66665a69a59699a9659a699996699a6599a69966"
+    "66a65966a69659a6a59669a66599a669666669a6599a69965a6a65969a6965a66a59999a"
+    "66659a6999666a66599a699666699a5999a69665a6a59666a66599a9996669a59999a666"
+    "666669a5966a"
+)
+
+EPOCH = date(1970, 1, 1)
+# date.toordinal() + هذا = رقم اليوم اليولياني
+_JD_OFFSET = 1721425
+
+
+def _month_starts():
+    lengths = []
+    for digit in _UMM_AL_QURA_LENGTHS:
+        value = int(digit, 16)
+        lengths += (28 + (value >> 2), 28 + (value & 3))
+    return array("l", accumulate(lengths, initial=_UMM_AL_QURA_START))
+
+
+# بداية كل شهر في الجدول، والعنصر الأخير نهاية آخر شهر
+MONTH_STARTS = _month_starts()
+
+
+def _tabular(jd):
+    """الحساب الجدولي: رقم يوم يولياني (أو مصفوفة NumPy منها) إلى (سنة، شهر، يوم)"""
     l = jd - 1948440 + 10632
     n = (l - 1) // 10631
     l = l - 10631 * n + 354
@@ -27,9 +69,154 @@ def gregorian_to_hijri(g_date: datetime):
     m = (24 * l) // 709
     d = l - (709 * m) // 24
     y = 30 * n + j - 30
+    return y, m, d
+
+
+def _tabular_from_jd(jd):
+    y, m, d = _tabular(jd)
     return int(y), int(m), int(d)
 
 
+def _tabular_to_jd(year, month, day):
+    return (day + 29 * (month - 1) + (6 * month - 1) // 11 + (11 * year + 3) // 30
+            + 354 * (year - 1) + 1948439)
+
+
+def _month_index(year, month):
+    """موضع الشهر في MONTH_STARTS أو None خارج الجدول"""
+    index = (year - UMM_AL_QURA_FIRST_YEAR) * 12 + month - 1
+    if 0 <= index < len(MONTH_STARTS) - 1:
+        return index
+    return None
+
+
+def gregorian_to_hijri(g_date: datetime):
+    """Convert a Gregorian date (date or datetime) to Hijri (Islamic) date.
+    Returns a tuple (year, month, day).
+    Umm al-Qura within 1343-1500 AH, tabular civil algorithm outside it.
+    """
+    day = (date(g_date.year, g_date.month, g_date.day) - EPOCH).days
+    if MONTH_STARTS[0] <= day < MONTH_STARTS[-1]:
+        index = bisect_right(MONTH_STARTS, day) - 1
+        return (UMM_AL_QURA_FIRST_YEAR + index // 12, index % 12 + 1,
+                day - MONTH_STARTS[index] + 1)
+    return _tabular_from_jd(day + EPOCH.toordinal() + _JD_OFFSET)
+
+
+def _tabular_month_length(year, month):
+    return 30 if month % 2 or (month == 12 and (11 * year + 14) % 30 < 11) else 29
+
+
+def hijri_month_length(year, month):
+    index = _month_index(year, month)
+    if index is not None:
+        return MONTH_STARTS[index + 1] - MONTH_STARTS[index]
+    if (year, month) == (UMM_AL_QURA_FIRST_YEAR - 1, 12):
+        # الحساب الجدولي لا يلتقي بالجدول: آخر شهر قبله ينتهي قبل بدايته بيوم
+        start = _tabular_to_jd(year, month, 1) - _JD_OFFSET - EPOCH.toordinal()
+        return MONTH_STARTS[0] - start
+    return _tabular_month_length(year, month)
+
+
+def hijri_to_gregorian(year, month, day=1):
+    """Convert a Hijri date to a Gregorian date (datetime.date)."""
+    if not 1 <= month <= 12 or not 1 <= day <= hijri_month_length(year, month):
+        raise ValueError(f"تاريخ هجري غير صحيح: {year}/{month}/{day}")
+    index = _month_index(year, month)
+    if index is not None:
+        return EPOCH + timedelta(days=MONTH_STARTS[index] + day - 1)
+    return date.fromordinal(_tabular_to_jd(year, month, day) - _JD_OFFSET)
+
+
+def hijri_month_dates(year, month):
+    """Gregorian dates (YYYY-MM-DD) of every day in a Hijri month."""
+    start = hijri_to_gregorian(year, month)
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range(hijri_month_length(year, month))]
+
+
+def gregorian_to_jd(g_date):
+    """رقم اليوم اليولياني لتاريخ ميلادي"""
+    return g_date.toordinal() + _JD_OFFSET
+
+
+def _segments(first, last):
+    """تقسيم أيام epoch من first إلى last إلى [(البداية، النهاية، في الجدول؟)]"""
+    low, high = MONTH_STARTS[0], MONTH_STARTS[-1] - 1
+    parts = []
+    if first < low:
+        parts.append((first, min(last, low - 1), False))
+    if first <= high and last >= low:
+        parts.append((max(first, low), min(last, high), True))
+    if last > high:
+        parts.append((max(first, high + 1), last, False))
+    return parts
+
+
+def _numpy_range(first, last):
+    days = np.arange(first, last + 1)
+    years, months, result = (np.empty(len(days), dtype=np.int64) for _ in range(3))
+    starts = np.asarray(MONTH_STARTS, dtype=np.int64)
+    inside = (days >= starts[0]) & (days < starts[-1])
+    index = np.searchsorted(starts, days[inside], side="right") - 1
+    years[inside] = UMM_AL_QURA_FIRST_YEAR + index // 12
+    months[inside] = index % 12 + 1
+    result[inside] = days[inside] - starts[index] + 1
+    outside = ~inside
+    if outside.any():
+        years[outside], months[outside], result[outside] = _tabular(
+            days[outside] + EPOCH.toordinal() + _JD_OFFSET)
+    return years, months, result
+
+
+def _python_range(first, last):
+    """المرور على الأشهر بالتتابع: كل شهر يُضاف دفعة واحدة"""
+    years, months, days = array("l"), array("l"), array("l")
+
+    def extend(y, m, d, n):
+        years.extend(repeat(y, n))
+        months.extend(repeat(m, n))
+        days.extend(range(d, d + n))
+
+    for low, high, in_table in _segments(first, last):
+        day = low
+        if in_table:
+            index = bisect_right(MONTH_STARTS, low) - 1
+            while day <= high:
+                n = min(high, MONTH_STARTS[index + 1] - 1) - day + 1
+                extend(UMM_AL_QURA_FIRST_YEAR + index // 12, index % 12 + 1,
+                       day - MONTH_STARTS[index] + 1, n)
+                day += n
+                index += 1
+        else:
+            y, m, d = _tabular_from_jd(low + EPOCH.toordinal() + _JD_OFFSET)
+            while day <= high:
+                n = min(high - day + 1, _tabular_month_length(y, m) - d + 1)
+                extend(y, m, d, n)
+                day += n
+                y, m, d = (y + 1, 1, 1) if m == 12 else (y, m + 1, 1)
+    return years, months, days
+
+
+def jd_to_hijri_range(start_jd, end_jd):
+    """تحويل كل يوم يولياني من start_jd إلى end_jd (شاملة) إلى هجري
+
+    تُرجع ثلاث مصفوفات متوازية (السنوات، الأشهر، الأيام): مصفوفات NumPy
+    إن وُجدت، وإلا array('l').
+    """
+    offset = EPOCH.toordinal() + _JD_OFFSET
+    first, last = start_jd - offset, end_jd - offset
+    if np is not None:
+        return _numpy_range(first, last)
+    return _python_range(first, last)
+
+
+def hijri_range(start, end):
+    """مثل jd_to_hijri_range لتاريخين ميلاديين (date أو datetime)"""
+    return jd_to_hijri_range(gregorian_to_jd(date(start.year, start.month, start.day)),
+                             gregorian_to_jd(date(end.year, end.month, end.day)))
+
+
 def get_hijri_date():
     """Return formatted hijri date string like '1447/06/09'."""
     today = datetime.now()
@@ -38,28 +225,6 @@ def get_hijri_date():
 
 
 def get_ramadan_gregorian_dates():
-    """Return list of gregorian dates (YYYY-MM-DD) that correspond to Ramadan of the current hijri year.
-    Uses incremental search via conversion; may be off by a day depending on lunar sighting but gives reasonable approximation.
-    """
-    from datetime import timedelta
-    date = datetime.now()
-    start = None
-    # search backwards up to a year to find 1st of Ramadan
-    for i in range(370):
-        y, m, d = gregorian_to_hijri(date)
-        if m == 9 and d == 1:
-            start = date
-            break
-        date -= timedelta(days=1)
-    if not start:
-        return []
-    # collect days until month changes
-    result = []
-    cur = start
-    while True:
-        y, m, d = gregorian_to_hijri(cur)
-        if m != 9:
-            break
-        result.append(cur.strftime("%Y-%m-%d"))
-        cur += timedelta(days=1)
-    return result
+    """Return list of gregorian dates (YYYY-MM-DD) that correspond to Ramadan of the current hijri year."""
+    y, m, d = gregorian_to_hijri(datetime.now())
+    return hijri_month_dates(y, 9)
@@ -0,0 +1,246 @@
+"""
+عميل HTTP لكل الطلبات الخارجية
+جلسة واحدة تعيد استخدام الاتصالات، وإعادة المحاولة بتأخير عشوائي متزايد،
+وقاطع دائرة لكل خادم، وطلبات مشروطة (ETag / Last-Modified)، واستجابات
+محفوظة في جدول http_cache تُقدَّم فوراً وإن قدمت ثم تُجدَّد في الخلفية
+(stale-while-revalidate)
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import clock
+from connection import get_connection
+
+
+# (الاتصال، القراءة) بالثواني
+TIMEOUT = (3, 5)
+RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2.0
+POOL_SIZE = 8
+# قاطع الدائرة: يفتح بعد FAILURE_THRESHOLD طلبات فاشلة متتالية ويسمح
+# بطلب تجريبي واحد بعد RESET_SECONDS
+FAILURE_THRESHOLD = 3
+RESET_SECONDS = 60
+# الاستجابات المحفوظة الأقدم من هذا تُحذف
+PRUNE_SECONDS = 60 * 24 * 3600
+PRUNE_EVERY = 200
+
+
+class HttpError(Exception):
+    """تعذر الحصول على استجابة صالحة"""
+
+
+class CircuitOpenError(HttpError):
+    """الخادم معطّل مؤقتاً فلم يُرسل الطلب"""
+
+
+class CircuitBreaker:
+    """مغلق ← مفتوح بعد threshold فشلاً ← نصف مفتوح بعد reset_seconds"""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS,
+                 monotonic=time.monotonic):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._monotonic = monotonic
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self._monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """هل يُرسل الطلب؟ في نصف المفتوح يمر طلب واحد ويُعاد فتح المهلة للبقية"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = self._monotonic()
+            if now - self.opened_at >= self.reset_seconds:
+                self.opened_at = now
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = self._monotonic()
+
+
+class HttpClient:
+    """طلبات GET تُرجع JSON، مع الحفظ والتجديد وإعادة المحاولة"""
+
+    def __init__(self, retries=RETRIES, timeout=TIMEOUT, sleep=time.sleep,
+                 monotonic=time.monotonic):
+        self.retries = retries
+        self.timeout = timeout
+        self._sleep = sleep
+        self._monotonic = monotonic
+        self._lock = threading.Lock()
+        self._session = None
+        self._executor = None
+        self._breakers = {}
+        self._revalidating = set()
+        self._writes = 0
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def breaker(self, url):
+        """قاطع الدائرة لخادم الرابط"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(monotonic=self._monotonic)
+            return self._breakers[host]
+
+    # الاستجابات المحفوظة
+
+    def _load(self, url):
+        return get_connection().execute(
+            "SELECT etag, last_modified, body, stored FROM http_cache WHERE url = ?", (url,)
+        ).fetchone()
+
+    def _store(self, url, response, body):
+        conn = get_connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?)", (
+                url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                body, clock.now().timestamp()))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM http_cache WHERE stored < ?",
+                             (clock.now().timestamp() - PRUNE_SECONDS,))
+
+    def _touch(self, url):
+        conn = get_connection()
+        with conn:
+            conn.execute("UPDATE http_cache SET stored = ? WHERE url = ?",
+                         (clock.now().timestamp(), url))
+
+    # الشبكة
+
+    def _backoff(self, attempt):
+        """تأخير عشوائي كامل بين 0 و BACKOFF_BASE × 2^attempt"""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def _fetch(self, url, cached=None):
+        """طلب الرابط (مشروطاً إذا وُجدت نسخة محفوظة) وإرجاع JSON"""
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(urlsplit(url).netloc)
+        headers = {}
+        if cached is not None:
+            etag, last_modified = cached[0], cached[1]
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._sleep(self._backoff(attempt - 1))
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                continue
+            status = response.status_code
+            if status >= 500 or status == 429:
+                error = HttpError(f"HTTP {status}")
+                continue
+            # الخادم يرد، فحتى أخطاء 4xx لا تُحسب على القاطع
+            breaker.success()
+            if status == 304 and cached is not None:
+                self._touch(url)
+                return json.loads(cached[2])
+            if status >= 400:
+                raise HttpError(f"HTTP {status}")
+            try:
+                data = response.json()
+            except ValueError as e:
+                raise HttpError(f"invalid JSON from {url}") from e
+            self._store(url, response, response.text)
+            return data
+        breaker.failure()
+        raise HttpError(f"failed to fetch {url}: {error}") from error
+
+    def revalidate(self, url):
+        """تجديد النسخة المحفوظة من الرابط الآن"""
+        try:
+            return self._fetch(url, self._load(url))
+        finally:
+            with self._lock:
+                self._revalidating.discard(url)
+
+    def _revalidate_later(self, url):
+        with self._lock:
+            if url in self._revalidating:
+                return
+            self._revalidating.add(url)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="noor-http")
+            future = self._executor.submit(self.revalidate, url)
+        future.add_done_callback(lambda f: f.exception())
+
+    def get_json(self, url, max_age=3600, stale=24 * 3600):
+        """JSON الرابط
+
+        النسخة المحفوظة الأحدث من max_age ثانية تُرجع دون شبكة، والأقدم منها
+        بما لا يتجاوز stale تُرجع فوراً وتُجدَّد في الخلفية. عند فشل الشبكة
+        تُرجع أي نسخة محفوظة مهما قدمت، وإلا يُرفع HttpError.
+        """
+        cached = self._load(url)
+        if cached is not None:
+            age = clock.now().timestamp() - cached[3]
+            if age < max_age:
+                return json.loads(cached[2])
+            if age < max_age + stale:
+                self._revalidate_later(url)
+                return json.loads(cached[2])
+        try:
+            return self._fetch(url, cached)
+        except HttpError:
+            if cached is not None:
+                return json.loads(cached[2])
+            raise
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            session, self._session = self._session, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        if session is not None:
+            session.close()
+
+
+client = HttpClient()
@@ -1,47 +1,45 @@
-import sqlite3
+import activity
+from connection import get_connection
+import query_cache
 
-conn = sqlite3.connect("noor.db")
-c = conn.cursor()
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS khatma (
-    pages INTEGER,
-    completed INTEGER DEFAULT 0
-)
-""")
 
 def update_khatma(pages):
     """إضافة صفحات للختمة"""
-    c.execute("SELECT pages FROM khatma")
-    row = c.fetchone()
-
-    if row:
-        new_pages = row[0] + pages
-        if new_pages >= 604:
-            print("تمت الختمة 🎉")
-            increment_completed()
-            new_pages = 0
-        c.execute("UPDATE khatma SET pages=?", (new_pages,))
-    else:
-        c.execute("INSERT INTO khatma VALUES (?, 0)", (pages,))
-
-    conn.commit()
+    conn = get_connection()
+    with conn:
+        # صف واحد فقط؛ ما زاد على 604 صفحة يُحسب ختمة ويُرحَّل الباقي
+        new_pages = conn.execute("""
+            INSERT INTO khatma (id, pages, completed) VALUES (1, ? % 604, ? / 604)
+            ON CONFLICT(id) DO UPDATE SET
+                completed = completed + excluded.completed + (pages + excluded.pages) / 604,
+                pages = (pages + excluded.pages) % 604
+            RETURNING pages
+        """, (pages, pages)).fetchone()[0]
+        # الصفحات الجديدة أقل من المضافة فقط إذا اكتملت ختمة:
+        # old + pages = new_pages + 604 * completed
+        completed = max(0, -(-(pages - new_pages) // 604))
+        activity.record_many([("khatma", completed, None)], conn=conn)
+    query_cache.bump(query_cache.KHATMA, query_cache.ACTIVITY)
+    if completed:
+        print("تمت الختمة 🎉")
 
 def get_khatma_pages():
     """الحصول على عدد الصفحات المقروءة"""
-    c.execute("SELECT pages FROM khatma")
+    c = get_connection().cursor()
+    c.execute("SELECT pages FROM khatma WHERE id = 1")
     row = c.fetchone()
     return row[0] if row else 0
 
 def get_completed_khatmas():
     """الحصول على عدد الختمات المكتملة"""
-    c.execute("SELECT completed FROM khatma LIMIT 1")
+    c = get_connection().cursor()
+    c.execute("SELECT completed FROM khatma WHERE id = 1")
     row = c.fetchone()
     return row[0] if row else 0
 
 def increment_completed():
     """إضافة 1 للختمات المكتملة"""
-    c.execute("UPDATE khatma SET completed = completed + 1")
+    conn = get_connection()
+    conn.execute("UPDATE khatma SET completed = completed + 1 WHERE id = 1")
     conn.commit()
-
-conn.commit()
\ No newline at end of file
+    query_cache.bump(query_cache.KHATMA)
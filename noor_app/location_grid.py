@@ -0,0 +1,64 @@
+"""
+شبكة المواقع لمشاركة مواقيت الصلاة
+كل الإحداثيات داخل خلية واحدة تأخذ مواقيت مركزها، فالتنقل القليل أو إعادة
+إدخال الموقع لا يكلّف حساباً أو جلباً جديداً. حجم الخلية يُختار لكل خط عرض
+بحيث لا يتجاوز الخطأ في أي وقت حدّاً بالدقائق (إعداد location_error_minutes)
+"""
+
+import math
+from datetime import date
+from functools import lru_cache
+
+from prayer_calc import prayer_hours
+
+
+# أحجام الخلايا المتاحة بالدرجات، من الأدق إلى الأخشن
+GRID_SIZES = (0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5)
+DEFAULT_ERROR_MINUTES = 0.5
+# المراكز تُخزَّن أعداداً صحيحة بهذه الوحدة (≈ 11 م)
+KEY_SCALE = 10000
+
+# الانقلابان والاعتدال: أقصى ميل للشمس وأدناه
+_SAMPLE_DAYS = (date(2025, 3, 20), date(2025, 6, 21), date(2025, 12, 21))
+_PRAYERS = ("fajr", "sunrise", "dhuhr", "asr", "maghrib", "isha")
+
+
+@lru_cache(maxsize=512)
+def error_minutes(lat, grid, method="ISNA", asr="shafi"):
+    """أقصى فرق بالدقائق بين مواقيت مركز خلية عند خط العرض lat ومواقيت أركانها"""
+    half = grid / 2
+    worst = 0.0
+    for day in _SAMPLE_DAYS:
+        center = prayer_hours(lat, 0, day, 0, method, asr)
+        for dlat in (-half, half):
+            for dlon in (-half, half):
+                corner = prayer_hours(max(-89.9, min(89.9, lat + dlat)), dlon, day, 0, method, asr)
+                for name in _PRAYERS:
+                    diff = abs(corner[name] - center[name]) * 60
+                    if not math.isnan(diff):
+                        worst = max(worst, diff)
+    return worst
+
+
+@lru_cache(maxsize=512)
+def grid_for(lat_band, max_error=DEFAULT_ERROR_MINUTES, method="ISNA", asr="shafi"):
+    """أكبر حجم خلية لخط العرض (بالدرجات الصحيحة) خطؤه لا يتجاوز max_error دقيقة"""
+    chosen = GRID_SIZES[0]
+    for grid in GRID_SIZES:
+        # الطرف الأبعد عن خط الاستواء من الشريحة هو الأسوأ
+        edge = min(89.5, abs(lat_band) + 0.5)
+        if error_minutes(edge, grid, method, asr) > max_error:
+            break
+        chosen = grid
+    return chosen
+
+
+def cell(lat, lon, max_error=DEFAULT_ERROR_MINUTES, method="ISNA", asr="shafi"):
+    """(مركز خط العرض، مركز خط الطول، حجم الخلية) للإحداثيات"""
+    grid = grid_for(round(lat), max_error, method, asr)
+    return round(round(lat / grid) * grid, 6), round(round(lon / grid) * grid, 6), grid
+
+
+def cell_key(center_lat, center_lon):
+    """مركز الخلية كعددين صحيحين لمفاتيح الجداول"""
+    return round(center_lat * KEY_SCALE), round(center_lon * KEY_SCALE)
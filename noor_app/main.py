@@ -10,7 +10,12 @@ from kivy.clock import Clock
 import json
 from datetime import datetime
 
-from database import get_setting, update_settings
+from database import get_setting, update_settings, write_buffer
+from settings_store import settings
+import async_db
+import http_client
+import prayer_batch
+from compaction import compact
 from screens import (
     HomeScreen, QuranScreen, PrayerScreen, AdhkarScreen,
     TasbihScreen, DuaScreen, HadithScreen, StatisticsScreen, RamadanPlanScreen, SettingsScreen
@@ -27,16 +32,18 @@ class NoorApp(App):
     
     def build(self):
         self.load_theme()
+        # إعادة تطبيق المظهر فور تغيير الوضع الليلي (الإعداد يُكتب من الخلفية،
+        # والمظهر يُطبَّق في الخيط الرئيسي)
+        settings.subscribe("dark_mode", lambda key, value: self.load_theme(), main_thread=True)
+        # كتابة عدادات التسبيح والقراءة دورياً بدلاً من كل ضغطة
+        write_buffer.start()
         
         # إنشاء مدير الشاشات
         self.screen_manager = ScreenManager()
         
-        # اضبط أوقات الصلاة عند البداية
-        try:
-            from prayer_utils import refresh_prayer_times
-            refresh_prayer_times()
-        except:
-            pass
+        # اضبط أوقات الصلاة عند البداية (في الخلفية: قد تتطلب جلباً من الشبكة)
+        from prayer_utils import refresh_prayer_times
+        async_db.submit(refresh_prayer_times)
         
         # إضافة الشاشات
         self.screen_manager.add_widget(HomeScreen())
@@ -67,10 +74,20 @@ class NoorApp(App):
     
     def on_pause(self):
         """عند تعليق التطبيق"""
+        write_buffer.flush()
         return True
+
+    def on_stop(self):
+        """عند إغلاق التطبيق"""
+        async_db.shutdown()
+        prayer_batch.fetcher.shutdown()
+        http_client.client.shutdown()
+        write_buffer.stop()
     
     def on_start(self):
         """عند بدء التطبيق"""
+        # ضغط السجل القديم في الخلفية (يكمل من حيث توقف إن قوطع)
+        async_db.submit(compact)
         try:
             from notifications import start_notifications
             start_notifications()
@@ -0,0 +1,404 @@
+"""
+ترحيلات مخطط قاعدة البيانات
+رقم الإصدار محفوظ في PRAGMA user_version، وكل ترحيل يُنفَّذ مرة واحدة
+داخل معاملة خاصة به. يستدعيها مدير الاتصال تلقائياً عند أول اتصال بالملف
+"""
+
+from connection import get_connection
+
+
+def _v1_baseline(c):
+    """الجداول كما كانت تُنشأ في database و khatma و achievements"""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS last_read (
+        surah TEXT,
+        ayah INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS tasbih (
+        date DATE,
+        count INTEGER,
+        PRIMARY KEY(date)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS adhkar_read (
+        adhkar_id INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS saved_dua (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dua_text TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS reading_log (
+        date DATE PRIMARY KEY,
+        pages INTEGER
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS statistics (
+        date DATE,
+        ayahs_read INTEGER,
+        adhkar_count INTEGER,
+        khatma_count INTEGER,
+        PRIMARY KEY(date)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS ramadan_plan (
+        plan_days INTEGER,
+        start_date DATE,
+        pages_read INTEGER DEFAULT 0
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS khatma (
+        pages INTEGER,
+        completed INTEGER DEFAULT 0
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        date DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS badges (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        badge_name TEXT UNIQUE,
+        unlocked_date DATETIME
+    )
+    """)
+
+
+def _v2_keys_and_indexes(c):
+    """مفاتيح للجداول ذات الصف الواحد وفهارس للاستعلامات المتكررة"""
+    # الإنجازات: الاسم فريد (مع حذف المكرر القديم) والترتيب حسب التاريخ
+    c.execute("""
+        DELETE FROM achievements
+        WHERE id NOT IN (SELECT MIN(id) FROM achievements GROUP BY name)
+    """)
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_achievements_name ON achievements(name)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_achievements_date ON achievements(date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_badges_unlocked ON badges(unlocked_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_adhkar_read_timestamp ON adhkar_read(timestamp)")
+
+    # خطة رمضان والختمة: صف واحد بمفتاح ثابت id = 1
+    c.execute("""
+    CREATE TABLE ramadan_plan_new (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        plan_days INTEGER,
+        start_date DATE,
+        pages_read INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("""
+        INSERT INTO ramadan_plan_new (id, plan_days, start_date, pages_read)
+        SELECT 1, plan_days, start_date, COALESCE(pages_read, 0)
+        FROM ramadan_plan ORDER BY rowid LIMIT 1
+    """)
+    c.execute("DROP TABLE ramadan_plan")
+    c.execute("ALTER TABLE ramadan_plan_new RENAME TO ramadan_plan")
+
+    c.execute("""
+    CREATE TABLE khatma_new (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        pages INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("""
+        INSERT INTO khatma_new (id, pages, completed)
+        SELECT 1, COALESCE(pages, 0), COALESCE(completed, 0)
+        FROM khatma ORDER BY rowid LIMIT 1
+    """)
+    c.execute("DROP TABLE khatma")
+    c.execute("ALTER TABLE khatma_new RENAME TO khatma")
+
+    # المجاميع الكلية للإحصائيات تُحدَّث بالـ triggers بدلاً من SUM على الجدول كله
+    c.execute("""
+    CREATE TABLE statistics_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        days INTEGER NOT NULL DEFAULT 0,
+        ayahs INTEGER NOT NULL DEFAULT 0,
+        adhkar INTEGER NOT NULL DEFAULT 0,
+        khatmas INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("""
+        INSERT INTO statistics_totals (id, days, ayahs, adhkar, khatmas)
+        SELECT 1, COUNT(*), COALESCE(SUM(ayahs_read), 0),
+               COALESCE(SUM(adhkar_count), 0), COALESCE(SUM(khatma_count), 0)
+        FROM statistics
+    """)
+    c.execute("""
+    CREATE TRIGGER statistics_totals_insert AFTER INSERT ON statistics BEGIN
+        UPDATE statistics_totals SET
+            days = days + 1,
+            ayahs = ayahs + COALESCE(NEW.ayahs_read, 0),
+            adhkar = adhkar + COALESCE(NEW.adhkar_count, 0),
+            khatmas = khatmas + COALESCE(NEW.khatma_count, 0)
+        WHERE id = 1;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER statistics_totals_update AFTER UPDATE ON statistics BEGIN
+        UPDATE statistics_totals SET
+            ayahs = ayahs + COALESCE(NEW.ayahs_read, 0) - COALESCE(OLD.ayahs_read, 0),
+            adhkar = adhkar + COALESCE(NEW.adhkar_count, 0) - COALESCE(OLD.adhkar_count, 0),
+            khatmas = khatmas + COALESCE(NEW.khatma_count, 0) - COALESCE(OLD.khatma_count, 0)
+        WHERE id = 1;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER statistics_totals_delete AFTER DELETE ON statistics BEGIN
+        UPDATE statistics_totals SET
+            days = days - 1,
+            ayahs = ayahs - COALESCE(OLD.ayahs_read, 0),
+            adhkar = adhkar - COALESCE(OLD.adhkar_count, 0),
+            khatmas = khatmas - COALESCE(OLD.khatma_count, 0)
+        WHERE id = 1;
+    END
+    """)
+
+
+def _v3_activity_log(c):
+    """سجل أحداث النشاط مع المجاميع اليومية والشهرية"""
+    from activity import REBUILD_SQL
+
+    c.execute("""
+    CREATE TABLE activity_events (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        ts TEXT NOT NULL
+    )
+    """)
+    c.execute("CREATE INDEX idx_activity_events_ts ON activity_events(ts)")
+    c.execute("""
+    CREATE TABLE activity_daily (
+        day TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        events INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, kind)
+    ) WITHOUT ROWID
+    """)
+    c.execute("""
+    CREATE TABLE activity_monthly (
+        kind TEXT NOT NULL,
+        month TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        events INTEGER NOT NULL DEFAULT 0,
+        days INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, month)
+    ) WITHOUT ROWID
+    """)
+
+    # أحداث من البيانات القديمة: حدث واحد لكل صف يومي
+    for table, column, kind in (
+        ("tasbih", "count", "tasbih"),
+        ("reading_log", "pages", "reading"),
+        ("statistics", "ayahs_read", "ayahs"),
+        ("statistics", "adhkar_count", "adhkar"),
+        ("statistics", "khatma_count", "khatma"),
+    ):
+        c.execute(f"""
+            INSERT INTO activity_events (kind, amount, ts)
+            SELECT '{kind}', {column}, date || ' 00:00:00'
+            FROM {table} WHERE {column} > 0
+        """)
+    c.execute("""
+        INSERT INTO activity_events (kind, amount, ts)
+        SELECT 'adhkar', 1, datetime(timestamp) FROM adhkar_read
+        WHERE timestamp IS NOT NULL
+    """)
+    for sql in REBUILD_SQL:
+        c.execute(sql, {"since": ""})
+
+    # المجاميع الكلية صارت تُقرأ من activity_monthly
+    c.execute("DROP TRIGGER statistics_totals_insert")
+    c.execute("DROP TRIGGER statistics_totals_update")
+    c.execute("DROP TRIGGER statistics_totals_delete")
+    c.execute("DROP TABLE statistics_totals")
+
+
+def _v4_compaction_state(c):
+    """حدّ الضغط: الأيام قبل cutoff محفوظة في المجاميع الشهرية فقط"""
+    c.execute("""
+    CREATE TABLE compaction_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        cutoff TEXT NOT NULL
+    )
+    """)
+
+
+# حساب السلاسل كما كان عند الإصدار 5 (قبل streak_carry)
+_V5_STREAKS_SQL = """
+    INSERT INTO streaks (kind, current, longest, last_day)
+    WITH islands AS (
+        SELECT kind, MAX(day) AS last_day, COUNT(*) AS length
+        FROM (
+            SELECT kind, day,
+                   julianday(day) - ROW_NUMBER() OVER (PARTITION BY kind ORDER BY day) AS island
+            FROM activity_daily
+        )
+        GROUP BY kind, island
+    ),
+    ranked AS (
+        SELECT kind, length, last_day,
+               MAX(length) OVER (PARTITION BY kind) AS longest,
+               ROW_NUMBER() OVER (PARTITION BY kind ORDER BY last_day DESC) AS position
+        FROM islands
+    )
+    SELECT kind, length, longest, last_day FROM ranked WHERE position = 1
+"""
+
+
+def _v5_streaks(c):
+    """السلاسل المتتالية لكل نوع نشاط، تُحدَّث مع كل يوم جديد"""
+    c.execute("""
+    CREATE TABLE streaks (
+        kind TEXT PRIMARY KEY,
+        current INTEGER NOT NULL,
+        longest INTEGER NOT NULL,
+        last_day TEXT NOT NULL
+    ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX idx_activity_daily_kind ON activity_daily(kind, day)")
+    c.execute(_V5_STREAKS_SQL)
+
+
+def _v6_prayer_times(c):
+    """مواقيت الصلاة المحسوبة لكل موقع مقرَّب وطريقة ويوم (انظر prayer_cache)"""
+    c.execute("""
+    CREATE TABLE prayer_times (
+        lat INTEGER NOT NULL,
+        lon INTEGER NOT NULL,
+        method TEXT NOT NULL,
+        day TEXT NOT NULL,
+        times TEXT NOT NULL,
+        fetched TEXT NOT NULL,
+        PRIMARY KEY (lat, lon, method, day)
+    ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX idx_prayer_times_day ON prayer_times(day)")
+
+
+def _v7_http_cache(c):
+    """آخر استجابة لكل رابط مع مفاتيح الطلب المشروط (انظر http_client)"""
+    c.execute("""
+    CREATE TABLE http_cache (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        body TEXT NOT NULL,
+        stored REAL NOT NULL
+    ) WITHOUT ROWID
+    """)
+
+
+def _v8_location_cells(c):
+    """مفاتيح prayer_times صارت مراكز خلايا location_grid، فتُفرغ الذاكرة القديمة"""
+    c.execute("DELETE FROM prayer_times")
+
+
+def _v9_event_identity(c):
+    """هوية ثابتة لكل حدث عبر الأجهزة (انظر backup)
+
+    الأحداث المسجلة هنا هويتها مفتاح الجهاز مع id فيبقى uid فارغاً، والمستوردة
+    تحتفظ بهويتها الأصلية.
+    """
+    c.execute("""
+    CREATE TABLE device (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        key TEXT NOT NULL
+    )
+    """)
+    c.execute("INSERT INTO device VALUES (1, lower(hex(randomblob(8))))")
+    c.execute("ALTER TABLE activity_events ADD COLUMN uid TEXT")
+    c.execute("CREATE UNIQUE INDEX idx_activity_events_uid ON activity_events(uid) WHERE uid IS NOT NULL")
+
+
+def _v10_streak_carry(c):
+    """السلاسل التي تعبر حدّ الضغط (انظر activity.carry_streaks)
+
+    للقواعد المضغوطة من قبل تُشتق من السلسلة الحالية المحفوظة في streaks.
+    """
+    from activity import ANY
+
+    c.execute("""
+    CREATE TABLE streak_carry (
+        kind TEXT PRIMARY KEY,
+        length INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+    c.execute("ALTER TABLE compaction_state ADD COLUMN carried TEXT NOT NULL DEFAULT ''")
+    c.execute("""
+        INSERT INTO streak_carry (kind, length)
+        SELECT s.kind, CAST(julianday(cs.cutoff) - julianday(s.last_day) + s.current - 1 AS INTEGER)
+        FROM streaks s, compaction_state cs
+        WHERE s.kind != ? AND date(s.last_day, '-' || (s.current - 1) || ' days') < cs.cutoff
+          AND s.last_day >= date(cs.cutoff, '-1 day')
+    """, (ANY,))
+    c.execute("UPDATE compaction_state SET carried = cutoff")
+
+
+# الترحيل رقم n في الموضع n - 1؛ لا تُعدَّل الترحيلات القديمة، أضف جديدة فقط
+MIGRATIONS = [
+    _v1_baseline,
+    _v2_keys_and_indexes,
+    _v3_activity_log,
+    _v4_compaction_state,
+    _v5_streaks,
+    _v6_prayer_times,
+    _v7_http_cache,
+    _v8_location_cells,
+    _v9_event_identity,
+    _v10_streak_carry,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def upgrade(conn):
+    """ترقية قاعدة البيانات المفتوحة بـ conn إلى آخر إصدار
+
+    إذا كان user_version حالياً لا يُنفَّذ أي DDL. تُرجع رقم الإصدار.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            MIGRATIONS[number - 1](c)
+            c.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    conn.execute("ANALYZE")
+    conn.commit()
+    return SCHEMA_VERSION
+
+
+def migrate():
+    """التأكد من أن قاعدة البيانات الحالية في آخر إصدار وإرجاع رقم الإصدار"""
+    get_connection()
+    return SCHEMA_VERSION
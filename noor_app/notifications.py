@@ -5,8 +5,12 @@
 from kivy.support import install_gobject_iteration
 from plyer import notification
 from kivy.clock import Clock
-from datetime import datetime, time
-import threading
+from datetime import datetime, time, timedelta
+import heapq
+import itertools
+
+import async_db
+import clock
 
 # إنشاء إشعارات
 try:
@@ -27,89 +31,226 @@ def send_notification(title, message, timeout=5):
         print(f"خطأ في الإشعار: {e}")
 
 
-def setup_prayer_notifications():
-    """إعداد إشعارات أوقات الصلاة"""
+# دقائق التذكير قبل كل صلاة (0 لإيقافه)
+REMINDER_MINUTES = 10
+# أذكار الصباح بعد الفجر وأذكار المساء بعد العصر
+ADHKAR_DELAY_MINUTES = 15
+INSPIRATION_TIME = time(9, 0)
+# أحداث مرة في اليوم تُطلق فوراً إذا بُني جدول اليوم لأول مرة بعد وقتها
+CATCH_UP_KEYS = ("inspiration", "islamic_event")
+# حدث فات بأكثر من هذا (الجهاز كان نائماً) لا يُرسل
+GRACE_MINUTES = 30
+# الإعدادات التي تغيّر جدول اليوم
+TIMELINE_SETTINGS = ("latitude", "longitude", "prayer_method", "asr_school",
+                     "high_lat_rule", "utc_offset", "prayer_source",
+                     "prayer_reminder_minutes")
+
+
+def _at(day, value):
+    """"HH:MM" (قد تتبعه منطقة زمنية) إلى datetime في اليوم، أو None"""
+    try:
+        hour, minute = value[:5].split(":")
+        return datetime.combine(day, time(int(hour), int(minute)))
+    except (ValueError, TypeError):
+        return None
+
+
+def prayer_events(day, times, reminder_minutes=REMINDER_MINUTES):
+    """أحداث الصلاة والأذكار ليوم واحد [(الوقت، المفتاح، العنوان، الرسالة، المدة)]"""
     from islamic_data import PRAYER_NAMES
-    from prayer_utils import get_today_prayer_times, refresh_prayer_times
-    
-    def check_prayer_times():
-        # ensure we have up-to-date times
-        refresh_prayer_times()
-        now = datetime.now()
-        current_time = now.strftime("%H:%M")
-        times = get_today_prayer_times()
-        for prayer_key, prayer_time in times.items():
-            # ignore timezone offset strings etc.
-            if current_time == prayer_time[:5]:
-                prayer_name = PRAYER_NAMES.get(prayer_key, prayer_key)
-                send_notification(
-                    title=f"⏰ حان وقت {prayer_name}",
-                    message=f"الوقت: {prayer_time}",
-                    timeout=30
-                )
-    
-    # تشغيل الفحص كل دقيقة
-    Clock.schedule_interval(lambda dt: check_prayer_times(), 60)
-
-
-def setup_adhkar_notifications():
-    """إعداد إشعارات الأذكار اليومية"""
-    
-    def morning_notification(dt):
-        send_notification(
-            title="🌅 صباح الخير",
-            message="لا تنسَ أذكار الصباح",
-            timeout=10
-        )
-    
-    def evening_notification(dt):
-        send_notification(
-            title="🌙 مساء الخير",
-            message="حان وقت أذكار المساء",
-            timeout=10
-        )
-    
-    # جدولة الإشعارات (في الصباح والمساء)
-    # يمكن تخصيص الأوقات حسب الحاجة
-    morning_time = Clock.create_trigger(morning_notification, 1)
-    evening_time = Clock.create_trigger(evening_notification, 1)
+    events = []
+    for key, name in PRAYER_NAMES.items():
+        when = _at(day, times.get(key))
+        if when is None:
+            continue
+        events.append((when, key, f"⏰ حان وقت {name}", f"الوقت: {times[key][:5]}", 30))
+        if reminder_minutes:
+            events.append((when - timedelta(minutes=reminder_minutes), f"{key}_reminder",
+                           f"🔔 {name} بعد {reminder_minutes} دقائق", f"الوقت: {times[key][:5]}", 10))
+    delay = timedelta(minutes=ADHKAR_DELAY_MINUTES)
+    fajr, asr = _at(day, times.get("fajr")), _at(day, times.get("asr"))
+    if fajr is not None:
+        events.append((fajr + delay, "adhkar_morning", "🌅 صباح الخير", "لا تنسَ أذكار الصباح", 10))
+    if asr is not None:
+        events.append((asr + delay, "adhkar_evening", "🌙 مساء الخير", "حان وقت أذكار المساء", 10))
+    return events
+
+
+class EventTimeline:
+    """أحداث اليوم في كومة صغرى مرتبة بالوقت، ومؤقت واحد حتى أقربها
+
+    build(day) تُرجع [(الوقت، المفتاح، الإجراء)]، و schedule(callback, seconds)
+    تُرجع مؤقتاً له cancel(). submit(build, day, callback) تشغّل البناء (قد
+    يجلب المواقيت من الشبكة) وتسلّم نتيجته إلى callback في خيط المؤقتات؛
+    الافتراضي يشغّله مباشرة. الجدول يُعاد بناؤه عند منتصف الليل أو بطلب
+    rebuild (عند تغيّر الموقع)، فيستيقظ البرنامج مرة واحدة لكل حدث.
+    أحداث catch_up التي فات وقتها تُطلق فوراً عند أول بناء لليوم فقط.
+    fired ما أُطلق اليوم، ويُفرَّغ مع كل يوم جديد.
+    """
+
+    def __init__(self, build, schedule, now=None, submit=None, catch_up=()):
+        self._build = build
+        self._schedule = schedule
+        self._now = now or clock.now
+        self._submit = submit or (lambda build, day, callback: callback(build(day)))
+        self._catch_up = set(catch_up)
+        self._heap = []
+        self._seq = itertools.count()
+        self._timer = None
+        self._deadline = None
+        self._request = 0
+        self._day = None
+        self.fired = []
+
+    def rebuild(self):
+        self._request += 1
+        request, day = self._request, self._now().date()
+        self._submit(self._build, day, lambda events: self._install(request, day, events))
+
+    def _install(self, request, day, events):
+        if request != self._request:
+            # بُني جدول أحدث (أو أُلغي) أثناء هذا البناء
+            return
+        now = self._now()
+        first = day != self._day
+        if first:
+            self._day = day
+            self.fired = []
+        heap = []
+        for when, key, action in events:
+            if when <= now and first and key in self._catch_up:
+                when = now
+            elif when <= now:
+                continue
+            heap.append((when, next(self._seq), key, action))
+        midnight = datetime.combine(day + timedelta(days=1), time(0, 0))
+        heap.append((midnight, next(self._seq), "rollover", self.rebuild))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._arm()
+
+    def pending(self):
+        """[(الوقت، المفتاح)] مرتبة"""
+        return [(when, key) for when, _, key, _ in sorted(self._heap)]
+
+    def _arm(self):
+        deadline = self._heap[0][0] if self._heap else None
+        if self._timer is not None:
+            if deadline == self._deadline:
+                return
+            self._timer.cancel()
+            self._timer = None
+        self._deadline = deadline
+        if deadline is not None:
+            delay = (deadline - self._now()).total_seconds()
+            self._timer = self._schedule(self._wake, max(0.0, delay))
+
+    def _wake(self, *args):
+        """إطلاق كل ما حان وقته (ولو تأخر المؤقت) ثم النوم حتى الحدث التالي"""
+        self._timer = None
+        now = self._now()
+        grace = timedelta(minutes=GRACE_MINUTES)
+        while self._heap and self._heap[0][0] <= now:
+            when, _, key, action = heapq.heappop(self._heap)
+            if key != "rollover" and now - when > grace:
+                continue
+            try:
+                action()
+                self.fired.append(key)
+            except Exception as e:
+                print(f"خطأ في حدث {key}: {e}")
+        self._arm()
+
+    def cancel(self):
+        self._request += 1
+        self._heap = []
+        self._arm()
+
 
+def _notify(title, message, timeout):
+    return lambda: send_notification(title=title, message=message, timeout=timeout)
 
-def schedule_daily_inspiration():
-    """جدولة رسالة يومية قد تكون آية أو حديث أو دعاء"""
+
+def build_day(day):
+    """جدول اليوم الكامل: الصلوات والتذكيرات والأذكار والرسالة اليومية
+
+    يُبنى لليوم الحالي فقط، ويحدّث PRAYER_TIMES في الذاكرة معه.
+    """
+    from database import get_setting
+    from event_index import events_on
+    from prayer_utils import refresh_prayer_times
+    times = dict(refresh_prayer_times())
+    try:
+        reminder = int(get_setting("prayer_reminder_minutes", str(REMINDER_MINUTES)))
+    except ValueError:
+        reminder = REMINDER_MINUTES
+    events = [(when, key, _notify(title, message, timeout))
+              for when, key, title, message, timeout in prayer_events(day, times, reminder)]
+    events.append((datetime.combine(day, INSPIRATION_TIME), "inspiration", show_daily_inspiration))
+    for event in events_on(day):
+        events.append((datetime.combine(day, INSPIRATION_TIME), "islamic_event",
+                       _notify("📅 مناسبة", event["name"], 15)))
+    return events
+
+
+def _build_async(build, day, callback):
+    """بناء الجدول في الخلفية (قد ينتظر جلب المواقيت) وتثبيته في خيط الواجهة"""
+    def failed(error):
+        print(f"خطأ في بناء جدول التنبيهات: {error}")
+        # يبقى تجديد منتصف الليل مجدولاً
+        callback([])
+
+    async_db.submit(build, day, callback=callback, errback=failed)
+
+
+timeline = EventTimeline(build_day, lambda callback, seconds: Clock.schedule_once(callback, seconds),
+                         submit=_build_async, catch_up=CATCH_UP_KEYS)
+
+
+def _on_settings_changed(key, value):
+    # خط العرض وخط الطول يُكتبان معاً، فيُعاد البناء مرة في الإطار التالي
+    _rebuild_trigger()
+
+
+_rebuild_trigger = Clock.create_trigger(lambda dt: timeline.rebuild())
+
+
+def setup_prayer_notifications():
+    """إعداد إشعارات أوقات الصلاة والأذكار والرسالة اليومية في جدول واحد"""
+    from settings_store import settings
+    for key in TIMELINE_SETTINGS:
+        settings.unsubscribe(key, _on_settings_changed)
+        settings.subscribe(key, _on_settings_changed, main_thread=True)
+    timeline.rebuild()
+
+
+def show_daily_inspiration():
+    """رسالة يومية قد تكون آية أو حديث أو دعاء"""
     from islamic_data import HADITH, DUAS, QURAN_VERSES
     import random
-    
-    def show_daily(dt):
-        choice = random.choice(['verse', 'hadith', 'dua'])
-        if choice == 'verse':
-            text = random.choice(QURAN_VERSES)
-            title = "📖 آية قرآنية"
-        elif choice == 'hadith':
-            hadith = random.choice(HADITH)
-            text = hadith['text']
-            title = "📚 الحديث الشريف"
-        else:
-            dua = random.choice(DUAS)
-            text = dua['text']
-            title = "🤲 دعاء يومي"
-        send_notification(
-            title=title,
-            message=text[:100] + "...",
-            timeout=15
-        )
-        # during Ramadan also send encouragement
-        from hijri_utils import gregorian_to_hijri
-        from islamic_data import ISLAMIC_EVENTS
-        y, m, d = gregorian_to_hijri(datetime.now())
-        if m == 9:
-            send_notification(title="🌙 رمضان", message="حافظ على خُتمتك اليوم!", timeout=10)
-        # if today is an Islamic event, notify
-        if (m, d) in ISLAMIC_EVENTS:
-            send_notification(title="📅 مناسبة", message=ISLAMIC_EVENTS[(m, d)], timeout=15)
-    
-    # تشغيل مرة واحدة يومياً
-    Clock.schedule_once(show_daily, 1)
+
+    choice = random.choice(['verse', 'hadith', 'dua'])
+    if choice == 'verse':
+        text = random.choice(QURAN_VERSES)
+        title = "📖 آية قرآنية"
+    elif choice == 'hadith':
+        hadith = random.choice(HADITH)
+        text = hadith['text']
+        title = "📚 الحديث الشريف"
+    else:
+        dua = random.choice(DUAS)
+        text = dua['text']
+        title = "🤲 دعاء يومي"
+    send_notification(
+        title=title,
+        message=text[:100] + "...",
+        timeout=15
+    )
+    # during Ramadan also send encouragement
+    from hijri_utils import gregorian_to_hijri
+    y, m, d = gregorian_to_hijri(clock.today())
+    if m == 9:
+        send_notification(title="🌙 رمضان", message="حافظ على خُتمتك اليوم!", timeout=10)
 
 
 def reminder_notification(title, message):
@@ -122,7 +263,5 @@ def start_notifications():
     """بدء جميع نظام التنبيهات"""
     try:
         setup_prayer_notifications()
-        setup_adhkar_notifications()
-        schedule_daily_inspiration()
     except Exception as e:
         print(f"خطأ في بدء التنبيهات: {e}")
@@ -0,0 +1,99 @@
+"""
+جلب مواقيت أيام كثيرة بالتوازي (تقويم رمضان)
+الطلبات تمر عبر مجمع خيوط محدود وجلسة http_client المشتركة،
+واليوم الجاري جلبه لا يُطلب مرتين، وكل يوم يُسلَّم فور وصوله.
+الحساب المحلي سريع فيتم في الخيط نفسه دون المجمع
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import prayer_cache
+from database import get_setting
+
+
+MAX_WORKERS = 6
+
+
+class BatchFetcher:
+    """مجمع جلب مشترك: {(الخلية، الطريقة، اليوم): Future} للطلبات الجارية"""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="noor-prayer")
+        return self._executor
+
+    def _fetch_day(self, lat, lon, day):
+        return prayer_cache.fetch(lat, lon, day)
+
+    def _submit(self, lat, lon, day, online):
+        key = (prayer_cache.location_key(lat, lon), prayer_cache.method_key(), day)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if online:
+                future = self._get_executor().submit(self._fetch_day, lat, lon, day)
+            else:
+                future = Future()
+            self._inflight[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        if not online:
+            try:
+                future.set_result(self._fetch_day(lat, lon, day))
+            except Exception as e:
+                future.set_exception(e)
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def fetch(self, lat, lon, days, on_day=None):
+        """بدء جلب days (نصوص YYYY-MM-DD) وإرجاع {يوم: Future}
+
+        on_day(day, times) يُستدعى لكل يوم فور جاهزيته، في الخيط الذي
+        أنهاه (times قاموس فارغ إذا تعذر الجلب).
+        """
+        days = list(dict.fromkeys(days))
+        cached = prayer_cache.lookup(lat, lon, days)
+        online = get_setting("prayer_source", "local") == "aladhan"
+        futures = {}
+        for day in days:
+            if day in cached:
+                future = Future()
+                future.set_result(cached[day])
+            else:
+                future = self._submit(lat, lon, day, online)
+            if on_day is not None:
+                future.add_done_callback(lambda f, day=day: on_day(day, _result(f)))
+            futures[day] = future
+        return futures
+
+    def fetch_all(self, lat, lon, days, timeout=None):
+        """جلب days والانتظار حتى تكتمل. تُرجع {يوم: المواقيت}"""
+        futures = self.fetch(lat, lon, days)
+        wait(futures.values(), timeout=timeout)
+        return {day: _result(f) if f.done() else {} for day, f in futures.items()}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _result(future):
+    if future.cancelled() or future.exception() is not None:
+        return {}
+    return future.result() or {}
+
+
+fetcher = BatchFetcher()
@@ -0,0 +1,290 @@
+"""
+ذاكرة مواقيت الصلاة
+المواقيت تُحفظ في جدول prayer_times لكل خلية موقع (انظر location_grid)
+وطريقة ويوم، ويُملأ الشهر كاملاً دفعة واحدة في الخلفية؛ أشهر آخر الخلايا
+المستخدمة تُقدَّم من الذاكرة دون استعلام. الجلب يتكرر فقط عند غياب يوم أو تغيّر الموقع والإعدادات أو بعد
+TTL_DAYS، والجدول لا يحتفظ إلا بنافذة أيام محدودة حول اليوم
+"""
+
+import calendar
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import async_db
+import clock
+from connection import get_connection, manager
+from database import get_setting
+from location_grid import DEFAULT_ERROR_MINUTES, KEY_SCALE, cell, cell_key
+from prayer_utils import calculation_settings, fetch_prayer_times_source, get_location
+from settings_store import settings
+
+
+TTL_DAYS = 30
+# الأيام الماضية المحفوظة، إضافة إلى الشهر الحالي
+KEEP_PAST_DAYS = 7
+KEEP_FUTURE_DAYS = 62
+# في آخر أسبوع من الشهر يُملأ الشهر التالي أيضاً
+PREFETCH_AHEAD_DAYS = 7
+
+# عدد الخلايا التي تبقى أشهرها في الذاكرة (للمسافرين)
+RECENT_CELLS = 8
+
+# الإعدادات التي تغيّر المواقيت
+WATCHED_SETTINGS = ("latitude", "longitude", "prayer_method", "asr_school",
+                    "high_lat_rule", "utc_offset", "prayer_source",
+                    "location_error_minutes")
+
+_lock = threading.Lock()
+# {(الخلية، الطريقة، (السنة، الشهر)): {اليوم: المواقيت}} الأحدث استخداماً آخراً
+_recent = OrderedDict()
+_recent_lock = threading.Lock()
+_recent_generation = None
+_trigger = None
+
+
+def _max_error():
+    try:
+        return float(get_setting("location_error_minutes", str(DEFAULT_ERROR_MINUTES)))
+    except ValueError:
+        return DEFAULT_ERROR_MINUTES
+
+
+def cell_center(lat, lon):
+    """مركز خلية الموقع، وهو الموضع الذي تُحسب له مواقيت الخلية كلها"""
+    options = calculation_settings()
+    center_lat, center_lon, _ = cell(lat, lon, _max_error(), options["method"], options["asr"])
+    return center_lat, center_lon
+
+
+def location_key(lat, lon):
+    """مفتاح خلية الموقع في الجداول (مركزها بوحدات 1 / KEY_SCALE درجة)"""
+    return cell_key(*cell_center(lat, lon))
+
+
+def _center(key):
+    return key[0] / KEY_SCALE, key[1] / KEY_SCALE
+
+
+def method_key():
+    """مصدر المواقيت وطريقة الحساب كنص واحد"""
+    options = calculation_settings()
+    offset = options["utc_offset"]
+    return ":".join((
+        get_setting("prayer_source", "local"),
+        options["method"],
+        options["asr"],
+        options["high_lat"],
+        "auto" if offset is None else f"{offset:g}",
+    ))
+
+
+def _fresh(fetched, today):
+    return fetched >= (today - timedelta(days=TTL_DAYS)).isoformat()
+
+
+def _expired(today):
+    """تاريخ جلب منتهٍ أصلاً: يُحفظ به الحساب المحلي البديل عن Aladhan فيُعاد جلبه"""
+    return (today - timedelta(days=TTL_DAYS + 1)).isoformat()
+
+
+def _load(key, method, start, end):
+    """{اليوم: (المواقيت، تاريخ الجلب)} بين start و end"""
+    rows = get_connection().execute("""
+        SELECT day, times, fetched FROM prayer_times
+        WHERE lat = ? AND lon = ? AND method = ? AND day BETWEEN ? AND ?
+    """, (*key, method, start.isoformat(), end.isoformat())).fetchall()
+    return {day: (times, fetched) for day, times, fetched in rows}
+
+
+def _fetch(key, method, day):
+    """(المواقيت، تاريخ الجلب) ليوم (نص YYYY-MM-DD) في الخلية key
+
+    إذا فشل Aladhan تُرجع fetch_prayer_times الحساب المحلي، فيُحفظ بتاريخ
+    منتهٍ حتى لا يُقدَّم باسم Aladhan طوال TTL_DAYS.
+    """
+    times, source = fetch_prayer_times_source(*_center(key), day)
+    today = clock.today()
+    if source != method.split(":", 1)[0]:
+        return times, _expired(today)
+    return times, today.isoformat()
+
+
+def _store(key, method, days):
+    """حفظ [(اليوم، المواقيت، تاريخ الجلب)]؛ المنتهي لا يدخل الذاكرة"""
+    today = clock.today()
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO prayer_times VALUES (?, ?, ?, ?, ?, ?)",
+            [(*key, method, day, json.dumps(times), fetched) for day, times, fetched in days],
+        )
+    for day, times, fetched in days:
+        if _fresh(fetched, today):
+            _remember(key, method, date.fromisoformat(day), times)
+
+
+def fill_month(lat, lon, year, month):
+    """جلب أيام الشهر الغائبة أو المنتهية صلاحيتها وإرجاع عددها"""
+    key, method = location_key(lat, lon), method_key()
+    today = clock.today()
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    have = {day for day, (_, fetched) in _load(key, method, first, last).items()
+            if _fresh(fetched, today)}
+    days = []
+    day = first
+    while day <= last:
+        if day.isoformat() not in have:
+            times, fetched = _fetch(key, method, day.isoformat())
+            if times:
+                days.append((day.isoformat(), times, fetched))
+        day += timedelta(days=1)
+    if days:
+        _store(key, method, days)
+    return len(days)
+
+
+def lookup(lat, lon, days):
+    """{اليوم: المواقيت} لما هو محفوظ وصالح من days (نصوص YYYY-MM-DD)"""
+    if not days:
+        return {}
+    today = clock.today()
+    rows = _load(location_key(lat, lon), method_key(),
+                 date.fromisoformat(min(days)), date.fromisoformat(max(days)))
+    return {day: json.loads(rows[day][0]) for day in days
+            if day in rows and _fresh(rows[day][1], today)}
+
+
+def fetch(lat, lon, day):
+    """جلب مواقيت يوم واحد (نص YYYY-MM-DD) لخلية الموقع وحفظها"""
+    key, method = location_key(lat, lon), method_key()
+    times, fetched = _fetch(key, method, day)
+    if times:
+        _store(key, method, [(day, times, fetched)])
+    return times
+
+
+def evict():
+    """حذف الأيام خارج النافذة والصفوف المنتهية صلاحيتها. تُرجع عدد المحذوف
+
+    الشهر الحالي يبقى كاملاً حتى لا تُجلب أيامه الأولى من جديد.
+    """
+    today = clock.today()
+    oldest = min(today - timedelta(days=KEEP_PAST_DAYS), today.replace(day=1))
+    conn = get_connection()
+    with conn:
+        return conn.execute("""
+            DELETE FROM prayer_times WHERE day < ? OR day > ? OR fetched < ?
+        """, (
+            oldest.isoformat(),
+            (today + timedelta(days=KEEP_FUTURE_DAYS)).isoformat(),
+            # الحساب البديل المحفوظ اليوم بتاريخ منتهٍ يبقى حتى يُعاد جلبه
+            _expired(today),
+        )).rowcount
+
+
+def prefetch(lat=None, lon=None, day=None):
+    """ملء شهر day (الافتراضي اليوم) للموقع المحفوظ ثم تنظيف النافذة"""
+    if lat is None or lon is None:
+        lat, lon = get_location()
+        if lat is None or lon is None:
+            return 0
+    day = day or clock.today()
+    with _lock:
+        count = fill_month(lat, lon, day.year, day.month)
+        ahead = day + timedelta(days=PREFETCH_AHEAD_DAYS)
+        if ahead.month != day.month:
+            count += fill_month(lat, lon, ahead.year, ahead.month)
+        evict()
+    return count
+
+
+def _check_generation():
+    """الذاكرة تخص ملف قاعدة البيانات الحالي (يُستدعى مع القفل)"""
+    global _recent_generation
+    if _recent_generation != manager.generation:
+        _recent.clear()
+        _recent_generation = manager.generation
+
+
+def _remember(key, method, day, times):
+    """حفظ مواقيت يوم في ذاكرة الخلايا الأخيرة"""
+    month = (key, method, (day.year, day.month))
+    with _recent_lock:
+        _check_generation()
+        _recent.setdefault(month, {})[day.isoformat()] = times
+        _recent.move_to_end(month)
+        while len(_recent) > RECENT_CELLS:
+            _recent.popitem(last=False)
+
+
+def _recall(key, method, day):
+    month = (key, method, (day.year, day.month))
+    with _recent_lock:
+        _check_generation()
+        days = _recent.get(month)
+        if days is None or day.isoformat() not in days:
+            return None
+        _recent.move_to_end(month)
+        return days[day.isoformat()]
+
+
+def clear_memory():
+    with _recent_lock:
+        _recent.clear()
+
+
+def get_times(lat, lon, day=None):
+    """مواقيت يوم (الافتراضي اليوم) من الذاكرة أو الجدول
+
+    كل الإحداثيات في خلية واحدة تشترك في المواقيت نفسها. عند قراءة يوم من
+    الجدول يُحمَّل شهره كله إلى الذاكرة. اليوم الغائب يُجلب وحده فوراً وباقي
+    شهره في الخلفية، والمنتهي صلاحيته يُقدَّم كما هو حتى يُحدَّث في الخلفية.
+    تُرجع {} إذا تعذر الجلب.
+    """
+    today = clock.today()
+    day = day or today
+    key, method = location_key(lat, lon), method_key()
+    times = _recall(key, method, day)
+    if times is not None:
+        return times
+
+    first = day.replace(day=1)
+    last = first.replace(day=calendar.monthrange(day.year, day.month)[1])
+    rows = _load(key, method, first, last)
+    stale = False
+    for other, (text, fetched) in rows.items():
+        if _fresh(fetched, today):
+            _remember(key, method, date.fromisoformat(other), json.loads(text))
+        stale = stale or (other == day.isoformat() and not _fresh(fetched, today))
+    times = _recall(key, method, day)
+    if times is None and day.isoformat() in rows:
+        # المنتهي (ومنه الحساب المحلي البديل) يُقدَّم دون الذاكرة حتى يُحدَّث
+        times = json.loads(rows[day.isoformat()][0])
+    if times is None:
+        times, fetched = _fetch(key, method, day.isoformat())
+        if not times:
+            return {}
+        _store(key, method, [(day.isoformat(), times, fetched)])
+        stale = True
+    if stale:
+        async_db.submit(prefetch, lat, lon, day)
+    return times
+
+
+def _on_settings_changed(key, value):
+    """ملء شهر الموقع الجديد في الخلفية (لا شيء إذا بقي في الخلية نفسها)
+
+    تغيير الموقع يكتب خط العرض ثم خط الطول، فيُجمعان في إطار واحد.
+    """
+    global _trigger
+    if _trigger is None:
+        from kivy.clock import Clock
+        _trigger = Clock.create_trigger(lambda dt: async_db.submit(prefetch))
+    _trigger()
+
+
+for _key in WATCHED_SETTINGS:
+    settings.subscribe(_key, _on_settings_changed, main_thread=True)
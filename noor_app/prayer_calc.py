@@ -0,0 +1,177 @@
+"""
+حساب مواقيت الصلاة فلكياً دون اتصال
+موقع الشمس من المعادلات التقريبية المعتمدة في PrayTimes (وهي التي يستخدمها
+Aladhan)، فتطابق نتائج الطريقة 2 (ISNA) عنده في حدود دقيقة
+"""
+
+import math
+from datetime import date as date_type, datetime
+
+
+# زوايا الفجر والعشاء بالدرجات، أو العشاء بالدقائق بعد المغرب (isha_minutes)
+METHODS = {
+    "MWL": {"fajr": 18, "isha": 17},
+    "ISNA": {"fajr": 15, "isha": 15},
+    "Egypt": {"fajr": 19.5, "isha": 17.5},
+    # أم القرى: العشاء بعد المغرب بـ 90 دقيقة (لا يُضاف تعديل رمضان)
+    "Makkah": {"fajr": 18.5, "isha_minutes": 90},
+    "Karachi": {"fajr": 18, "isha": 18},
+}
+
+# أرقام الطرق في Aladhan
+ALADHAN_METHODS = {"Karachi": 1, "ISNA": 2, "MWL": 3, "Makkah": 4, "Egypt": 5}
+
+# ظل العصر: مثل الشيء (الشافعي ومعه المالكي والحنبلي) أو مثلاه (الحنفي)
+ASR_FACTORS = {"shafi": 1, "hanafi": 2}
+
+# قواعد خطوط العرض العليا: جزء الليل المسموح بين الفجر والشروق
+HIGH_LAT_RULES = ("none", "middle", "seventh", "angle")
+
+IMSAK_MINUTES = 10
+
+NAMES = ("imsak", "fajr", "sunrise", "dhuhr", "asr", "sunset", "maghrib", "isha", "midnight")
+
+
+def _sin(d):
+    return math.sin(math.radians(d))
+
+
+def _cos(d):
+    return math.cos(math.radians(d))
+
+
+def _tan(d):
+    return math.tan(math.radians(d))
+
+
+def _fix(a, b):
+    if math.isnan(a):
+        return a
+    a = a - b * math.floor(a / b)
+    return a + b if a < 0 else a
+
+
+def julian_day(year, month, day):
+    if month <= 2:
+        year -= 1
+        month += 12
+    a = year // 100
+    b = 2 - a + a // 4
+    return math.floor(365.25 * (year + 4716)) + math.floor(30.6001 * (month + 1)) + day + b - 1524.5
+
+
+def sun_position(jd):
+    """(الميل بالدرجات، معادلة الزمن بالساعات)"""
+    d = jd - 2451545.0
+    g = _fix(357.529 + 0.98560028 * d, 360)
+    q = _fix(280.459 + 0.98564736 * d, 360)
+    lon = _fix(q + 1.915 * _sin(g) + 0.020 * _sin(2 * g), 360)
+    e = 23.439 - 0.00000036 * d
+    ra = math.degrees(math.atan2(_cos(e) * _sin(lon), _cos(lon))) / 15
+    equation = q / 15 - _fix(ra, 24)
+    declination = math.degrees(math.asin(_sin(e) * _sin(lon)))
+    return declination, equation
+
+
+class _Day:
+    """حسابات يوم واحد في موقع واحد (الأوقات بالساعات حسب توقيت غرينتش المحلي الشمسي)"""
+
+    def __init__(self, lat, lon, day):
+        self.lat = lat
+        self.jdate = julian_day(day.year, day.month, day.day) - lon / (15 * 24)
+
+    def noon(self, time):
+        return _fix(12 - sun_position(self.jdate + time / 24)[1], 24)
+
+    def angle_time(self, angle, time, before_noon=False):
+        """وقت بلوغ الشمس زاوية angle تحت الأفق (nan إذا لم تبلغها)"""
+        declination = sun_position(self.jdate + time / 24)[0]
+        ratio = ((-_sin(angle) - _sin(declination) * _sin(self.lat))
+                 / (_cos(declination) * _cos(self.lat)))
+        if not -1 <= ratio <= 1:
+            return math.nan
+        t = math.degrees(math.acos(ratio)) / 15
+        noon = self.noon(time)
+        return noon - t if before_noon else noon + t
+
+    def asr_time(self, factor, time):
+        declination = sun_position(self.jdate + time / 24)[0]
+        angle = -math.degrees(math.atan(1 / (factor + _tan(abs(self.lat - declination)))))
+        return self.angle_time(angle, time)
+
+
+def _night_portion(rule, angle, night):
+    if rule == "angle":
+        return angle / 60 * night
+    if rule == "seventh":
+        return night / 7
+    return night / 2
+
+
+def prayer_hours(lat, lon, day, utc_offset, method="ISNA", asr="shafi",
+                 high_lat="angle", elevation=0):
+    """مواقيت يوم بالساعات العشرية حسب التوقيت المحلي (utc_offset بالساعات)"""
+    params = METHODS[method]
+    factor = ASR_FACTORS[asr]
+    calc = _Day(lat, lon, day)
+    rise_set = 0.833 + 0.0347 * math.sqrt(elevation)
+
+    # تقدير أولي ثم تكرار واحد كما في PrayTimes
+    fajr = calc.angle_time(params["fajr"], 5, before_noon=True)
+    sunrise = calc.angle_time(rise_set, 6, before_noon=True)
+    dhuhr = calc.noon(12)
+    asr_time = calc.asr_time(factor, 13)
+    sunset = calc.angle_time(rise_set, 18)
+    isha = calc.angle_time(params["isha"], 18) if "isha" in params else math.nan
+
+    shift = utc_offset - lon / 15
+    times = {"fajr": fajr, "sunrise": sunrise, "dhuhr": dhuhr, "asr": asr_time,
+             "sunset": sunset, "maghrib": sunset, "isha": isha}
+    times = {name: value + shift for name, value in times.items()}
+
+    if high_lat != "none":
+        night = _fix(times["sunrise"] - times["sunset"], 24)
+        portion = _night_portion(high_lat, params["fajr"], night)
+        if math.isnan(times["fajr"]) or _fix(times["sunrise"] - times["fajr"], 24) > portion:
+            times["fajr"] = times["sunrise"] - portion
+        if "isha" in params:
+            portion = _night_portion(high_lat, params["isha"], night)
+            if math.isnan(times["isha"]) or _fix(times["isha"] - times["sunset"], 24) > portion:
+                times["isha"] = times["sunset"] + portion
+
+    if "isha_minutes" in params:
+        times["isha"] = times["maghrib"] + params["isha_minutes"] / 60
+    times["imsak"] = times["fajr"] - IMSAK_MINUTES / 60
+    times["midnight"] = times["sunset"] + _fix(times["sunrise"] - times["sunset"], 24) / 2
+    return {name: times[name] for name in NAMES}
+
+
+def format_time(hours):
+    """ساعات عشرية إلى HH:MM بالتقريب لأقرب دقيقة ('-----' إذا تعذر الحساب)"""
+    if math.isnan(hours):
+        return "-----"
+    minutes = int(_fix(hours + 0.5 / 60, 24) * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def local_utc_offset(day):
+    """فرق توقيت الجهاز عن غرينتش بالساعات في ذلك اليوم (مع التوقيت الصيفي)"""
+    offset = datetime(day.year, day.month, day.day, 12).astimezone().utcoffset()
+    return offset.total_seconds() / 3600
+
+
+def compute_prayer_times(lat, lon, day=None, utc_offset=None, method="ISNA", asr="shafi",
+                         high_lat="angle", elevation=0):
+    """مواقيت يوم بصيغة {name: "HH:MM"} بالمفاتيح نفسها التي يعيدها Aladhan
+
+    day تاريخ أو نص YYYY-MM-DD (الافتراضي اليوم)، و utc_offset الافتراضي
+    توقيت الجهاز.
+    """
+    if day is None:
+        day = date_type.today()
+    elif isinstance(day, str):
+        day = date_type.fromisoformat(day)
+    if utc_offset is None:
+        utc_offset = local_utc_offset(day)
+    hours = prayer_hours(lat, lon, day, utc_offset, method, asr, high_lat, elevation)
+    return {name: format_time(value) for name, value in hours.items()}
@@ -1,7 +1,26 @@
-import requests
 from datetime import datetime
 
 from database import get_setting, update_settings
+from http_client import HttpError, client
+from prayer_calc import ALADHAN_METHODS, ASR_FACTORS, METHODS, compute_prayer_times
+from settings_store import settings
+
+ALADHAN_URL = 'https://api.aladhan.com/v1'
+# timings for a past or future date do not change; refresh daily, serve up to a month
+ALADHAN_MAX_AGE = 24 * 3600
+ALADHAN_STALE = 30 * 24 * 3600
+
+# الموقع المحلَّل من الإعدادات، يُسقط عند تغيّر الإحداثيات
+_location = None
+
+
+def _on_location_changed(key, value):
+    global _location
+    _location = None
+
+
+settings.subscribe('latitude', _on_location_changed)
+settings.subscribe('longitude', _on_location_changed)
 
 
 def set_location(lat: float, lon: float):
@@ -11,41 +30,92 @@ def set_location(lat: float, lon: float):
 
 
 def get_location():
+    global _location
+    if _location is not None:
+        return _location
     lat = get_setting('latitude', None)
     lon = get_setting('longitude', None)
     if lat is None or lon is None:
         return None, None
     try:
-        return float(lat), float(lon)
+        _location = (float(lat), float(lon))
     except ValueError:
         return None, None
+    return _location
+
+
+def calculation_settings():
+    """Calculation options from settings as keyword arguments for compute_prayer_times."""
+    offset = get_setting('utc_offset', '')
+    try:
+        # empty means the device time zone for that date
+        offset = float(offset) if offset else None
+    except ValueError:
+        # so does a malformed value, rather than breaking every prayer time
+        offset = None
+    method = get_setting('prayer_method', 'ISNA')
+    asr = get_setting('asr_school', 'shafi')
+    return {
+        # unknown names (e.g. 'mwl') fall back to the defaults as well
+        'method': method if method in METHODS else 'ISNA',
+        'asr': asr if asr in ASR_FACTORS else 'shafi',
+        'high_lat': get_setting('high_lat_rule', 'angle'),
+        'utc_offset': offset,
+    }
 
 
 def fetch_prayer_times(lat, lon, date=None):
-    """Fetch prayer times for a given date from Aladhan API.
+    """Prayer times for a given date (YYYY-MM-DD, default today).
+    Computed locally; the Aladhan API is used only when the 'prayer_source'
+    setting is 'aladhan', with the local result as fallback.
     Returns dict keys: fajr, dhuhr, asr, maghrib, isha, sunrise, sunset etc.
     """
+    return fetch_prayer_times_source(lat, lon, date)[0]
+
+
+def fetch_prayer_times_source(lat, lon, date=None):
+    """Like fetch_prayer_times, as (times, source) where source is 'aladhan'
+    or 'local', so callers can tell the local fallback from an API answer.
+    """
     if date is None:
         date = datetime.now().strftime('%Y-%m-%d')
-    url = f'https://api.aladhan.com/v1/timings/{date}?latitude={lat}&longitude={lon}&method=2'
+    options = calculation_settings()
+    if get_setting('prayer_source', 'local') == 'aladhan':
+        times = fetch_online_prayer_times(lat, lon, date, options)
+        if times:
+            return times, 'aladhan'
+    return compute_prayer_times(lat, lon, date, **options), 'local'
+
+
+def fetch_online_prayer_times(lat, lon, date, options=None):
+    """Fetch prayer times for a given date from Aladhan API ({} on failure).
+    Goes through http_client, so a cached response is served while the
+    network is slow or down.
+    """
+    options = options or calculation_settings()
+    method = ALADHAN_METHODS.get(options['method'], 2)
+    school = 1 if options['asr'] == 'hanafi' else 0
+    url = (f'{ALADHAN_URL}/timings/{date}?latitude={lat}&longitude={lon}'
+           f'&method={method}&school={school}')
     try:
-        r = requests.get(url, timeout=5)
-        data = r.json()
+        data = client.get_json(url, max_age=ALADHAN_MAX_AGE, stale=ALADHAN_STALE)
         times = data.get('data', {}).get('timings', {})
         return {k.lower(): v for k, v in times.items()}
-    except Exception as e:
+    except (HttpError, AttributeError) as e:
         print('failed to fetch prayer times', e)
         return {}
 
 
 def get_today_prayer_times():
     """Return prayer times for today, using stored location if available.
-    Falls back to default PRAYER_TIMES from islamic_data.
+    Served from prayer_cache, so repeated calls do not recompute or refetch.
+    Falls back to default PRAYER_TIMES from islamic_data when no location is set.
     """
     from islamic_data import PRAYER_TIMES
+    from prayer_cache import get_times
     lat, lon = get_location()
     if lat is not None and lon is not None:
-        times = fetch_prayer_times(lat, lon)
+        times = get_times(lat, lon)
         if times:
             return times
     return PRAYER_TIMES.copy()
@@ -0,0 +1,80 @@
+"""
+ذاكرة مؤقتة لنتائج الاستعلامات التجميعية
+كل نتيجة تُحفظ مع أرقام أجيال (generations) الموضوعات التي تعتمد عليها،
+ودوال الكتابة تزيد رقم الجيل بعد الـ commit فتسقط النتائج القديمة تلقائياً
+"""
+
+import functools
+import threading
+import clock
+from connection import manager
+
+
+# موضوعات البيانات التي تُبطل الذاكرة
+ACTIVITY = "activity"
+RAMADAN_PLAN = "ramadan_plan"
+KHATMA = "khatma"
+TOPICS = (ACTIVITY, RAMADAN_PLAN, KHATMA)
+
+_lock = threading.Lock()
+_generations = {}
+_counts = {}
+_entries = []
+
+
+def bump(*topics):
+    """إعلان أن بيانات هذه الموضوعات تغيّرت (بعد الـ commit)"""
+    with _lock:
+        for topic in topics:
+            _generations[topic] = _generations.get(topic, 0) + 1
+
+
+def _snapshot(topics):
+    # تبديل قاعدة البيانات وتغيّر اليوم يبطلان كل شيء أيضاً
+    return (manager.generation, clock.today()) + tuple(_generations.get(t, 0) for t in topics)
+
+
+def cached(*topics):
+    """تغليف دالة قراءة بذاكرة مفتاحها الوسائط، صالحة ما دامت أجيال topics ثابتة
+
+    القيمة المُرجعة نفسها تُعاد في كل إصابة، فلا يجوز للمستدعي تعديلها.
+    """
+    def decorator(fn):
+        entries = {}
+        with _lock:
+            counts = _counts.setdefault(f"{fn.__module__}.{fn.__name__}", {"hits": 0, "misses": 0})
+        _entries.append(entries)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            # اللقطة قبل الاستعلام: كتابة متزامنة معه تجعل النتيجة قديمة عند الطلب التالي
+            snapshot = _snapshot(topics)
+            entry = entries.get(key)
+            hit = entry is not None and entry[0] == snapshot
+            with _lock:
+                counts["hits" if hit else "misses"] += 1
+            if hit:
+                return entry[1]
+            value = fn(*args, **kwargs)
+            entries[key] = (snapshot, value)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
+
+
+def stats():
+    """عدد الإصابات والإخفاقات لكل دالة {name: {"hits": n, "misses": n}}"""
+    with _lock:
+        return {name: dict(counts) for name, counts in _counts.items()}
+
+
+def clear():
+    """إفراغ كل النتائج المحفوظة وتصفير العدّادات"""
+    for entries in _entries:
+        entries.clear()
+    with _lock:
+        for counts in _counts.values():
+            counts["hits"] = counts["misses"] = 0
@@ -5,6 +5,9 @@ from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.spinner import Spinner
@@ -12,6 +15,7 @@ from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
 from kivy.uix.image import Image
 from kivy.core.window import Window
+from kivy.clock import Clock
 from datetime import datetime, timedelta
 from database import (
     get_last_read, save_last_read, add_tasbih, get_tasbih_count,
@@ -22,8 +26,10 @@ from database import (
 from islamic_data import ADHKAR_SABAH, ADHKAR_MASAA, DUAS, HADITH, PRAYER_NAMES, SURAHS
 from khatma import update_khatma, get_khatma_pages, get_completed_khatmas
 from achievements import check_achievements, unlock_badge
-from hijri_utils import get_hijri_date, gregorian_to_hijri
+from hijri_utils import get_hijri_date
 from statistics import get_ramadan_plan_stats
+from forecast import forecast_ramadan_plan
+import async_db
 import json
 import os
 
@@ -81,43 +87,25 @@ class HomeScreen(Screen):
         )
         layout.add_widget(daily_ayah)
 
-        # التاريخ الهجري
-        self.hijri_label = Label(
-            text=f"التاريخ الهجري: {get_hijri_date()}",
-            size_hint_y=0.05,
-            font_size=16
-        )
+        # التاريخ الهجري والحدث القادم وتهنئة رمضان تُملأ من الخلفية
+        self.hijri_label = Label(text="التاريخ الهجري: …", size_hint_y=0.05, font_size=16)
         layout.add_widget(self.hijri_label)
 
         # عرض الحدث الإسلامي القادم
-        event_text = self.get_next_event_text()
-        self.event_label = Label(text=event_text, size_hint_y=0.05, font_size=14, italic=True)
+        self.event_label = Label(text="", size_hint_y=0.05, font_size=14, italic=True)
         layout.add_widget(self.event_label)
 
-        # التاريخ الهجري
-        self.hijri_label = Label(
-            text=f"التاريخ الهجري: {get_hijri_date()}",
+        # تهنئة رمضانية إذا كنا في شهر رمضان
+        self.ramadan_greet = Label(
+            text="",
             size_hint_y=0.05,
-            font_size=16
+            font_size=18,
+            color=(1, 0.7, 0.2, 1)
         )
-        layout.add_widget(self.hijri_label)
-
-        # تهنئة رمضانية إذا كنا في شهر رمضان
-        y, m, d = gregorian_to_hijri(datetime.now())
-        if m == 9:
-            self.ramadan_greet = Label(
-                text="رمضان كريم 🌙",
-                size_hint_y=0.05,
-                font_size=18,
-                color=(1, 0.7, 0.2, 1)
-            )
-            layout.add_widget(self.ramadan_greet)
-        else:
-            # create empty label to maintain attribute
-            self.ramadan_greet = Label(text="", size_hint_y=0.05)
-            layout.add_widget(self.ramadan_greet)
+        layout.add_widget(self.ramadan_greet)
         
         self.add_widget(layout)
+        self.load_header()
     
     def go_to_screen(self, name):
         def callback(instance):
@@ -125,41 +113,153 @@ class HomeScreen(Screen):
         return callback
 
     def on_pre_enter(self):
-        # update hijri date whenever returning to home
-        if hasattr(self, 'hijri_label'):
-            self.hijri_label.text = f"التاريخ الهجري: {get_hijri_date()}"
-        # update Ramadan greeting
-        if hasattr(self, 'ramadan_greet'):
-            y, m, d = gregorian_to_hijri(datetime.now())
-            if m == 9:
-                self.ramadan_greet.text = "رمضان كريم 🌙"
-            else:
-                self.ramadan_greet.text = ""
-        # update next event text
-        if hasattr(self, 'event_label'):
-            self.event_label.text = self.get_next_event_text()
+        # update hijri date, greeting and next event whenever returning to home
+        self.load_header()
+
+    def load_header(self):
+        async_db.gather({
+            "hijri": (get_hijri_date,),
+            "event": (self.get_next_event_text,),
+        }, callback=self.show_header)
+
+    def show_header(self, data):
+        self.hijri_label.text = f"التاريخ الهجري: {data['hijri']}"
+        month = int(data["hijri"].split("/")[1])
+        self.ramadan_greet.text = "رمضان كريم 🌙" if month == 9 else ""
+        self.event_label.text = data["event"]
 
     def get_next_event_text(self):
-        from islamic_data import ISLAMIC_EVENTS
-        y, m, d = gregorian_to_hijri(datetime.now())
-        # find event on same month/day >= today
-        candidates = []
-        for (em, ed), name in ISLAMIC_EVENTS.items():
-            if em == m and ed >= d:
-                candidates.append((em, ed, name))
-        if not candidates:
-            # look at next months
-            for (em, ed), name in ISLAMIC_EVENTS.items():
-                if em > m:
-                    candidates.append((em, ed, name))
-        if candidates:
-            # choose earliest
-            candidates.sort(key=lambda x: (x[0], x[1]))
-            em, ed, name = candidates[0]
-            return f"الحدث القادم: {name} ({em}/{ed})"
+        from event_index import next_events
+        upcoming = next_events(1)
+        if upcoming:
+            event = upcoming[0]
+            y, m, d = event["hijri"]
+            days_left = event["days_left"]
+            when = "اليوم" if days_left == 0 else f"بعد {days_left} يوم"
+            return f"الحدث القادم: {event['name']} ({m}/{d}) - {when}"
         return "لا توجد مناسبات قريبة"
 
 
+def get_ayah_text(quran_data, surah_number, i):
+    """نص الآية i من السورة بأي من صيغ quran.json المدعومة، أو None"""
+    try:
+        if isinstance(quran_data, dict) and 'surahs' in quran_data:
+            sdata = quran_data['surahs'].get(str(surah_number))
+            if sdata and 'ayahs' in sdata and len(sdata['ayahs']) >= i:
+                return sdata['ayahs'][i - 1]
+        if isinstance(quran_data, dict) and str(surah_number) in quran_data:
+            arr = quran_data.get(str(surah_number))
+            if isinstance(arr, list) and len(arr) >= i:
+                return arr[i - 1]
+        if isinstance(quran_data, list):
+            sindex = surah_number - 1
+            if 0 <= sindex < len(quran_data):
+                sdata = quran_data[sindex]
+                if isinstance(sdata, dict) and 'ayahs' in sdata and len(sdata['ayahs']) >= i:
+                    return sdata['ayahs'][i - 1]
+    except Exception:
+        pass
+    return None
+
+
+class AyahView(RecycleDataViewBehavior, Label):
+    """سطر في قائمة الآيات؛ يُعاد استخدامه لآيات مختلفة أثناء التمرير"""
+    index = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.halign = 'center'
+        self.valign = 'middle'
+        self.bind(width=lambda *_: setattr(self, 'text_size', (self.width, None)))
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        return super().refresh_view_attrs(rv, index, data)
+
+    def on_texture_size(self, instance, size):
+        # الارتفاع التقديري في البيانات يُصحَّح بعد رسم النص فعلاً
+        rv = self.parent.recycleview if self.parent is not None else None
+        if rv is None or self.index is None or self.index >= len(rv.data):
+            return
+        height = size[1] + AyahList.PADDING
+        row = rv.data[self.index]
+        if abs(row['height'] - height) > 1:
+            row['height'] = height
+            rv.refresh_from_layout()
+
+
+class AyahList(RecycleView):
+    """قائمة آيات السورة: البيانات صفوف خفيفة، والعناصر المرئية فقط تُنشأ
+
+    الآية الحالية تُظلَّل بتغيير بياناتها دون إعادة بناء القائمة.
+    """
+    PADDING = 24
+    FONT_SIZE = 16
+    HIGHLIGHT = (1, 0.8, 0.3, 1)
+    NORMAL = (1, 1, 1, 1)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        layout = RecycleBoxLayout(orientation='vertical', spacing=8, size_hint_y=None,
+                                  default_size_hint=(1, None), default_size=(None, 80))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        # بعد إضافة مدير التخطيط حتى يصل إليه نوع العنصر
+        self.viewclass = AyahView
+        self.current = None
+        self.bind(width=lambda *_: self._estimate_heights())
+
+    def _estimate_height(self, text, font_size):
+        # عرض الحرف العربي نحو نصف حجم الخط، والسطر مرة ونصف
+        per_line = max(1, int(max(self.width, 100) / (font_size * 0.5)))
+        lines = -(-len(text) // per_line)
+        return lines * font_size * 1.5 + self.PADDING
+
+    def _estimate_heights(self):
+        for row in self.data:
+            row['height'] = self._estimate_height(row['text'], row['font_size'])
+        self.refresh_from_layout()
+
+    def set_surah(self, surah, quran_data, current=1):
+        """بيانات السورة كاملة: رأس ثم صف لكل آية (الصف i هو الآية i)"""
+        header = f"{surah['name']} - عدد الآيات: {surah.get('ayahs', '?')}"
+        rows = [{'text': header, 'font_size': 18, 'bold': True, 'color': self.NORMAL, 'markup': False}]
+        for i in range(1, surah.get('ayahs', 0) + 1):
+            ayah_text = get_ayah_text(quran_data, surah['number'], i)
+            display = ayah_text if ayah_text else "(نص الآية غير متوفر)"
+            rows.append({'text': f"{i}. {display}", 'font_size': self.FONT_SIZE,
+                         'bold': False, 'color': self.NORMAL, 'markup': True})
+        for row in rows:
+            row['height'] = self._estimate_height(row['text'], row['font_size'])
+        self.current = None
+        self.data = rows
+        self.scroll_y = 1
+        self.set_current(current)
+
+    def set_current(self, ayah):
+        """نقل التظليل إلى الآية ayah وإظهارها"""
+        if not 1 <= ayah < len(self.data):
+            return
+        if self.current is not None:
+            self.data[self.current]['color'] = self.NORMAL
+        self.data[ayah]['color'] = self.HIGHLIGHT
+        self.current = ayah
+        self.refresh_from_data()
+        self.scroll_to_row(ayah)
+
+    def scroll_to_row(self, index):
+        spacing = self.layout_manager.spacing if self.layout_manager else 0
+        heights = [row['height'] + spacing for row in self.data]
+        total = sum(heights)
+        viewport = self.height
+        if total <= viewport:
+            return
+        top = sum(heights[:index])
+        # إبقاء الآية في منتصف الشاشة تقريباً
+        offset = min(max(0, top - (viewport - heights[index]) / 2), total - viewport)
+        self.scroll_y = 1 - offset / (total - viewport)
+
+
 class QuranScreen(Screen):
     """شاشة قراءة القرآن"""
     def __init__(self, **kwargs):
@@ -188,12 +288,13 @@ class QuranScreen(Screen):
         spinner.bind(text=self.on_surah_selected)
         layout.add_widget(spinner)
         
-        # منطقة الآيات - عرض كل الآيات في قائمة قابلة للتمرير
-        scroll = ScrollView(size_hint=(1, 0.7))
-        self.ayahs_layout = GridLayout(cols=1, spacing=8, size_hint_y=None)
-        self.ayahs_layout.bind(minimum_height=self.ayahs_layout.setter('height'))
-        scroll.add_widget(self.ayahs_layout)
-        layout.add_widget(scroll)
+        # منطقة الآيات - قائمة معاد تدويرها تنشئ الآيات الظاهرة فقط
+        self.ayah_list = AyahList(size_hint=(1, 0.65))
+        layout.add_widget(self.ayah_list)
+
+        # موضع القراءة الحالي
+        self.ayah_label = Label(text="", size_hint_y=0.05, font_size=14)
+        layout.add_widget(self.ayah_label)
         
         # الأزرار
         button_layout = BoxLayout(size_hint_y=0.1, spacing=10)
@@ -218,6 +319,7 @@ class QuranScreen(Screen):
         layout.add_widget(back_btn)
         
         self.add_widget(layout)
+        self.update_ayah_display()
     
     def on_surah_selected(self, spinner, text):
         for surah in SURAHS:
@@ -228,58 +330,19 @@ class QuranScreen(Screen):
                 break
     
     def update_ayah_display(self):
+        """تحميل السورة الحالية في القائمة (مرة لكل سورة)"""
         surah = next((s for s in SURAHS if s['number'] == self.current_surah), None)
         # تأكد من تحميل بيانات المصحف إذا كانت متاحة
         if self.quran_data is None:
             self.load_quran_data()
-
-        # افرغ قائمة العرض وأعد ملئها بكل الآيات
-        self.ayahs_layout.clear_widgets()
         if not surah:
+            self.ayah_list.data = []
             return
+        self.ayah_list.set_surah(surah, self.quran_data, self.current_ayah)
+        self.update_position_label(surah)
 
-        # رأس السورة
-        header_label = Label(
-            text=f"{surah['name']} - عدد الآيات: {surah.get('ayahs', '?')}",
-            size_hint_y=None,
-            height=40,
-            font_size=18,
-            bold=True
-        )
-        self.ayahs_layout.add_widget(header_label)
-
-        total = surah.get('ayahs', 0)
-        for i in range(1, total + 1):
-            ayah_text = None
-            try:
-                if self.quran_data:
-                    # حاول الحصول على النص بنفس الصيغ المدعومة سابقًا
-                    if isinstance(self.quran_data, dict) and 'surahs' in self.quran_data:
-                        sdata = self.quran_data['surahs'].get(str(self.current_surah))
-                        if sdata and 'ayahs' in sdata and len(sdata['ayahs']) >= i:
-                            ayah_text = sdata['ayahs'][i - 1]
-                    if ayah_text is None and isinstance(self.quran_data, dict) and str(self.current_surah) in self.quran_data:
-                        arr = self.quran_data.get(str(self.current_surah))
-                        if isinstance(arr, list) and len(arr) >= i:
-                            ayah_text = arr[i - 1]
-                    if ayah_text is None and isinstance(self.quran_data, list):
-                        sindex = self.current_surah - 1
-                        if 0 <= sindex < len(self.quran_data):
-                            sdata = self.quran_data[sindex]
-                            if isinstance(sdata, dict) and 'ayahs' in sdata and len(sdata['ayahs']) >= i:
-                                ayah_text = sdata['ayahs'][i - 1]
-            except Exception:
-                ayah_text = None
-
-            display = ayah_text if ayah_text else f"(نص الآية غير متوفر)"
-            label = Label(
-                text=f"{i}. {display}",
-                size_hint_y=None,
-                height=80,
-                font_size=16,
-                markup=True
-            )
-            self.ayahs_layout.add_widget(label)
+    def update_position_label(self, surah):
+        self.ayah_label.text = f"{surah['name']} - الآية {self.current_ayah} من {surah['ayahs']}"
 
     def load_quran_data(self):
         try:
@@ -295,32 +358,35 @@ class QuranScreen(Screen):
                 self.quran_data = None
         except Exception:
             self.quran_data = None
+
+    def move_to_ayah(self, ayah):
+        """تغيير الآية الحالية: تظليل فقط إذا كانت السورة معروضة"""
+        surah = next((s for s in SURAHS if s['number'] == self.current_surah), None)
+        self.current_ayah = ayah
+        if surah and len(self.ayah_list.data) == surah['ayahs'] + 1:
+            self.ayah_list.set_current(ayah)
+            self.update_position_label(surah)
+        else:
+            self.update_ayah_display()
     
     def prev_ayah(self, instance):
         if self.current_ayah > 1:
-            self.current_ayah -= 1
-            self.update_ayah_display()
+            self.move_to_ayah(self.current_ayah - 1)
 
     def next_ayah(self, instance):
         surah = next((s for s in SURAHS if s['number'] == self.current_surah), None)
         if surah and self.current_ayah < surah['ayahs']:
-            self.current_ayah += 1
-            self.update_ayah_display()
+            self.move_to_ayah(self.current_ayah + 1)
             # log a single ayah read
             from database import log_reading
             log_reading(1)
     
-    def next_ayah(self, instance):
-        surah = next((s for s in SURAHS if s['number'] == self.current_surah), None)
-        if surah and self.current_ayah < surah['ayahs']:
-            self.current_ayah += 1
-            self.update_ayah_display()
-    
     def save_progress(self, instance):
         surah = next((s for s in SURAHS if s['number'] == self.current_surah), None)
         if surah:
             save_last_read(surah['name'], self.current_ayah)
-            self.ayah_label.text += "\n✅ تم حفظ التقدم"
+            self.update_position_label(surah)
+            self.ayah_label.text += " ✅ تم حفظ التقدم"
             from database import log_reading
             log_reading(1)
 
@@ -330,7 +396,9 @@ class PrayerScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name = 'prayer'
+        self.time_labels = {}
         self.build_ui()
+        self.load_times()
     
     def build_ui(self):
         layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
@@ -343,10 +411,7 @@ class PrayerScreen(Screen):
         prayer_layout = GridLayout(cols=1, spacing=10, size_hint_y=None)
         prayer_layout.bind(minimum_height=prayer_layout.setter('height'))
         
-        from prayer_utils import get_today_prayer_times
-        # refresh times to ensure current
-        times = get_today_prayer_times()
-        
+        # الأوقات تُملأ عند وصولها من الخلفية (قد تتطلب حساباً أو جلباً)
         for prayer_key, prayer_name in PRAYER_NAMES.items():
             prayer_box = BoxLayout(size_hint_y=None, height=50, spacing=10)
             
@@ -359,11 +424,12 @@ class PrayerScreen(Screen):
             prayer_box.add_widget(prayer_label)
             
             time_label = Label(
-                text=times.get(prayer_key, "لم يتحدد"),
+                text="…",
                 size_hint_x=0.4,
                 font_size=18
             )
             prayer_box.add_widget(time_label)
+            self.time_labels[prayer_key] = time_label
             
             prayer_layout.add_widget(prayer_box)
         
@@ -372,7 +438,7 @@ class PrayerScreen(Screen):
 
         # زر تحديث الأوقات
         refresh_btn = Button(text="🔄 تحديث الأوقات", size_hint_y=0.1)
-        refresh_btn.bind(on_press=lambda x: self.build_ui())
+        refresh_btn.bind(on_press=lambda x: self.load_times())
         layout.add_widget(refresh_btn)
         
         # زر العودة
@@ -382,6 +448,18 @@ class PrayerScreen(Screen):
         
         self.add_widget(layout)
 
+    def on_pre_enter(self):
+        # refresh times to ensure current
+        self.load_times()
+
+    def load_times(self):
+        from prayer_utils import get_today_prayer_times
+        async_db.submit(get_today_prayer_times, callback=self.show_times)
+
+    def show_times(self, times):
+        for prayer_key, label in self.time_labels.items():
+            label.text = times.get(prayer_key, "لم يتحدد")
+
 
 class AdhkarScreen(Screen):
     """شاشة الأذكار"""
@@ -647,9 +725,19 @@ class HadithScreen(Screen):
 
 class StatisticsScreen(Screen):
     """شاشة الإحصائيات"""
+    # عناوين الإحصائيات بترتيب العرض
+    STAT_LABELS = [
+        ("tasbih", "عدد التسبيحات اليوم"),
+        ("khatmas", "الختمات المكتملة"),
+        ("plan", "خطة رمضان"),
+        ("average", "متوسط القراءة 7 أيام"),
+        ("plan_average", "متوسط خطة رمضان"),
+    ]
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name = 'stats'
+        self.value_labels = {}
         self.build_ui()
 
     def build_ui(self):
@@ -661,28 +749,8 @@ class StatisticsScreen(Screen):
         # الإحصائيات
         stats_layout = GridLayout(cols=2, spacing=20, size_hint_y=0.7)
         
-        # نجلب البيانات الحيّة
-        stats = []
-        stats.append(("عدد التسبيحات اليوم", str(get_tasbih_count())))
-        stats.append(("الختمات المكتملة", str(get_completed_khatmas())))
-        # خطط القراءة
-        plan = get_ramadan_plan()
-        if plan:
-            total = 604
-            pages = plan['pages_read']
-            stats.append(("خطة رمضان", f"{pages}/{total} صفحة"))
-        else:
-            stats.append(("خطة رمضان", "لا توجد"))
-        
-        # إحصائيات قراءة إضافية
-        avg = get_average_reading(7)
-        stats.append(("متوسط القراءة 7 أيام", f"{avg:.1f} صفحة"))
-        # إضافة متوسط الخطة إن وجد
-        plan_stats = get_ramadan_plan_stats()
-        if plan_stats:
-            stats.append(("متوسط خطة رمضان", f"{plan_stats['avg_per_day']:.1f} صفحة/يوم"))
-        
-        for label_text, value in stats:
+        # القيم تُملأ عند وصول نتيجة الاستعلام من الخلفية
+        for key, label_text in self.STAT_LABELS:
             stat_box = BoxLayout(orientation='vertical', padding=10, spacing=5)
             
             label = Label(
@@ -694,13 +762,14 @@ class StatisticsScreen(Screen):
             stat_box.add_widget(label)
             
             value_label = Label(
-                text=value,
+                text="…",
                 size_hint_y=0.6,
                 font_size=28,
                 bold=True,
                 color=(0.2, 0.6, 0.86, 1)
             )
             stat_box.add_widget(value_label)
+            self.value_labels[key] = value_label
             
             stats_layout.add_widget(stat_box)
         
@@ -713,6 +782,34 @@ class StatisticsScreen(Screen):
         
         self.add_widget(layout)
 
+    def on_pre_enter(self):
+        # نجلب البيانات الحيّة في الخلفية
+        async_db.gather({
+            "tasbih": (get_tasbih_count,),
+            "khatmas": (get_completed_khatmas,),
+            "plan": (get_ramadan_plan,),
+            "average": (get_average_reading, 7),
+            "plan_stats": (get_ramadan_plan_stats,),
+        }, callback=self.fill_stats)
+
+    def fill_stats(self, data):
+        values = self.value_labels
+        values["tasbih"].text = str(data["tasbih"])
+        values["khatmas"].text = str(data["khatmas"])
+        # خطط القراءة
+        plan = data["plan"]
+        if plan:
+            total = 604
+            values["plan"].text = f"{plan['pages_read']}/{total} صفحة"
+        else:
+            values["plan"].text = "لا توجد"
+        values["average"].text = f"{data['average']:.1f} صفحة"
+        plan_stats = data["plan_stats"]
+        if plan_stats:
+            values["plan_average"].text = f"{plan_stats['avg_per_day']:.1f} صفحة/يوم"
+        else:
+            values["plan_average"].text = "—"
+
 
 class RamadanPlanScreen(Screen):
     """شاشة خطة رمضان (ختمة القرآن خلال رمضان)"""
@@ -727,7 +824,7 @@ class RamadanPlanScreen(Screen):
         layout.add_widget(title)
 
         # معلومات الخطة الحالية
-        self.info_label = Label(text="", size_hint_y=0.2, font_size=16)
+        self.info_label = Label(text="…", size_hint_y=0.2, font_size=16)
         layout.add_widget(self.info_label)
         self.update_plan_info()
 
@@ -757,9 +854,16 @@ class RamadanPlanScreen(Screen):
         self.add_widget(layout)
 
     def update_plan_info(self):
-        plan = get_ramadan_plan()
+        async_db.gather({
+            "plan": (get_ramadan_plan,),
+            "target": (get_ramadan_daily_target,),
+            "forecast": (forecast_ramadan_plan,),
+        }, callback=self.show_plan_info)
+
+    def show_plan_info(self, data):
+        plan = data["plan"]
         if plan:
-            target = get_ramadan_daily_target() or '?'
+            target = data["target"] or '?'
             total = 604
             remaining = total - plan['pages_read']
             self.info_label.text = (f"الخطة الحالية: {plan['plan_days']} يوم\n"
@@ -767,61 +871,76 @@ class RamadanPlanScreen(Screen):
                                     f"الصفحات المقروءة: {plan['pages_read']} من {total}\n"
                                     f"الصفحات المطلوبة يومياً: {target}\n"
                                     f"المتبقي: {remaining}")
+            forecast = data["forecast"]
+            if forecast and forecast["projected_date"]:
+                early, late = forecast["band"]
+                band = f" ({early} - {late})" if early and late else ""
+                self.info_label.text += f"\nالإتمام المتوقع: {forecast['projected_date']}{band}"
+            if forecast:
+                # needed_per_day فارغ بعد انقضاء آخر أيام الخطة
+                if forecast["needed_per_day"] is not None:
+                    self.info_label.text += f"\nالمطلوب يومياً الآن: {forecast['needed_per_day']}"
+                elif forecast["remaining"]:
+                    self.info_label.text += "\nانتهت مدة الخطة"
         else:
             self.info_label.text = "لم يتم اختيار خطة بعد."
 
     def choose_plan(self, days):
         def callback(instance):
-            set_ramadan_plan(days)
-            self.update_plan_info()
+            async_db.submit(set_ramadan_plan, days, callback=lambda _: self.update_plan_info())
         return callback
 
-    def get_ramadan_calendar(self):
+    @staticmethod
+    def get_ramadan_dates():
+        """أيام الخطة الحالية (YYYY-MM-DD)"""
         plan = get_ramadan_plan()
         if not plan:
             return []
         start = datetime.strptime(plan['start_date'], "%Y-%m-%d")
-        days = plan['plan_days']
-        from prayer_utils import fetch_prayer_times, get_location
+        return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(plan['plan_days'])]
+
+    def get_ramadan_calendar(self):
+        dates = self.get_ramadan_dates()
+        if not dates:
+            return []
+        from prayer_batch import fetcher
+        from prayer_utils import get_location
         lat, lon = get_location()
+        results = {}
+        if lat is not None and lon is not None:
+            results = fetcher.fetch_all(lat, lon, dates)
         cal = []
-        for i in range(days):
-            date = start + timedelta(days=i)
-            if lat is not None and lon is not None:
-                times = fetch_prayer_times(lat, lon, date.strftime("%Y-%m-%d"))
-            else:
-                times = {}
-            suhur = times.get('fajr', '')
-            iftar = times.get('maghrib', '')
-            cal.append((date.strftime("%Y-%m-%d"), suhur, iftar))
+        for date in dates:
+            times = results.get(date, {})
+            cal.append((date, times.get('fajr', ''), times.get('maghrib', '')))
         return cal
 
-    def show_calendar(self, instance):
-        cal = self.get_ramadan_calendar()
-        if not cal:
+    @classmethod
+    def calendar_dates(cls):
+        """أيام الخطة، أو أيام رمضان كاملاً إذا لم توجد خطة"""
+        dates = cls.get_ramadan_dates()
+        if not dates:
             # try full Ramadan month
             from hijri_utils import get_ramadan_gregorian_dates
             dates = get_ramadan_gregorian_dates()
-            if not dates:
-                popup = Popup(title="تقويم رمضان", content=Label(text="لا توجد خطة لتوليد التقويم ولا يمكن تحديد رمضان"), size_hint=(0.8, 0.4))
-                popup.open()
-                return
-            # build cal list from dates
-            from prayer_utils import fetch_prayer_times, get_location
-            lat, lon = get_location()
-            cal = []
-            for date in dates:
-                if lat is not None and lon is not None:
-                    times = fetch_prayer_times(lat, lon, date)
-                else:
-                    times = {}
-                cal.append((date, times.get('fajr',''), times.get('maghrib','')))
-        # build display
+        return dates
+
+    def show_calendar(self, instance):
+        async_db.submit(self.calendar_dates, callback=self.open_calendar)
+
+    def open_calendar(self, dates):
+        if not dates:
+            popup = Popup(title="تقويم رمضان", content=Label(text="لا توجد خطة لتوليد التقويم ولا يمكن تحديد رمضان"), size_hint=(0.8, 0.4))
+            popup.open()
+            return
+        # build display, times fill in as each day arrives
         scroll = ScrollView(size_hint=(1, 0.8))
         grid = GridLayout(cols=1, spacing=5, size_hint_y=None)
         grid.bind(minimum_height=grid.setter('height'))
-        for date, suhur, iftar in cal:
-            lbl = Label(text=f"{date} - سحور: {suhur} - إفطار: {iftar}", size_hint_y=None, height=40, font_size=14)
+        rows = {}
+        for date in dates:
+            lbl = Label(text=f"{date} - سحور: … - إفطار: …", size_hint_y=None, height=40, font_size=14)
+            rows[date] = lbl
             grid.add_widget(lbl)
         scroll.add_widget(grid)
         content = BoxLayout(orientation='vertical')
@@ -832,6 +951,26 @@ class RamadanPlanScreen(Screen):
         content.add_widget(btn)
         popup.open()
 
+        def show_day(date, times):
+            rows[date].text = f"{date} - سحور: {times.get('fajr', '')} - إفطار: {times.get('maghrib', '')}"
+
+        def fetch():
+            from prayer_batch import fetcher
+            from prayer_utils import get_location
+            lat, lon = get_location()
+            if lat is None or lon is None:
+                return False
+            fetcher.fetch(lat, lon, dates, on_day=lambda date, times: Clock.schedule_once(
+                lambda dt: show_day(date, times)))
+            return True
+
+        def no_location(started):
+            if not started:
+                for date in dates:
+                    show_day(date, {})
+
+        async_db.submit(fetch, callback=no_location)
+
     def add_pages(self, instance):
         content = BoxLayout(orientation='vertical', spacing=10, padding=10)
         ti = TextInput(hint_text="عدد الصفحات", input_filter='int', multiline=False)
@@ -845,20 +984,28 @@ class RamadanPlanScreen(Screen):
             except:
                 pages = 0
             if pages > 0:
-                new = add_ramadan_pages(pages)
-                update_khatma(pages)
-                self.update_plan_info()
-                # notify if passed today's target
-                target = get_ramadan_daily_target()
-                if target and new >= target:
-                    from notifications import send_notification
-                    send_notification("✅ هدف اليوم", "لقد وصلت أو تخطيت هدفك اليومي!", timeout=10)
-                if new and new >= 604:
-                    unlock_badge("ختمة رمضان")
+                async_db.submit(self.record_pages, pages, callback=self.pages_recorded)
                 popup.dismiss()
         btn.bind(on_press=on_confirm)
         popup.open()
 
+    @staticmethod
+    def record_pages(pages):
+        """تسجيل الصفحات وإرجاع (مجموع الخطة، هدف اليوم)"""
+        new = add_ramadan_pages(pages)
+        update_khatma(pages)
+        if new and new >= 604:
+            unlock_badge("ختمة رمضان")
+        return new, get_ramadan_daily_target()
+
+    def pages_recorded(self, result):
+        new, target = result
+        self.update_plan_info()
+        # notify if passed today's target
+        if target and new >= target:
+            from notifications import send_notification
+            send_notification("✅ هدف اليوم", "لقد وصلت أو تخطيت هدفك اليومي!", timeout=10)
+
     # end of RamadanPlanScreen, build_ui already defined above
 
 
@@ -909,6 +1056,11 @@ class SettingsScreen(Screen):
         loc_btn = Button(text="حفظ الموقع وتحديث أوقات الصلاة")
         loc_btn.bind(on_press=self.save_location)
         settings_layout.add_widget(loc_btn)
+
+        # صيانة: تحويل قاعدة بيانات قديمة إلى الضغط التدريجي (إعادة كتابة كاملة)
+        vacuum_btn = Button(text="🧹 ضغط قاعدة البيانات")
+        vacuum_btn.bind(on_press=self.compact_database)
+        settings_layout.add_widget(vacuum_btn)
         
         # حجم الخط
         font_layout = BoxLayout(size_hint_y=0.2)
@@ -931,16 +1083,26 @@ class SettingsScreen(Screen):
         
         self.add_widget(layout)
     
-    def toggle_dark_mode(self, instance):
+    @staticmethod
+    def switch_dark_mode():
+        # يعمل في خيط async_db؛ المظهر يُطبَّق في الخيط الرئيسي عبر مشترك main.py
         current = get_setting("dark_mode", "true")
         new_value = "false" if current == "true" else "true"
         update_settings("dark_mode", new_value)
-        instance.text = "تعطيل" if new_value == "true" else "تفعيل"
+        return new_value
+
+    def toggle_dark_mode(self, instance):
+        def show(new_value):
+            instance.text = "تعطيل" if new_value == "true" else "تفعيل"
+        async_db.submit(self.switch_dark_mode, callback=show)
 
     def on_pre_enter(self):
         # populate location fields if stored
         from prayer_utils import get_location
-        lat, lon = get_location()
+        async_db.submit(get_location, callback=self.show_location)
+
+    def show_location(self, location):
+        lat, lon = location
         if lat is not None:
             self.lat_input.text = str(lat)
         if lon is not None:
@@ -951,11 +1113,29 @@ class SettingsScreen(Screen):
         try:
             lat = float(self.lat_input.text)
             lon = float(self.lon_input.text)
+        except ValueError as e:
+            self.location_saved(e)
+            return
+
+        def save():
             set_location(lat, lon)
             # immediately refresh global prayer times
             refresh_prayer_times()
+
+        async_db.submit(save, callback=lambda _: self.location_saved(None),
+                        errback=self.location_saved)
+
+    def compact_database(self, instance):
+        from compaction import enable_incremental_vacuum
+        def done(converted):
+            text = "تم ضغط قاعدة البيانات" if converted else "قاعدة البيانات مضغوطة تلقائياً"
+            Popup(title="الصيانة", content=Label(text=text), size_hint=(0.6, 0.3)).open()
+        async_db.submit(enable_incremental_vacuum, callback=done)
+
+    def location_saved(self, error):
+        if error is None:
             send = "🗺️ تم حفظ الموقع وتحديث أوقات الصلاة"
-        except Exception as e:
-            send = f"خطأ في حفظ الموقع: {e}"
+        else:
+            send = f"خطأ في حفظ الموقع: {error}"
         popup = Popup(title="حفظ الموقع", content=Label(text=send), size_hint=(0.6, 0.3))
         popup.open()
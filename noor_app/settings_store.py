@@ -0,0 +1,91 @@
+"""
+ذاكرة مؤقتة للإعدادات
+يُحمَّل جدول الإعدادات مرة واحدة، والقراءة من قاموس، والكتابة تمر إلى
+قاعدة البيانات ثم تُبلغ المشتركين بالمفتاح الذي تغيّر.
+المشتركون يُستدعون في الخيط الذي كتب الإعداد (قد يكون خيط async_db)، فيجب
+أن يكونوا آمنين للخيوط؛ ما يمس واجهة Kivy يشترك بـ main_thread=True
+"""
+
+import threading
+
+from connection import get_connection
+
+
+class SettingsCache:
+    """ذاكرة الإعدادات المشتركة في العملية كلها"""
+
+    def __init__(self):
+        self._values = None
+        self._lock = threading.RLock()
+        self._subscribers = {}
+
+    def _ensure_loaded(self):
+        if self._values is None:
+            with self._lock:
+                if self._values is None:
+                    rows = get_connection().execute("SELECT key, value FROM settings").fetchall()
+                    self._values = dict(rows)
+        return self._values
+
+    def get(self, key, default=""):
+        """قراءة إعداد من الذاكرة"""
+        return self._ensure_loaded().get(key, default)
+
+    def set(self, key, value):
+        """حفظ إعداد في قاعدة البيانات والذاكرة معاً
+
+        القيمة تُخزَّن نصاً كما في الجدول، فلا يتغير نوعها بعد invalidate.
+        """
+        value = str(value)
+        with self._lock:
+            values = self._ensure_loaded()
+            old = values.get(key)
+            conn = get_connection()
+            conn.execute("""
+                INSERT INTO settings (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (key, value))
+            conn.commit()
+            values[key] = value
+        if old != value:
+            self._notify(key, value)
+
+    def subscribe(self, key, callback, main_thread=False):
+        """تسجيل دالة تُستدعى بـ (key, value) عند تغيّر المفتاح
+
+        main_thread=True ينقل الاستدعاء إلى خيط Kivy الرئيسي إذا كُتب
+        الإعداد من خيط آخر.
+        """
+        with self._lock:
+            self._subscribers.setdefault(key, []).append((callback, main_thread))
+
+    def unsubscribe(self, key, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(key, [])
+            callbacks[:] = [entry for entry in callbacks if entry[0] != callback]
+
+    def invalidate(self):
+        """إسقاط الذاكرة لإعادة التحميل (بعد كتابة خارجية للجدول)"""
+        with self._lock:
+            self._values = None
+
+    def _notify(self, key, value):
+        with self._lock:
+            callbacks = list(self._subscribers.get(key, []))
+        on_main = threading.current_thread() is threading.main_thread()
+        for callback, main_thread in callbacks:
+            if main_thread and not on_main:
+                from kivy.clock import Clock
+                Clock.schedule_once(lambda dt, callback=callback: _call(callback, key, value))
+            else:
+                _call(callback, key, value)
+
+
+def _call(callback, key, value):
+    try:
+        callback(key, value)
+    except Exception as e:
+        print(f"خطأ في مشترك الإعداد {key}: {e}")
+
+
+settings = SettingsCache()
@@ -2,133 +2,129 @@
 نظام الإحصائيات والتقارير
 """
 
-from database import conn, c
-from datetime import datetime, timedelta
+from connection import get_connection
+from datetime import timedelta
 import json
 
+import clock
+
+import activity
+import counters
+import query_cache
+from query_cache import cached
+
+
+# أعمدة الإحصائيات الثلاثة من المجاميع اليومية لأنواع النشاط المقابلة
+_STATS_COLUMNS = """
+    SUM(CASE WHEN kind = 'ayahs' THEN total ELSE 0 END),
+    SUM(CASE WHEN kind = 'adhkar' THEN total ELSE 0 END),
+    SUM(CASE WHEN kind = 'khatma' THEN total ELSE 0 END)
+"""
+
 
 def record_daily_activity(ayahs_read=0, adhkar_count=0, khatma_count=0):
-    """تسجيل نشاط اليوم"""
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    c.execute("SELECT * FROM statistics WHERE date = ?", (today,))
-    if c.fetchone():
-        c.execute("""
-            UPDATE statistics 
-            SET ayahs_read = ?, adhkar_count = ?, khatma_count = ?
-            WHERE date = ?
-        """, (ayahs_read, adhkar_count, khatma_count, today))
-    else:
-        c.execute("""
-            INSERT INTO statistics (date, ayahs_read, adhkar_count, khatma_count)
-            VALUES (?, ?, ?, ?)
-        """, (today, ayahs_read, adhkar_count, khatma_count))
-    
-    conn.commit()
+    """تسجيل نشاط اليوم (يُضاف إلى ما سُجِّل سابقاً في اليوم نفسه)"""
+    conn = get_connection()
+    today = clock.now().strftime("%Y-%m-%d")
+    
+    with conn:
+        counters.increment_many([
+            ("ayahs_read", today, ayahs_read),
+            ("adhkar_count", today, adhkar_count),
+            ("khatma_count", today, khatma_count),
+        ], conn=conn)
+        activity.record_many([
+            ("ayahs", ayahs_read, None),
+            ("adhkar", adhkar_count, None),
+            ("khatma", khatma_count, None),
+        ], conn=conn)
+    query_cache.bump(query_cache.ACTIVITY)
 
 
 def get_daily_stats(date=None):
     """الحصول على إحصائيات يوم معين"""
     if not date:
-        date = datetime.now().strftime("%Y-%m-%d")
+        date = clock.now().strftime("%Y-%m-%d")
     
-    c.execute("SELECT * FROM statistics WHERE date = ?", (date,))
-    result = c.fetchone()
+    totals = activity.daily_totals(date)
     
-    if result:
+    if any(kind in totals for kind in ("ayahs", "adhkar", "khatma")):
         return {
-            "date": result[0],
-            "ayahs_read": result[1],
-            "adhkar_count": result[2],
-            "khatma_count": result[3]
+            "date": date,
+            "ayahs_read": totals.get("ayahs", 0),
+            "adhkar_count": totals.get("adhkar", 0),
+            "khatma_count": totals.get("khatma", 0)
         }
     return None
 
 
+@cached(query_cache.ACTIVITY)
 def get_weekly_stats():
     """الحصول على إحصائيات الأسبوع"""
-    end_date = datetime.now()
+    c = get_connection().cursor()
+    end_date = clock.now()
     start_date = end_date - timedelta(days=7)
     
-    c.execute("""
-        SELECT date, SUM(ayahs_read), SUM(adhkar_count), SUM(khatma_count)
-        FROM statistics
-        WHERE date BETWEEN ? AND ?
-        GROUP BY date
-        ORDER BY date DESC
+    c.execute(f"""
+        SELECT day, {_STATS_COLUMNS}
+        FROM activity_daily
+        WHERE day BETWEEN ? AND ? AND kind IN ('ayahs', 'adhkar', 'khatma')
+        GROUP BY day
+        ORDER BY day DESC
     """, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
     
     return c.fetchall()
 
 
+@cached(query_cache.ACTIVITY)
 def get_monthly_stats():
     """الحصول على إحصائيات الشهر"""
-    end_date = datetime.now()
+    c = get_connection().cursor()
+    end_date = clock.now()
     start_date = end_date - timedelta(days=30)
     
-    c.execute("""
-        SELECT strftime('%Y-%m', date), 
-               SUM(ayahs_read), 
-               SUM(adhkar_count), 
-               SUM(khatma_count)
-        FROM statistics
-        WHERE date BETWEEN ? AND ?
-        GROUP BY strftime('%Y-%m', date)
+    c.execute(f"""
+        SELECT substr(day, 1, 7), {_STATS_COLUMNS}
+        FROM activity_daily
+        WHERE day BETWEEN ? AND ? AND kind IN ('ayahs', 'adhkar', 'khatma')
+        GROUP BY substr(day, 1, 7)
     """, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
     
     return c.fetchall()
 
 
+@cached(query_cache.ACTIVITY)
 def get_total_stats():
     """الحصول على الإحصائيات الكلية"""
+    c = get_connection().cursor()
+    # المجاميع الشهرية: صف لكل شهر ونوع، والنوع any يحمل عدد الأيام النشطة
     c.execute("""
-        SELECT COUNT(DISTINCT date), 
-               SUM(ayahs_read), 
-               SUM(adhkar_count), 
-               SUM(khatma_count)
-        FROM statistics
+        SELECT kind, SUM(total), SUM(days)
+        FROM activity_monthly
+        WHERE kind IN ('any', 'ayahs', 'adhkar', 'khatma')
+        GROUP BY kind
     """)
     
-    result = c.fetchone()
-    if result:
-        return {
-            "days_active": result[0] or 0,
-            "total_ayahs": result[1] or 0,
-            "total_adhkar": result[2] or 0,
-            "total_khatmas": result[3] or 0
-        }
+    rows = {kind: (total, days) for kind, total, days in c.fetchall()}
     return {
-        "days_active": 0,
-        "total_ayahs": 0,
-        "total_adhkar": 0,
-        "total_khatmas": 0
+        "days_active": rows.get(activity.ANY, (0, 0))[1],
+        "total_ayahs": rows.get("ayahs", (0, 0))[0],
+        "total_adhkar": rows.get("adhkar", (0, 0))[0],
+        "total_khatmas": rows.get("khatma", (0, 0))[0]
     }
 
 
 def get_streak():
     """حساب السلسلة اليومية (كم يوم متتالي نشط)"""
-    c.execute("""
-        SELECT date FROM statistics 
-        ORDER BY date DESC
-    """)
-    
-    dates = c.fetchall()
-    if not dates:
-        return 0
-    
-    streak = 0
-    current_date = datetime.now().date()
-    
-    for date_tuple in dates:
-        date_obj = datetime.strptime(date_tuple[0], "%Y-%m-%d").date()
-        if current_date - timedelta(days=streak) == date_obj:
-            streak += 1
-        else:
-            break
-    
-    return streak
+    return activity.current_streak()
+
+
+def get_streaks():
+    """السلاسل الحالية والأطول لكل نوع نشاط، و"any" للنشاط عموماً"""
+    return activity.streaks()
 
 
+@cached(query_cache.RAMADAN_PLAN)
 def get_ramadan_plan_stats():
     """Return simple statistics about the current Ramadan plan."""
     from database import get_ramadan_plan
@@ -165,8 +161,9 @@ def export_stats_json():
 
 
 def clear_old_stats(days=90):
-    """حذف الإحصائيات القديمة (أكثر من X يوم)"""
-    old_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    
-    c.execute("DELETE FROM statistics WHERE date < ?", (old_date,))
-    conn.commit()
+    """ضغط الإحصائيات القديمة (أكثر من X يوم) في المجاميع الشهرية
+
+    المجاميع الكلية والشهرية تبقى كما هي؛ انظر compaction.compact
+    """
+    from compaction import compact
+    return compact(days)
@@ -1,6 +1,8 @@
 import os
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+import pytest
 
 from hijri_utils import gregorian_to_hijri, get_hijri_date
 from database import (
@@ -9,6 +11,63 @@ from database import (
 )
 
 
+@pytest.fixture
+def temp_db(tmp_path):
+    """قاعدة بيانات مؤقتة بدلاً من noor.db طوال الاختبار"""
+    from connection import manager
+    from database import write_buffer
+    from settings_store import settings
+    write_buffer.flush()
+    old_path = manager.path
+    manager.configure(str(tmp_path / 'test.db'))
+    settings.invalidate()
+    try:
+        yield manager.path
+    finally:
+        write_buffer.flush()
+        manager.configure(old_path)
+        settings.invalidate()
+
+
+@pytest.fixture
+def http_stub():
+    """خادم HTTP محلي: http_stub(respond) يشغّله ويُرجع عنوانه
+
+    respond(path, headers) تُرجع (الحالة، الجسم بايتات، {الترويسة: القيمة})
+    لكل طلب، فتحدد ردود الخادم بالترتيب الذي يريده الاختبار.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    servers = []
+
+    def start(respond):
+        class Stub(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status, body, headers = respond(self.path, self.headers)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
 def test_hijri_conversion():
     # check that known date 2021-04-13 -> 1442-09-01 (start of Ramadan 1442)
     d = datetime(2021,4,13)
@@ -18,6 +77,70 @@ def test_hijri_conversion():
     assert len(formatted.split('/')) == 3
 
 
+def test_hijri_tables():
+    from hijri_utils import hijri_month_dates, hijri_month_length, hijri_to_gregorian
+
+    assert hijri_to_gregorian(1442, 9, 1) == date(2021, 4, 13)
+    assert hijri_to_gregorian(1447, 9, 1) == date(2026, 2, 18)
+    assert gregorian_to_hijri(date(2026, 3, 20)) == (1447, 10, 1)
+    ramadan = hijri_month_dates(1447, 9)
+    assert ramadan[0] == '2026-02-18' and len(ramadan) == hijri_month_length(1447, 9)
+    # حول حدود الجدول وخارجه (الحساب الجدولي) التحويل يرجع لنفسه
+    for start in (date(1924, 7, 1), date(2077, 10, 1), date(2150, 1, 1)):
+        for i in range(90):
+            d = start + timedelta(days=i)
+            assert hijri_to_gregorian(*gregorian_to_hijri(d)) == d
+    with pytest.raises(ValueError):
+        hijri_to_gregorian(1447, 13, 1)
+    with pytest.raises(ValueError):
+        hijri_to_gregorian(1447, 9, 31)
+
+
+def test_hijri_range_backends(monkeypatch):
+    import hijri_utils
+
+    # عقد كامل يعبر نهاية جدول أم القرى إلى الحساب الجدولي
+    start, end = date(2072, 1, 1), date(2081, 12, 31)
+    vectorized = [list(map(int, a)) for a in hijri_utils.hijri_range(start, end)]
+    monkeypatch.setattr(hijri_utils, 'np', None)
+    fallback = [list(a) for a in hijri_utils.hijri_range(start, end)]
+    assert vectorized == fallback
+    assert len(fallback[0]) == (end - start).days + 1
+    for i in range(0, len(fallback[0]), 97):
+        expected = gregorian_to_hijri(start + timedelta(days=i))
+        assert (fallback[0][i], fallback[1][i], fallback[2][i]) == expected
+    jd = hijri_utils.gregorian_to_jd(date(2021, 4, 13))
+    assert [list(a) for a in hijri_utils.jd_to_hijri_range(jd, jd)] == [[1442], [9], [1]]
+
+
+def test_event_index():
+    from event_index import EventIndex
+
+    index = EventIndex(years_ahead=2)
+    # بعد عيد الأضحى 1447 تأتي مناسبات 1448
+    upcoming = index.next_events(2, today=date(2026, 5, 28))
+    assert [e['hijri'] for e in upcoming] == [(1448, 1, 1), (1448, 1, 10)]
+    assert upcoming[0]['date'] == date(2026, 6, 16) and upcoming[0]['days_left'] == 19
+    event, days_left = index.countdown(date(2026, 2, 18))
+    assert event['name'] == 'بداية رمضان' and days_left == 0
+    assert [e['hijri'][1:] for e in index.events_on(date(2026, 3, 20))] == [(10, 1)]
+
+    year = index.events_between(date(2026, 1, 1), date(2026, 12, 31))
+    assert [e['date'] for e in year] == sorted(e['date'] for e in year)
+    assert len(year) == 8
+    # الاستعلامات داخل النافذة لا تعيد البناء، والخروج منها يعيده مرة
+    builds = index.builds
+    index.next_events(3, today=date(2026, 9, 1))
+    assert index.builds == builds
+    assert index.next_events(1, today=date(2035, 1, 1))[0]['date'] >= date(2035, 1, 1)
+    assert index.builds == builds + 1
+    assert len(index.events_between(date(2000, 1, 1), date(2059, 12, 31))) > 7 * 60
+    # النطاق الواسع لا يوسّع البناءات اللاحقة
+    assert index.years_ahead == 2
+    index.next_events(1, today=date(2070, 1, 1))
+    assert len(index._table[0]) <= 5 * len(index.events)
+
+
 def test_prayer_utils():
     from prayer_utils import fetch_prayer_times, set_location, get_location, get_today_prayer_times
     lat, lon = get_location()
@@ -32,6 +155,69 @@ def test_prayer_utils():
     assert isinstance(todays, dict)
 
 
+def test_prayer_calculator():
+    from prayer_calc import compute_prayer_times
+
+    def minutes(value):
+        h, m = value.split(':')
+        return int(h) * 60 + int(m)
+
+    day = date(2024, 3, 20)
+    times = compute_prayer_times(21.3891, 39.8579, day, utc_offset=3)
+    order = [minutes(times[k]) for k in ('imsak', 'fajr', 'sunrise', 'dhuhr', 'asr', 'maghrib', 'isha')]
+    assert order == sorted(order)
+    # Makkah near the equinox: dhuhr ~12:28, maghrib ~18:32
+    assert abs(minutes(times['dhuhr']) - minutes('12:28')) <= 2
+    assert abs(minutes(times['maghrib']) - minutes('18:32')) <= 2
+    assert compute_prayer_times(21.3891, 39.8579, '2024-03-20', utc_offset=3) == times
+
+    hanafi = compute_prayer_times(21.3891, 39.8579, day, utc_offset=3, asr='hanafi')
+    assert minutes(hanafi['asr']) > minutes(times['asr'])
+    makkah = compute_prayer_times(21.3891, 39.8579, day, utc_offset=3, method='Makkah')
+    assert minutes(makkah['isha']) - minutes(makkah['maghrib']) == 90
+    shifted = compute_prayer_times(21.3891, 39.8579, day, utc_offset=4)
+    assert minutes(shifted['dhuhr']) - minutes(times['dhuhr']) == 60
+
+    # Oslo in midsummer: twilight never ends, only the high-latitude rule gives fajr/isha
+    summer = date(2024, 6, 21)
+    assert compute_prayer_times(59.91, 10.75, summer, 2, high_lat='none')['fajr'] == '-----'
+    adjusted = compute_prayer_times(59.91, 10.75, summer, 2)
+    assert adjusted['fajr'] != '-----' and adjusted['isha'] != '-----'
+    assert minutes(adjusted['fajr']) < minutes(adjusted['sunrise'])
+
+
+def test_malformed_utc_offset(temp_db):
+    from prayer_utils import calculation_settings, get_today_prayer_times, set_location
+    update_settings('utc_offset', '3')
+    assert calculation_settings()['utc_offset'] == 3.0
+    # قيمة غير صالحة تعني منطقة الجهاز الزمنية كالقيمة الفارغة
+    update_settings('utc_offset', '+3h')
+    assert calculation_settings()['utc_offset'] is None
+    # وكذلك طريقة أو مذهب غير معروف يعود إلى الافتراضي
+    update_settings('prayer_method', 'mwl')
+    update_settings('asr_school', 'maliki')
+    assert calculation_settings()['method'] == 'ISNA'
+    assert calculation_settings()['asr'] == 'shafi'
+    set_location(21.3891, 39.8579)
+    assert ':' in get_today_prayer_times()['dhuhr']
+
+
+def test_hijri_table_seams():
+    from hijri_utils import hijri_month_length, hijri_to_gregorian
+
+    # حول بداية جدول أم القرى (1343 = 1924-08-01) ونهايته (بعد 1500)
+    for start in (date(1924, 6, 1), date(2077, 10, 1)):
+        for offset in range(120):
+            g = start + timedelta(days=offset)
+            assert hijri_to_gregorian(*gregorian_to_hijri(g)) == g
+    for year, month in ((1342, 11), (1342, 12), (1343, 1), (1500, 12), (1501, 1)):
+        for day in range(1, hijri_month_length(year, month) + 1):
+            assert gregorian_to_hijri(hijri_to_gregorian(year, month, day)) == (year, month, day)
+    assert hijri_to_gregorian(1342, 12, hijri_month_length(1342, 12)) == date(1924, 7, 31)
+    with pytest.raises(ValueError):
+        hijri_to_gregorian(1342, 12, 29)
+
+
 def test_reading_log():
     from database import log_reading, get_reading_pages, get_average_reading
     # purge existing for today
@@ -102,11 +288,1074 @@ def test_ramadan_plan_flow():
     assert add_ramadan_pages(0) >= 604
 
 
+def test_write_buffer():
+    from write_buffer import WriteBuffer
+    flushed = []
+    buf = WriteBuffer(flushed.append)
+    buf.add('tasbih', '2024-01-01', 1)
+    buf.add('tasbih', '2024-01-01', 2)
+    buf.add('reading_log', '2024-01-01', 5)
+    assert buf.pending('tasbih', '2024-01-01') == 3
+    assert buf.flush() == 2
+    assert len(flushed) == 1
+    assert dict(flushed[0])[('tasbih', '2024-01-01')] == 3
+    assert buf.pending('tasbih', '2024-01-01') == 0
+    assert buf.flush() == 0
+
+    # reads see buffered increments before they reach the database
+    from database import add_tasbih, get_tasbih_count, write_buffer
+    write_buffer.flush()
+    before = get_tasbih_count()
+    add_tasbih(2)
+    assert add_tasbih(3) == before + 5
+    write_buffer.flush()
+    assert get_tasbih_count() == before + 5
+
+
+def test_connection_per_thread():
+    import threading
+    from connection import get_connection
+    conn = get_connection()
+    assert get_connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    other = []
+    t = threading.Thread(target=lambda: other.append(get_connection()))
+    t.start()
+    t.join()
+    assert other[0] is not conn
+
+
+def test_connections_of_finished_threads(tmp_path):
+    import threading
+    from connection import ConnectionManager
+    manager = ConnectionManager(str(tmp_path / 'threads.db'))
+    opened = []
+    for _ in range(5):
+        t = threading.Thread(target=lambda: opened.append(manager.get()))
+        t.start()
+        t.join()
+    # اتصالات الخيوط المنتهية تُغلق ولا تتراكم
+    manager.get()
+    assert manager.open_connections == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute('SELECT 1')
+
+    # close_all لا يغلق اتصال خيط حي أثناء استعلامه؛ الخيط يستبدله بنفسه
+    busy, closed, done = threading.Event(), threading.Event(), []
+
+    def worker():
+        conn = manager.get()
+        busy.set()
+        closed.wait()
+        done.append(conn.execute('SELECT 1').fetchone()[0])
+        done.append(manager.get() is not conn)
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+        done.append(True)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    busy.wait()
+    manager.close_all()
+    closed.set()
+    t.join()
+    assert done == [1, True, True]
+    manager.close_all()
+
+
+def test_counters_concurrent():
+    import threading
+    import counters
+    from connection import get_connection
+    key = '1900-01-01'
+    conn = get_connection()
+    conn.execute('DELETE FROM tasbih WHERE date = ?', (key,))
+    conn.commit()
+
+    def worker():
+        for _ in range(100):
+            counters.increment('tasbih', key)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counters.get('tasbih', key) == 400
+    result = counters.increment_many([('tasbih', key, 5), ('tasbih', key, 5)])
+    assert result[('tasbih', key)] == 410
+    conn.execute('DELETE FROM tasbih WHERE date = ?', (key,))
+    conn.commit()
+
+
+def test_settings_cache():
+    from connection import get_connection
+    from settings_store import settings
+    seen = []
+    callback = lambda key, value: seen.append((key, value))
+    settings.subscribe('test_key', callback)
+    update_settings('test_key', 'a')
+    update_settings('test_key', 'a')  # unchanged, no notification
+    update_settings('test_key', 'b')
+    assert seen == [('test_key', 'a'), ('test_key', 'b')]
+    settings.unsubscribe('test_key', callback)
+
+    statements = []
+    conn = get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        assert get_setting('test_key') == 'b'
+        assert get_setting('missing_key', 'x') == 'x'
+    finally:
+        conn.set_trace_callback(None)
+    assert statements == []
+    conn.execute("DELETE FROM settings WHERE key = 'test_key'")
+    conn.commit()
+    settings.invalidate()
+
+
+def test_settings_threads(temp_db, monkeypatch):
+    import threading
+    from kivy.clock import Clock
+    from settings_store import settings
+
+    # القيمة نص قبل invalidate وبعده
+    update_settings('test_number', 3)
+    assert get_setting('test_number') == '3'
+    settings.invalidate()
+    assert get_setting('test_number') == '3'
+
+    # مشتركو الواجهة يُنقلون إلى الخيط الرئيسي
+    scheduled, seen = [], []
+    monkeypatch.setattr(Clock, 'schedule_once', lambda fn, timeout=0: scheduled.append(fn))
+    ui = lambda key, value: seen.append(('ui', threading.current_thread().name))
+    plain = lambda key, value: seen.append(('plain', threading.current_thread().name))
+    settings.subscribe('test_number', ui, main_thread=True)
+    settings.subscribe('test_number', plain)
+    try:
+        t = threading.Thread(target=update_settings, args=('test_number', 4), name='writer')
+        t.start()
+        t.join()
+        assert seen == [('plain', 'writer')] and len(scheduled) == 1
+        scheduled[0](0)
+        assert seen[-1] == ('ui', threading.main_thread().name)
+        update_settings('test_number', 5)
+        assert seen[-1] == ('plain', threading.main_thread().name) and len(scheduled) == 1
+    finally:
+        settings.unsubscribe('test_number', ui)
+        settings.unsubscribe('test_number', plain)
+
+
+def test_query_plans(temp_db):
+    """كل استعلام في statistics و achievements يستخدم فهرساً أو مفتاحاً"""
+    import re
+    import achievements
+    import statistics
+    from connection import get_connection
+    from migrations import migrate, SCHEMA_VERSION
+
+    assert migrate() == SCHEMA_VERSION
+    conn = get_connection()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    statements = []
+    conn.set_trace_callback(statements.append)
+    statistics.record_daily_activity(3, 2, 0)
+    statistics.get_daily_stats()
+    statistics.get_weekly_stats()
+    statistics.get_monthly_stats()
+    statistics.get_total_stats()
+    statistics.get_streak()
+    statistics.get_streaks()
+    statistics.get_ramadan_plan_stats()
+    statistics.get_progress_percentage()
+    statistics.export_stats_json()
+    statistics.clear_old_stats()
+    achievements.check_achievements()
+    achievements.unlock_badge('test')
+    achievements.get_achievements()
+    achievements.get_badges()
+    achievements.get_achievement_count()
+    conn.set_trace_callback(None)
+
+    queries = [q for q in statements
+               if re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)', q, re.I)]
+    assert queries
+    for query in queries:
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + query).fetchall()
+        for row in plan:
+            detail = row[3]
+            # SCAN بلا فهرس = قراءة الجدول كله
+            assert not re.match(r'SCAN \w+$', detail), (query, detail)
+            assert 'TEMP B-TREE FOR ORDER BY' not in detail, (query, detail)
+    assert statistics.get_total_stats()['total_ayahs'] == 3
+
+
+def test_activity_rollups(temp_db):
+    import activity
+    import statistics
+    from connection import get_connection
+    today = datetime.now().strftime('%Y-%m-%d')
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    activity.record('reading', 4, yesterday + ' 20:00:00')
+    activity.record('tasbih', 33, yesterday + ' 21:00:00')
+    statistics.record_daily_activity(ayahs_read=5, adhkar_count=1)
+    statistics.record_daily_activity(ayahs_read=2)  # يُضاف ولا يستبدل
+
+    assert statistics.get_daily_stats()['ayahs_read'] == 7
+    assert statistics.get_daily_stats(yesterday) is None
+    assert activity.daily_totals(yesterday) == {'reading': 4, 'tasbih': 33}
+    totals = statistics.get_total_stats()
+    assert totals['total_ayahs'] == 7
+    assert totals['total_adhkar'] == 1
+    assert totals['days_active'] == 2
+    assert statistics.get_streak() == 2
+    assert statistics.get_weekly_stats()[0] == (today, 7, 1, 0)
+
+    # إعادة البناء من سجل الأحداث تعطي المجاميع نفسها
+    conn = get_connection()
+    daily = conn.execute('SELECT * FROM activity_daily ORDER BY day, kind').fetchall()
+    monthly = conn.execute('SELECT * FROM activity_monthly ORDER BY kind, month').fetchall()
+    activity.rebuild_rollups()
+    assert conn.execute('SELECT * FROM activity_daily ORDER BY day, kind').fetchall() == daily
+    assert conn.execute('SELECT * FROM activity_monthly ORDER BY kind, month').fetchall() == monthly
+
+
+def test_async_db():
+    import threading
+    import async_db
+    results = []
+
+    # الوضع المتزامن: النتيجة تصل فوراً في الخيط نفسه
+    async_db.set_synchronous(True)
+    try:
+        future = async_db.gather({'sum': (sum, [1, 2, 3]), 'max': (max, 4, 9)},
+                                 callback=results.append)
+        assert future.done()
+        assert results == [{'sum': 6, 'max': 9}]
+        errors = []
+        async_db.submit(int, 'x', callback=results.append, errback=errors.append)
+        assert isinstance(errors[0], ValueError) and len(results) == 1
+    finally:
+        async_db.set_synchronous(False)
+
+    # الوضع العادي: الاستعلام يعمل في خيط خلفي
+    name = async_db.submit(lambda: threading.current_thread().name).result(timeout=5)
+    assert name.startswith('noor-db')
+    async_db.shutdown()
+
+
+def test_screens_load_in_background(temp_db, monkeypatch):
+    import threading
+    import async_db
+    import prayer_utils
+    from screens import HomeScreen, PrayerScreen, SettingsScreen
+
+    threads = []
+
+    def slow_times():
+        threads.append(threading.current_thread().name)
+        return {'fajr': '04:00'}
+
+    monkeypatch.setattr(prayer_utils, 'get_today_prayer_times', slow_times)
+    # بناء الشاشة لا يستعلم في خيط الواجهة، والأوقات تنتظر الخلفية
+    screen = PrayerScreen()
+    assert screen.time_labels['fajr'].text == '…'
+    async_db.submit(lambda: None).result(timeout=5)
+    assert threads and all(name.startswith('noor-db') for name in threads)
+
+    async_db.set_synchronous(True)
+    try:
+        screen.load_times()
+        assert screen.time_labels['fajr'].text == '04:00'
+        assert screen.time_labels['isha'].text == 'لم يتحدد'
+        home = HomeScreen()
+        assert home.hijri_label.text != 'التاريخ الهجري: …'
+        assert home.event_label.text
+        update_settings('latitude', '21.4')
+        update_settings('longitude', '39.8')
+        settings_screen = SettingsScreen()
+        settings_screen.on_pre_enter()
+        assert settings_screen.lat_input.text == '21.4'
+    finally:
+        async_db.set_synchronous(False)
+
+
+def test_dark_mode_theme_on_main_thread(temp_db, monkeypatch):
+    import threading
+    import async_db
+    from kivy.clock import Clock
+    from settings_store import settings
+    from screens import SettingsScreen
+
+    scheduled, applied = [], []
+    monkeypatch.setattr(Clock, 'schedule_once', lambda fn, timeout=0: scheduled.append(fn))
+    theme = lambda key, value: applied.append(threading.current_thread() is threading.main_thread())
+    settings.subscribe('dark_mode', theme, main_thread=True)
+    try:
+        # الكتابة في خيط الخلفية، وتطبيق المظهر في الخيط الرئيسي
+        assert async_db.submit(SettingsScreen.switch_dark_mode).result(timeout=5) == 'false'
+        assert applied == []
+        for fn in scheduled:
+            fn(0)
+        assert applied == [True]
+    finally:
+        settings.unsubscribe('dark_mode', theme)
+
+
+def test_backup_roundtrip(temp_db, tmp_path):
+    import io
+    import backup
+    import statistics
+    from connection import manager
+    from database import add_tasbih, update_settings, get_setting
+    from khatma import update_khatma
+
+    add_tasbih(33)
+    update_khatma(10)
+    statistics.record_daily_activity(ayahs_read=5)
+    activity_days = statistics.get_total_stats()
+    update_settings('city', 'Cairo')
+    out = io.StringIO()
+    exported = backup.export_ndjson(out)
+    backup.export_csv(tmp_path / 'csv')
+
+    # نسخة هذا الجهاز نفسه دون عمود uid لا تضاعف نشاطه
+    import os
+    legacy = tmp_path / 'legacy_csv'
+    os.makedirs(legacy)
+    with open(tmp_path / 'csv' / 'activity_events.csv', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    uid = lines[0].split(',').index('uid')
+    with open(legacy / 'activity_events.csv', 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(','.join(v for i, v in enumerate(line.split(',')) if i != uid) + '\n')
+    backup.import_csv(legacy, tables=['activity_events'])
+    assert statistics.get_total_stats() == activity_days
+
+    # قاعدة بيانات جديدة على "جهاز آخر"
+    manager.configure(str(tmp_path / 'other.db'))
+    assert backup.import_ndjson(io.StringIO(out.getvalue())) == exported
+    assert statistics.get_total_stats() == activity_days
+    assert get_setting('city') == 'Cairo'
+    # الدمج مرة ثانية لا يضاعف الأحداث
+    backup.import_ndjson(io.StringIO(out.getvalue()))
+    assert statistics.get_total_stats() == activity_days
+
+    manager.configure(str(tmp_path / 'third.db'))
+    backup.import_csv(tmp_path / 'csv', merge=False)
+    assert statistics.get_total_stats() == activity_days
+    assert get_setting('city') == 'Cairo'
+
+
+def test_backup_identical_events(temp_db, tmp_path):
+    import io
+    import json
+    import backup
+    from connection import get_connection, manager
+
+    def total():
+        return get_connection().execute(
+            "SELECT COUNT(*), SUM(amount) FROM activity_events WHERE kind = 'tasbih'").fetchone()
+
+    # حدثان حقيقيان بالوقت والنوع والكمية نفسها
+    conn = get_connection()
+    with conn:
+        conn.executemany("INSERT INTO activity_events (kind, amount, ts) VALUES (?, ?, ?)",
+                         [('tasbih', 33, '2024-03-01 10:00:00')] * 2)
+    out = io.StringIO()
+    backup.export_ndjson(out, tables=['activity_events'])
+    # الاستيراد إلى الجهاز نفسه لا يكرر أحداثه
+    backup.import_ndjson(io.StringIO(out.getvalue()))
+    assert total() == (2, 66)
+    # ولا نسخته بلا uid
+    stripped = ''.join(
+        json.dumps({'table': record['table'],
+                    'row': {k: v for k, v in record['row'].items() if k != 'uid'}}) + '\n'
+        for record in map(json.loads, out.getvalue().splitlines()))
+    backup.import_ndjson(io.StringIO(stripped))
+    assert total() == (2, 66)
+
+    manager.configure(str(tmp_path / 'other.db'))
+    for _ in range(2):
+        backup.import_ndjson(io.StringIO(out.getvalue()))
+        assert total() == (2, 66)
+
+    # ملف من إصدار أقدم بلا uid: الأحداث المتطابقة فيه تبقى كلها مرة واحدة
+    legacy = ''.join(
+        json.dumps({'table': 'activity_events',
+                    'row': {'kind': 'tasbih', 'amount': 10, 'ts': '2024-03-02 10:00:00'}}) + '\n'
+        for _ in range(3))
+    manager.configure(str(tmp_path / 'third.db'))
+    for _ in range(2):
+        backup.import_ndjson(io.StringIO(legacy))
+        assert total() == (3, 30)
+
+
+def test_compaction(temp_db):
+    import activity
+    import compaction
+    import counters
+    import statistics
+    from connection import get_connection
+
+    old = (datetime.now() - timedelta(days=400)).strftime('%Y-%m-%d')
+    for day in range(5):
+        date = (datetime.now() - timedelta(days=400 + day)).strftime('%Y-%m-%d')
+        counters.increment('tasbih', date, 10)
+        activity.record('tasbih', 10, date + ' 10:00:00')
+        activity.record('reading', 2, date + ' 11:00:00')
+    statistics.record_daily_activity(ayahs_read=4)
+    totals = statistics.get_total_stats()
+
+    # دفعات صغيرة مع حدّ أقصى: التوقف ثم الاستكمال
+    first = compaction.compact(chunk_size=1, max_chunks=2)
+    assert sum(first.values()) == 2
+    compaction.compact(chunk_size=1)
+    conn = get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM activity_events WHERE ts < ?', (old,)).fetchone()[0] == 0
+    assert counters.get('tasbih', old) == 0
+    assert statistics.get_total_stats() == totals
+    assert statistics.get_daily_stats()['ayahs_read'] == 4
+    # إعادة البناء لا تمس الأشهر المضغوطة
+    activity.rebuild_rollups()
+    assert statistics.get_total_stats() == totals
+    with pytest.raises(ValueError):
+        compaction.compact(days=7)
+
+
+def test_vacuum_legacy_database(tmp_path):
+    import compaction
+    from connection import manager
+
+    # ملف قديم أُنشئ دون auto_vacuum
+    path = tmp_path / 'legacy.db'
+    legacy = sqlite3.connect(str(path))
+    legacy.execute('CREATE TABLE filler (x)')
+    legacy.commit()
+    legacy.close()
+    old_path = manager.path
+    manager.configure(str(path))
+    try:
+        conn = manager.get()
+        # الضغط التلقائي لا يعيد كتابة الملف
+        assert compaction.incremental_vacuum() == 0
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+        # التحويل صيانة صريحة
+        assert compaction.enable_incremental_vacuum()
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert not compaction.enable_incremental_vacuum()
+    finally:
+        manager.configure(old_path)
+
+
+def test_lazy_schema(tmp_path):
+    import subprocess
+    import sys
+    from connection import ConnectionManager
+    from migrations import SCHEMA_VERSION, upgrade
+
+    # الاستيراد وحده لا يفتح قاعدة البيانات
+    path = tmp_path / 'lazy.db'
+    env = dict(os.environ, NOOR_DB=str(path))
+    subprocess.run([sys.executable, '-c', 'import database, khatma, achievements, statistics'],
+                   check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert not path.exists()
+
+    # أول اتصال يُنشئ المخطط، وبعدها لا DDL
+    manager = ConnectionManager(str(path))
+    conn = manager.get()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert upgrade(conn) == SCHEMA_VERSION
+    assert statements == ['PRAGMA user_version']
+    manager.close_all()
+
+
+def test_streaks(temp_db):
+    import activity
+    import statistics
+    from connection import get_connection
+
+    def day(offset):
+        return (datetime.now() - timedelta(days=offset)).strftime('%Y-%m-%d') + ' 12:00:00'
+
+    # سلسلة قديمة من 4 أيام، ثم فجوة، ثم أمس واليوم
+    for offset in (12, 11, 10, 9, 1, 0):
+        activity.record('reading', 2, day(offset))
+    activity.record('tasbih', 33, day(0))
+    assert statistics.get_streak() == 2
+    streaks = statistics.get_streaks()
+    assert streaks['reading'] == {'current': 2, 'longest': 4}
+    assert streaks['tasbih'] == {'current': 1, 'longest': 1}
+    assert streaks['adhkar'] == {'current': 0, 'longest': 0}
+
+    # يوم سابق يملأ الفجوة (تسجيل متأخر) فتتصل السلسلتان
+    for offset in range(2, 9):
+        activity.record('reading', 1, day(offset))
+    assert statistics.get_streaks()['reading'] == {'current': 13, 'longest': 13}
+    assert statistics.get_streak() == 13
+
+    # إعادة البناء من الجدول اليومي تعطي النتيجة نفسها
+    rows = get_connection().execute('SELECT * FROM streaks ORDER BY kind').fetchall()
+    activity.rebuild_rollups()
+    assert get_connection().execute('SELECT * FROM streaks ORDER BY kind').fetchall() == rows
+
+
+def test_streaks_after_compaction(temp_db):
+    import activity
+    import compaction
+
+    today = datetime.now()
+    activity.record_many([('tasbih', 33, (today - timedelta(days=offset)).strftime('%Y-%m-%d 12:00:00'))
+                          for offset in range(200)])
+    assert activity.current_streak('tasbih') == 200
+    # ضغط على مرحلتين ثم إعادة بناء: السلسلة تعبر الحدّين كاملة
+    compaction.compact(days=150)
+    compaction.compact(days=90)
+    activity.rebuild_rollups()
+    assert activity.current_streak('tasbih') == 200
+    assert activity.current_streak() == 200
+    assert activity.streaks()['tasbih']['longest'] == 200
+    # تسجيل متأخر يعيد حساب النوع وحده، ويبقى الطول نفسه
+    activity.record('tasbih', 1, (today - timedelta(days=3)).strftime('%Y-%m-%d 13:00:00'))
+    activity.rebuild_rollups()
+    assert activity.current_streak('tasbih') == 200
+
+
+def test_query_cache(temp_db):
+    import query_cache
+    import statistics
+    from database import get_average_reading, log_reading, set_ramadan_plan, add_ramadan_pages
+
+    query_cache.clear()
+    first = statistics.get_total_stats()
+    assert statistics.get_total_stats() is first
+    counts = query_cache.stats()['statistics.get_total_stats']
+    assert counts == {'hits': 1, 'misses': 1}
+
+    # الكتابة تبطل النتيجة المحفوظة
+    statistics.record_daily_activity(ayahs_read=3)
+    assert statistics.get_total_stats()['total_ayahs'] == first['total_ayahs'] + 3
+    assert query_cache.stats()['statistics.get_total_stats']['misses'] == 2
+
+    average = get_average_reading(7)
+    log_reading(5)
+    assert get_average_reading(7) == average + 5
+    assert get_average_reading(7) == average + 5
+    assert query_cache.stats()['database._average_reading']['hits'] >= 1
+
+    set_ramadan_plan(30)
+    assert statistics.get_ramadan_plan_stats()['pages_read'] == 0
+    add_ramadan_pages(4)
+    assert statistics.get_ramadan_plan_stats()['pages_read'] == 4
+
+    # ضغطات التسبيح المعلّقة لا تبطل القراءات، والكتابة الفعلية تبطلها
+    from database import add_tasbih, write_buffer
+    write_buffer.flush()
+    before = statistics.get_total_stats()
+    add_tasbih(33)
+    assert statistics.get_total_stats() is before
+    write_buffer.flush()
+    assert statistics.get_total_stats() is not before
+
+
+def test_analytics_backends(temp_db, monkeypatch):
+    from datetime import date
+    import activity
+    import analytics
+
+    start = date(2024, 1, 1)  # الاثنين
+    events = []
+    for i in range(120):
+        day = (start + timedelta(days=i)).isoformat() + ' 12:00:00'
+        if i % 3:
+            events.append(('reading', i % 7 + 1, day))
+        if i % 2:
+            events.append(('tasbih', 33 * (i % 5 + 1), day))
+    activity.record_many(events)
+    end = start + timedelta(days=119)
+
+    def compute():
+        reading = analytics.load_series('reading', start, end)
+        tasbih = analytics.load_series('tasbih', start, end)
+        heatmap = analytics.year_heatmap('reading', 2024)
+        return {
+            'rolling': [round(v, 9) for v in analytics.rolling_average(reading, 7)],
+            'weekday': [round(v, 9) for v in analytics.weekday_profile(reading)],
+            'percentiles': {q: round(v, 9) for q, v in analytics.percentiles(reading).items()},
+            'weeks': analytics.best_weeks(tasbih, 3),
+            'heatmap': [[float(v) for v in row] for row in heatmap],
+            'correlation': round(analytics.correlation(reading, tasbih), 9),
+        }
+
+    fast = compute()
+    monkeypatch.setattr(analytics, 'np', None)
+    assert compute() == fast
+    assert fast['rolling'][6] == round(sum(i % 7 + 1 for i in range(7) if i % 3) / 7, 9)
+    assert len(fast['heatmap']) == 7 and fast['heatmap'][0][0] == 0  # 1 يناير بلا قراءة
+    assert fast['heatmap'][1][0] == 2
+    assert all(week.weekday() == 0 for week, _ in fast['weeks'])
+
+
+def test_khatma_forecast(temp_db):
+    from datetime import date
+    import activity
+    import forecast
+    from database import log_reading
+
+    today = date.today()
+    events = []
+    for offset in range(1, 43):
+        day = today - timedelta(days=offset)
+        # الجمعة أكثر قراءة من بقية الأيام
+        events.append(('reading', 24 if day.weekday() == 4 else 8, day.isoformat() + ' 12:00:00'))
+    activity.record_many(events)
+
+    result = forecast.forecast(remaining=100, deadline=today + timedelta(days=4))
+    model = forecast.forecaster
+    assert model.season[4] > 1.3 > model.season[0]
+    assert 9 < model.rate < 12
+    early, late = result['band']
+    assert early <= result['projected_date'] <= late
+    assert today + timedelta(days=5) < result['projected_date'] < today + timedelta(days=14)
+    assert result['needed_per_day'] == 20
+    assert result['on_track'] is False
+
+    # قراءة اليوم تُحتسب فوراً دون إعادة بناء النموذج
+    assert forecast.forecast(remaining=5)['projected_date'] == today
+    through = model._through
+    log_reading(int(model.expected(today)) + 1)
+    # ما تبقى من توقع اليوم قُرئ، فالصفحات الخمس التالية للغد
+    assert forecast.forecast(remaining=5)['projected_date'] == today + timedelta(days=1)
+    assert model._through == through and model.days == 42
+
+    # بعد انقضاء الخطة لا يظهر "None" في شاشة رمضان
+    from screens import RamadanPlanScreen
+    screen = RamadanPlanScreen()
+    plan = {'plan_days': 10, 'start_date': '2020-01-01', 'pages_read': 100}
+    late = forecast.forecast(remaining=504, deadline=today - timedelta(days=1))
+    assert late['needed_per_day'] is None
+    screen.show_plan_info({'plan': plan, 'target': 61, 'forecast': late})
+    assert 'None' not in screen.info_label.text
+    assert 'انتهت مدة الخطة' in screen.info_label.text
+
+
+def test_prayer_cache(temp_db, monkeypatch):
+    import async_db
+    import clock
+    import prayer_cache
+    from connection import get_connection
+
+    calls = []
+    fetch = prayer_cache.fetch_prayer_times_source
+
+    def counting(lat, lon, day):
+        calls.append(day)
+        return fetch(lat, lon, day)
+
+    monkeypatch.setattr(prayer_cache, 'fetch_prayer_times_source', counting)
+    prayer_cache.clear_memory()
+    async_db.set_synchronous(True)
+    clock.set_clock(clock.FixedClock(datetime(2025, 3, 10, 12)))
+    try:
+        times = prayer_cache.get_times(21.3891, 39.8579)
+        assert 'fajr' in times
+        # اليوم ثم باقي مارس في الخلفية
+        assert len(calls) == 1 + 30
+        count = get_connection().execute('SELECT COUNT(*) FROM prayer_times').fetchone()[0]
+        assert count == 31
+
+        calls.clear()
+        assert prayer_cache.get_times(21.3891, 39.8579) == times
+        # إحداثيات في الخلية نفسها ويوم آخر من الشهر من الجدول
+        assert prayer_cache.get_times(21.3893, 39.8581) == times
+        assert prayer_cache.get_times(21.3891, 39.8579, date(2025, 3, 25))
+        assert calls == []
+
+        update_settings('asr_school', 'hanafi')
+        hanafi = prayer_cache.get_times(21.3891, 39.8579)
+        assert hanafi['asr'] > times['asr'] and len(calls) == 31
+
+        # بعد شهرين: مارس خارج النافذة ويُحذف عند التعبئة التالية
+        clock.set_clock(clock.FixedClock(datetime(2025, 5, 20, 12)))
+        prayer_cache.prefetch(21.3891, 39.8579)
+        days = [d for d, in get_connection().execute('SELECT day FROM prayer_times')]
+        assert min(days) == '2025-05-01' and max(days) == '2025-05-31'
+    finally:
+        clock.set_clock()
+        async_db.set_synchronous(False)
+        update_settings('asr_school', 'shafi')
+
+
+def test_prayer_cache_fallback(temp_db, monkeypatch):
+    import async_db
+    import clock
+    import prayer_cache
+    import prayer_utils
+
+    online = {}
+    monkeypatch.setattr(prayer_utils, 'fetch_online_prayer_times',
+                        lambda lat, lon, day, options=None: dict(online))
+    update_settings('prayer_source', 'aladhan')
+    prayer_cache.clear_memory()
+    async_db.set_synchronous(True)
+    clock.set_clock(clock.FixedClock(datetime(2025, 3, 10, 12)))
+    try:
+        # Aladhan فشل: الحساب المحلي يُقدَّم لكنه لا يُحفظ كأنه من Aladhan
+        local = prayer_cache.get_times(21.3891, 39.8579)
+        assert local['fajr'] != '04:30'
+        assert prayer_cache.lookup(21.3891, 39.8579, ['2025-03-10']) == {}
+        prayer_cache.evict()
+        assert prayer_cache.get_times(21.3891, 39.8579) == local
+
+        # عاد الاتصال: الطلب التالي يعيد الجلب في الخلفية
+        online.update({'fajr': '04:30', 'maghrib': '18:40'})
+        prayer_cache.get_times(21.3891, 39.8579)
+        assert prayer_cache.get_times(21.3891, 39.8579) == online
+        assert prayer_cache.lookup(21.3891, 39.8579, ['2025-03-31'])['2025-03-31'] == online
+    finally:
+        clock.set_clock()
+        async_db.set_synchronous(False)
+        update_settings('prayer_source', 'local')
+
+
+def test_location_grid(temp_db, monkeypatch):
+    import prayer_cache
+    from location_grid import GRID_SIZES, cell, error_minutes, grid_for
+
+    # الخطأ يكبر مع حجم الخلية، والحجم المختار يحترم الحد
+    errors = [error_minutes(21.5, g) for g in GRID_SIZES]
+    assert errors == sorted(errors)
+    for lat in (0, 21, 40, 60):
+        grid = grid_for(lat, 0.5)
+        assert error_minutes(abs(lat) + 0.5, grid) <= 0.5
+        assert grid_for(lat, 0.1) <= grid
+    # إعادة إدخال الموقع أو التنقل القليل في الخلية نفسها
+    assert cell(21.3891, 39.8579)[:2] == cell(21.3905, 39.8612)[:2]
+
+    calls = []
+    fetch = prayer_cache.fetch_prayer_times_source
+    monkeypatch.setattr(prayer_cache, 'fetch_prayer_times_source',
+                        lambda lat, lon, day: calls.append((lat, lon)) or fetch(lat, lon, day))
+    monkeypatch.setattr(prayer_cache, 'RECENT_CELLS', 2)
+    monkeypatch.setattr(prayer_cache.async_db, 'submit', lambda *args, **kwargs: None)
+    prayer_cache.clear_memory()
+    day = date(2025, 3, 10)
+    times = prayer_cache.get_times(21.3891, 39.8579, day)
+    assert prayer_cache.get_times(21.3905, 39.8612, day) == times
+    assert len(calls) == 1 and calls[0] == prayer_cache.cell_center(21.3891, 39.8579)
+
+    # مكة ثم المدينة ثم مكة: القاهرة تُخرج المدينة (الأقدم استخداماً) من الذاكرة
+    prayer_cache.get_times(24.4672, 39.6111, day)
+    prayer_cache.get_times(21.3891, 39.8579, day)
+    assert len(prayer_cache._recent) == 2
+    prayer_cache.get_times(30.0444, 31.2357, day)
+    assert len(prayer_cache._recent) == 2 and len(calls) == 3
+    # ثم تُقرأ من الجدول لا من الشبكة
+    prayer_cache.get_times(24.4672, 39.6111, day)
+    assert len(calls) == 3
+
+    # حد خطأ أصغر: خلايا أصغر ومفتاح مختلف
+    key = prayer_cache.location_key(21.3891, 39.8579)
+    update_settings('location_error_minutes', '0.05')
+    try:
+        assert prayer_cache.location_key(21.3891, 39.8579) != key
+    finally:
+        update_settings('location_error_minutes', '0.5')
+
+
+def test_prayer_batch(temp_db, monkeypatch, http_stub):
+    import json
+    import time
+    import prayer_utils
+    from prayer_batch import BatchFetcher
+
+    requested = []
+    body = json.dumps({'data': {'timings': {'Fajr': '04:30', 'Maghrib': '18:40'}}}).encode()
+
+    def respond(path, headers):
+        requested.append(path.split('?')[0].rsplit('/', 1)[1])
+        time.sleep(0.1)
+        return 200, body, {'Content-Type': 'application/json'}
+
+    monkeypatch.setattr(prayer_utils, 'ALADHAN_URL', http_stub(respond))
+    update_settings('prayer_source', 'aladhan')
+    fetcher = BatchFetcher(max_workers=6)
+    days = [(date(2025, 3, 1) + timedelta(days=i)).isoformat() for i in range(18)]
+    try:
+        streamed = []
+        started = time.perf_counter()
+        first = fetcher.fetch(21.39, 39.86, days, on_day=lambda day, times: streamed.append(day))
+        # الأيام الجارية لا تُطلب مرة ثانية
+        second = fetcher.fetch(21.39, 39.86, days[:6])
+        assert all(second[day] is first[day] for day in days[:6])
+        results = fetcher.fetch_all(21.39, 39.86, days)
+        elapsed = time.perf_counter() - started
+        assert elapsed < 1.0  # 18 × 0.1s متتالية
+        assert sorted(requested) == days
+        assert sorted(streamed) == days
+        assert results[days[0]] == {'fajr': '04:30', 'maghrib': '18:40'}
+        # المحفوظ لا يُطلب من جديد
+        assert fetcher.fetch_all(21.39, 39.86, days) == results
+        assert len(requested) == len(days)
+    finally:
+        fetcher.shutdown()
+        update_settings('prayer_source', 'local')
+
+
+def test_http_client(temp_db, http_stub):
+    import json
+    import clock
+    from http_client import CircuitOpenError, HttpClient, HttpError
+
+    log = []
+    # الحالات التالية التي يرد بها الخادم، ثم 200
+    script = []
+
+    def respond(path, headers):
+        log.append(headers.get('If-None-Match'))
+        status = script.pop(0) if script else 200
+        if status == 200 and headers.get('If-None-Match') == '"v1"':
+            status = 304
+        body = json.dumps({'n': len(log)}).encode() if status == 200 else b''
+        return status, body, {'ETag': '"v1"'} if status in (200, 304) else {}
+
+    base = http_stub(respond)
+    now = [0.0]
+    sleeps = []
+    client = HttpClient(sleep=sleeps.append, monotonic=lambda: now[0])
+    fixed = clock.FixedClock(datetime(2025, 3, 1, 12))
+    clock.set_clock(fixed)
+    try:
+        # 503 مرتين ثم نجاح: إعادة المحاولة بتأخير عشوائي محدود
+        script[:] = [503, 503]
+        assert client.get_json(base + '/a') == {'n': 3}
+        assert len(sleeps) == 2 and all(0 <= d <= 0.5 for d in sleeps)
+
+        # حديثة: من الجدول دون شبكة
+        assert client.get_json(base + '/a', max_age=60) == {'n': 3}
+        assert len(log) == 3
+
+        # قديمة ضمن stale: تُرجع فوراً وتُجدَّد بطلب مشروط في الخلفية
+        fixed.advance(seconds=120)
+        assert client.get_json(base + '/a', max_age=60, stale=3600) == {'n': 3}
+        client.shutdown(wait=True)
+        assert log[-1] == '"v1"'
+        assert client.get_json(base + '/a', max_age=60) == {'n': 3}
+        assert len(log) == 4
+
+        # الخادم معطل: القاطع يفتح بعد ثلاث محاولات فاشلة ويُقدَّم المحفوظ
+        script[:] = [500] * 9
+        for _ in range(3):
+            fixed.advance(days=2)
+            assert client.get_json(base + '/a', max_age=60, stale=60) == {'n': 3}
+        assert client.breaker(base).state == 'open'
+        requests_before = len(log)
+        with pytest.raises(CircuitOpenError):
+            client.get_json(base + '/new')
+        assert len(log) == requests_before
+
+        # بعد المهلة يمر طلب تجريبي واحد فيغلق القاطع
+        script[:] = []
+        now[0] += 61
+        assert client.get_json(base + '/new') == {'n': len(log)}
+        assert client.breaker(base).state == 'closed'
+        script[:] = [404]
+        with pytest.raises(HttpError):
+            client.get_json(base + '/missing')
+        assert client.breaker(base).state == 'closed'
+    finally:
+        clock.set_clock()
+        client.shutdown(wait=True)
+
+
+def test_event_timeline():
+    import clock
+    from notifications import EventTimeline, prayer_events
+
+    day = date(2025, 3, 1)
+    times = {'fajr': '05:00', 'sunrise': '06:20', 'dhuhr': '12:10 (+03)', 'asr': '15:30',
+             'maghrib': '18:00', 'isha': '-----'}
+    events = prayer_events(day, times, reminder_minutes=10)
+    keys = {key for _, key, _, _, _ in events}
+    assert {'fajr', 'fajr_reminder', 'dhuhr', 'adhkar_morning', 'adhkar_evening'} <= keys
+    assert 'isha' not in keys and 'sunrise' not in keys
+    when = {key: w for w, key, _, _, _ in events}
+    assert when['dhuhr'] - when['dhuhr_reminder'] == timedelta(minutes=10)
+    assert when['adhkar_morning'] == datetime(2025, 3, 1, 5, 15)
+
+    class Timer:
+        def __init__(self, callback, seconds):
+            self.callback, self.seconds, self.cancelled = callback, seconds, False
+
+        def cancel(self):
+            self.cancelled = True
+
+    timers = []
+
+    def schedule(callback, seconds):
+        timers.append(Timer(callback, seconds))
+        return timers[-1]
+
+    built = []
+
+    def build(d):
+        built.append(d)
+        return [(w, key, lambda: None) for w, key, _, _, _ in prayer_events(d, times)]
+
+    fixed = clock.FixedClock(datetime(2025, 3, 1, 11, 0))
+    timeline = EventTimeline(build, schedule, now=fixed)
+    timeline.rebuild()
+    pending = [key for _, key in timeline.pending()]
+    assert pending[:2] == ['dhuhr_reminder', 'dhuhr'] and pending[-1] == 'rollover'
+    assert timers[-1].seconds == 60 * 60
+
+    # المؤقت تأخر: ما فات يُطلق كله، وما فات بكثير يُهمل
+    fixed.current = datetime(2025, 3, 1, 15, 35)
+    timers[-1].callback(0)
+    assert timeline.fired == ['asr_reminder', 'asr']
+    assert timeline.pending()[0][1] == 'adhkar_evening'
+
+    # مؤقت واحد لكل حدث حتى منتصف الليل ثم يُبنى اليوم التالي
+    wakes = len(timers)
+    while built == [day]:
+        fixed.current = timeline.pending()[0][0]
+        timers[-1].callback(0)
+    assert built == [day, date(2025, 3, 2)]
+    assert len(timers) - wakes == 4
+    assert timeline.pending()[0][1] == 'fajr_reminder'
+
+
+def test_event_timeline_deferred():
+    import clock
+    from notifications import EventTimeline
+
+    day = date(2025, 3, 1)
+    builds = []
+
+    def build(d):
+        return [(datetime(d.year, d.month, d.day, 9), 'inspiration', lambda: None),
+                (datetime(d.year, d.month, d.day, 15), 'asr', lambda: None)]
+
+    timers = []
+    fixed = clock.FixedClock(datetime(2025, 3, 1, 11, 0))
+    timeline = EventTimeline(build, lambda callback, seconds: timers.append(callback),
+                             now=fixed, submit=lambda fn, d, callback: builds.append((fn, d, callback)),
+                             catch_up=('inspiration',))
+    # البناء في الخلفية: لا شيء يتغير حتى يصل، ويُهمل بناء سبقه آخر
+    timeline.rebuild()
+    timeline.rebuild()
+    assert timeline.pending() == [] and len(builds) == 2
+    fn, d, callback = builds[0]
+    callback(fn(d))
+    assert timeline.pending() == []
+    fn, d, callback = builds[1]
+    callback(fn(d))
+    # بعد التاسعة عند أول بناء لليوم: رسالة اليوم تُطلق الآن لا تُهمل
+    assert [key for _, key in timeline.pending()] == ['inspiration', 'asr', 'rollover']
+    timers[-1](0)
+    assert timeline.fired == ['inspiration']
+
+    # إعادة البناء في اليوم نفسه (تغيّر الموقع) لا تكررها
+    timeline.rebuild()
+    fn, d, callback = builds[-1]
+    callback(fn(d))
+    assert [key for _, key in timeline.pending()] == ['asr', 'rollover']
+
+    # اليوم التالي: fired يبدأ من جديد
+    fixed.current = datetime(2025, 3, 2, 0, 0)
+    timers[-1](0)
+    fn, d, callback = builds[-1]
+    assert d == day + timedelta(days=1)
+    callback(fn(d))
+    assert timeline.fired == []
+    assert [key for _, key in timeline.pending()] == ['inspiration', 'asr', 'rollover']
+
+
+def test_daily_inspiration_clock(monkeypatch):
+    import clock
+    import notifications
+    sent = []
+    monkeypatch.setattr(notifications, 'send_notification',
+                        lambda title, message, timeout=10: sent.append(title))
+    # تهنئة رمضان حسب ساعة التطبيق لا ساعة الجهاز
+    try:
+        clock.set_clock(clock.FixedClock(datetime(2025, 3, 10, 9, 0)))
+        notifications.show_daily_inspiration()
+        assert sent[-1] == '🌙 رمضان'
+        sent.clear()
+        clock.set_clock(clock.FixedClock(datetime(2025, 5, 10, 9, 0)))
+        notifications.show_daily_inspiration()
+        assert len(sent) == 1 and sent[0] != '🌙 رمضان'
+    finally:
+        clock.set_clock()
+
+
+def test_quran_recycled_list(temp_db):
+    from kivy.clock import Clock
+    from screens import QuranScreen
+
+    screen = QuranScreen()
+    ayahs = screen.ayah_list
+    screen.size = (400, 900)
+    screen.on_surah_selected(None, 'البقرة')
+    for _ in range(3):
+        Clock.tick()
+    assert len(ayahs.data) == 287
+    # العناصر المنشأة هي الظاهرة فقط
+    views = ayahs.layout_manager.children
+    assert 0 < len(views) < 30
+    assert ayahs.data[1]['color'] == ayahs.HIGHLIGHT
+
+    rows = ayahs.data
+    screen.next_ayah(None)
+    screen.next_ayah(None)
+    screen.prev_ayah(None)
+    Clock.tick()
+    # التظليل تغيير في البيانات لا إعادة بناء لها
+    assert ayahs.data is rows
+    assert [i for i, row in enumerate(rows) if row['color'] == ayahs.HIGHLIGHT] == [2]
+    assert screen.ayah_label.text.endswith('الآية 2 من 286')
+
+    screen.move_to_ayah(250)
+    Clock.tick()
+    shown = {view.index for view in ayahs.layout_manager.children}
+    assert 250 in shown and len(ayahs.layout_manager.children) < 30
+
+
+def test_benchmark_harness():
+    import benchmark
+    from connection import manager
+
+    path = manager.path
+    report = benchmark.run(years=(0.05, 0.2), repeat=2)
+    assert manager.path == path
+    assert set(report['functions']) == set(benchmark.public_functions())
+    assert 'statistics.get_streak' in report['functions']
+    assert report['sizes'][0]['events'] < report['sizes'][1]['events']
+    for points in report['functions'].values():
+        assert len(points) == 2
+        assert all(p['p50_ms'] <= p['p95_ms'] for p in points)
+
+
 if __name__ == '__main__':
     test_hijri_conversion()
+    test_hijri_tables()
+    test_event_index()
     test_prayer_utils()
+    test_prayer_calculator()
     test_reading_log()
     test_events()
     test_ramadan_calendar()
     test_ramadan_plan_flow()
+    test_write_buffer()
+    test_connection_per_thread()
+    test_counters_concurrent()
+    test_settings_cache()
+    test_async_db()
+    test_event_timeline()
+    test_benchmark_harness()
     print("all tests passed")
@@ -0,0 +1,61 @@
+"""
+طبقة الكتابة المؤجلة (write-behind) لعدادات قاعدة البيانات
+"""
+
+import threading
+
+
+class WriteBuffer:
+    """يجمع زيادات العدادات في الذاكرة ويكتبها في معاملة واحدة
+
+    كل زيادة تُدمج مع سابقاتها حسب المفتاح (الجدول، التاريخ)، ثم تُمرَّر
+    كل المفاتيح المعلّقة إلى ``flush_fn`` دفعة واحدة.
+    """
+
+    def __init__(self, flush_fn, interval=5):
+        self._flush_fn = flush_fn
+        self.interval = interval
+        self._pending = {}
+        # القفل يبقى مأخوذاً أثناء الكتابة كي لا تظهر القيمة ناقصة للقارئ
+        self._lock = threading.RLock()
+        self._event = None
+
+    def add(self, table, key, amount):
+        """إضافة زيادة معلّقة للمفتاح (table, key)"""
+        with self._lock:
+            self._pending[(table, key)] = self._pending.get((table, key), 0) + amount
+
+    def pending(self, table, key):
+        """القيمة المعلّقة التي لم تُكتب بعد لهذا المفتاح"""
+        with self._lock:
+            return self._pending.get((table, key), 0)
+
+    def discard(self, table, key=None):
+        """إسقاط الزيادات المعلّقة لجدول (أو لمفتاح واحد منه)"""
+        with self._lock:
+            for k in list(self._pending):
+                if k[0] == table and (key is None or k[1] == key):
+                    del self._pending[k]
+
+    def flush(self):
+        """كتابة كل الزيادات المعلّقة وإرجاع عدد المفاتيح المكتوبة"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            items = list(self._pending.items())
+            self._flush_fn(items)
+            self._pending.clear()
+            return len(items)
+
+    def start(self):
+        """تشغيل الكتابة الدورية عبر ساعة Kivy"""
+        if self._event is None:
+            from kivy.clock import Clock
+            self._event = Clock.schedule_interval(lambda dt: self.flush(), self.interval)
+
+    def stop(self):
+        """إيقاف الكتابة الدورية مع كتابة ما تبقى"""
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+        self.flush()